@@ -5,12 +5,93 @@ Made for use only with Influx, QuestDB, TimeScaleDB or VictoriaMetricsDB
 
 import subprocess
 import sys
+import os
+import copy
+import time
+import shutil
+import signal
 import re
 import pathlib
 import tempfile
 import json
 import argparse
 import datetime
+import threading
+import random
+import cProfile
+import pstats
+
+import harness_metrics
+import engine_hooks
+
+# The formats that load the same InfluxDB line protocol, so one dataset can be shared
+LINE_PROTOCOL_FORMATS = ["influx", "questdb", "victoriametrics"]
+
+def get_codec(args):
+    """
+    Creates the commands for compressing and decompressing the generated files
+
+    Parameters:
+        args : argparse.Namespace
+            The list of inline arguments given to the program
+
+    Returns:
+        codec_dict : dict
+            The file extension and the compress and decompress commands,
+            empty commands for uncompressed files
+    """
+
+    threads = str(args.codec_threads if args.codec_threads else os.cpu_count())
+
+    codecs = {
+        "none": {"extension": "", "compress": "", "decompress": ""},
+        "gzip": {"extension": ".gz", "compress": "gzip", "decompress": "gzip -d"},
+        "pigz": {
+            "extension": ".gz",
+            "compress": "pigz -p " + threads,
+            "decompress": "pigz -d -p " + threads
+        },
+        "zstd": {
+            "extension": ".zst",
+            "compress": "zstd -q -1 -T" + threads,
+            "decompress": "zstd -q -d"
+        },
+        "lz4": {"extension": ".lz4", "compress": "lz4 -q", "decompress": "lz4 -q -d"}
+    }
+
+    return dict(codecs[args.codec], name=args.codec)
+
+def codec_installed(codec_dict):
+    """
+    Checks if the program for the codec is installed
+
+    Parameters:
+        codec_dict : dict
+            The file extension and the compress and decompress commands
+
+    Returns:
+        installed : bool
+            If the codec can be used
+    """
+
+    return not codec_dict["compress"] or shutil.which(codec_dict["compress"].split()[0]) is not None
+
+def get_file_path(path_dict):
+    """
+    Creates the path for the generated file of the current use case or query type
+
+    Parameters:
+        path_dict : dict
+            A dict with the file name and the codec
+
+    Returns:
+        file_path : str
+            The path in the temp folder, with the extension of the codec
+    """
+
+    return str(pathlib.Path(
+        tempfile.gettempdir(), path_dict["test_file"] + path_dict["codec"]["extension"]
+    ))
 
 def generate_files(path_dict, args, timestamps, run_dict, query_dict):
     """
@@ -27,19 +108,28 @@ def generate_files(path_dict, args, timestamps, run_dict, query_dict):
             A dict containing the current file_number and the current run
         query_dict : dict
             A dict containing the query type and a JSON safe query name
+
+    Returns:
+        stream_dict : dict
+            The bytes, lines, rows, metrics and series counted in the generated data
+            with --byte_accounting, empty otherwise
     """
 
     # The path to your tsbs/bin folder
     run_path = str(pathlib.Path(path_dict["main_path"], "bin", "tsbs_generate_"))
 
     #The path to your folder storing the TSBS generated files
-    file_path = str(pathlib.Path(tempfile.gettempdir(), path_dict["test_file"] + ".gz"))
+    file_path = get_file_path(path_dict)
 
     use_case = path_dict["use_case"][run_dict["file_number"]]
 
-    # Devops data are 10x the size of the others, so need to shrink
+    # The netmon use case is generated by nettelemetry.py, with the same arguments as tsbs
+    if use_case == "netmon":
+        run_path = sys.executable + " " + str(pathlib.Path(__file__).with_name("nettelemetry.py")) + " "
+
+    # Devops and netmon data are 10x the size of the others, so need to shrink
     # Sets it to 10 if scale is smaller than 10
-    if use_case == "devops":
+    if use_case in ["devops", "netmon"]:
         new_scale = args.scale//10
         new_scale = new_scale if new_scale >= 10 else 10
     else:
@@ -55,21 +145,26 @@ def generate_files(path_dict, args, timestamps, run_dict, query_dict):
     if args.operation == "write":
         run_path = run_path + "data"
 
+        # The retention workload picks its own window
+        window = run_dict.get(
+            "window", timestamps[str(run_dict["run"] + (args.runs * run_dict["file_number"]))]
+        )
+
         full_command = (
             run_path +
             full_command +
-            " --timestamp-start=" + 
-            timestamps[str(run_dict["run"] + (args.runs * run_dict["file_number"]))][0] +
-            " --timestamp-end=" + 
-            timestamps[str(run_dict["run"] + (args.runs * run_dict["file_number"]))][1] +
+            " --timestamp-start=" + window[0] +
+            " --timestamp-end=" + window[1] +
             " --log-interval=" + str(args.log_time) + "s"
         )
 
     elif args.operation == "read":
         run_path = run_path + "queries"
 
-        # Generates a new timestamp for the end point at 1 second past data generation
-        time_end = timestamps[str(args.runs-1)][1].split("T")
+        # Queries the window the use case was written to, which starts at its first run
+        # and ends 1 second past the data generation of its last run
+        time_start = timestamps[str(args.runs * run_dict["file_number"])][0]
+        time_end = timestamps[str(args.runs * (run_dict["file_number"] + 1) - 1)][1].split("T")
         time_end = (
             datetime.datetime.strptime(time_end[0] + " " + time_end[1][:-1], "%Y-%m-%d %H:%M:%S") +
             datetime.timedelta(seconds=1)
@@ -78,22 +173,191 @@ def generate_files(path_dict, args, timestamps, run_dict, query_dict):
         date_str = str(time_end).split(" ", maxsplit=1)
         time_end = date_str[0] + "T" + date_str[1] + "Z"
 
+        # The retention workload picks its own window
+        if "window" in run_dict:
+            time_start, time_end = run_dict["window"]
+
         full_command = (
             run_path +
             full_command +
-            " --timestamp-start=" + timestamps["0"][0] +
+            " --timestamp-start=" + time_start +
             " --timestamp-end=" + time_end +
             " --queries=" + str(args.queries) +
             " --query-type=" + query_dict["query"]
         )
 
-    full_command = full_command + " | gzip > " + file_path
+    # Counts the generated data on its way to the file, before it is compressed
+    count_stream = args.operation == "write" and args.byte_accounting
+    stats_path = pathlib.Path(file_path + ".stats")
+
+    if count_stream:
+        full_command = (
+            full_command + " | PYTHONHASHSEED=0 " +
+            sys.executable + " " + str(pathlib.Path(__file__).with_name("stream_stats.py")) +
+            " --format " + args.format +
+            " --output " + str(stats_path)
+        )
+
+    if path_dict["codec"]["compress"]:
+        full_command = full_command + " | " + path_dict["codec"]["compress"]
+
+    full_command = full_command + " > " + file_path
 
     print("Creating file: " + file_path)
 
+    harness_metrics.set_phase("generate")
     subprocess.run(full_command, shell=True, capture_output=True, check=False)
 
-def process_tsbs(path_dict, args, db_setup):
+    stream_dict = {}
+
+    if count_stream:
+        try:
+            with open(stats_path, "r", encoding="ASCII") as f:
+                stream_dict = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            print("No byte accounting for " + file_path)
+
+        stats_path.unlink(missing_ok=True)
+
+    return stream_dict
+
+def run_command(full_command, timeout=None):
+    """
+    Runs a shell command, and kills the whole pipeline if it runs past the timeout
+    Each line of stdout is handed to handle_progress as it arrives
+
+    Parameters:
+        full_command : str
+            The shell command to run
+        timeout : int
+            The seconds the command is allowed to run, None for no limit
+
+    Returns:
+        output : subprocess.CompletedProcess
+            The finished command with its stdout and stderr
+
+    Raises:
+        subprocess.TimeoutExpired
+            If the command did not finish within the timeout
+    """
+
+    stdout_lines = []
+    stderr_lines = []
+    timed_out = threading.Event()
+
+    # Runs in its own session so the timeout can kill every process in the pipeline
+    with subprocess.Popen(
+        full_command,
+        shell=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        start_new_session=True
+    ) as process:
+
+        def kill_pipeline():
+            timed_out.set()
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+        timer = threading.Timer(timeout, kill_pipeline) if timeout else None
+        if timer:
+            timer.start()
+
+        # Reads stderr on its own thread so a full pipe can not block the command
+        stderr_thread = threading.Thread(
+            target=lambda: stderr_lines.extend(process.stderr), daemon=True
+        )
+        stderr_thread.start()
+
+        # The time spent on the output is inside the window tsbs measures itself
+        progress_dict = {"last_line": ""}
+        progress_seconds = 0.0
+        for line in process.stdout:
+            stdout_lines.append(line)
+            progress_start = time.perf_counter()
+            handle_progress(line, progress_dict)
+            progress_seconds += time.perf_counter() - progress_start
+
+        harness_metrics.add_progress_time(progress_seconds)
+
+        process.wait()
+        stderr_thread.join()
+
+        if timer:
+            timer.cancel()
+
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(full_command, timeout)
+
+    return subprocess.CompletedProcess(
+        full_command, process.returncode, "".join(stdout_lines), "".join(stderr_lines)
+    )
+
+def handle_progress(line, progress_dict):
+    """
+    Takes a line of output from tsbs while it runs, and updates the live metrics
+
+    Parameters:
+        line : str
+            The line from tsbs_load or tsbs_run_queries
+        progress_dict : dict
+            Holds the previous line, as the latency line follows its label
+    """
+
+    line = line.strip()
+    values = line.split(",")
+
+    # tsbs_load reports time, per. metric/s, metric total, overall metric/s,
+    # and the same for rows when the loader counts rows
+    if len(values) >= 4 and values[0].isdigit():
+        try:
+            floats = [float(value) for value in values[1:]]
+        except ValueError:
+            floats = []
+
+        if floats:
+            load_dict = {"metrics_sec": floats[0], "metrics_total": floats[1]}
+            if len(floats) >= 6:
+                load_dict.update({"rows_sec": floats[3], "rows_total": floats[4]})
+            harness_metrics.update(load_dict)
+
+    elif line.startswith("Interval query rate"):
+        found_query = re.findall(r"-?\d+\.\d+", line)
+        if found_query:
+            harness_metrics.update({"queries_sec": float(found_query[0])})
+
+    elif progress_dict["last_line"].startswith("all queries") and line.startswith("min:"):
+        harness_metrics.update({"latency": parse_latency(line)})
+
+    progress_dict["last_line"] = line
+
+def parse_latency(line):
+    """
+    Parses a latency line from tsbs_run_queries into seconds
+
+    Parameters:
+        line : str
+            The line, as in "min: 1.23ms, med: 2.34ms, ... sum: 2.6sec, count: 1000"
+
+    Returns:
+        latency_dict : dict
+            A dict with the seconds for each statistic, and the query count
+    """
+
+    latency_dict = {}
+
+    for name, value, unit in re.findall(r"(\w+):\s*(-?\d+(?:\.\d+)?)(ms|sec|s)?", line):
+        if unit == "ms":
+            latency_dict[name] = float(value) / 1000
+        else:
+            latency_dict[name] = float(value)
+
+    return latency_dict
+
+def process_tsbs(path_dict, args, db_setup, timeout=None, keep_file=False, create_db=True):
     """
     Loads the data into the database using tsbs_load_<db_engine>
     Runs the queries against the database using tsbs_run_queries_<db_engine>
@@ -105,17 +369,23 @@ def process_tsbs(path_dict, args, db_setup):
             The list of inline arguments given to the program 
         db_setup : dict
             The dict with all metadata about the selected database
+        timeout : int
+            The seconds the run is allowed to take, None for no limit
+        keep_file : bool
+            Keeps the generated file for running it again
+        create_db : bool
+            Lets tsbs_load drop and create the database, False to add to the data in it
 
     Returns:
-        processed_output : tuple
-            A tuple containing all the lists from handle_load/queries
+        processed_output : dict
+            A dict from handle_load/queries, or with the timeout or error if the run failed
     """
 
     # The path to your tsbs/bin folder
     run_path = str(pathlib.Path(path_dict["main_path"], "bin", "tsbs_"))
 
     #The path to your folder storing the TSBS generated files
-    file_path = str(pathlib.Path(tempfile.gettempdir(), path_dict["test_file"] + ".gz"))
+    file_path = get_file_path(path_dict)
 
     if args.operation == "write":
         print("Loading data for " + args.format + " with file: " + file_path)
@@ -124,38 +394,105 @@ def process_tsbs(path_dict, args, db_setup):
         print("Running query for " + args.format + " with file: " + file_path)
         run_path = run_path + "run_queries_" + args.format
 
+        # tsbs can not run the netmon queries, nettelemetry.py runs them with the same output
+        if path_dict.get("active_use_case") == "netmon":
+            run_path = (
+                sys.executable + " " + str(pathlib.Path(__file__).with_name("nettelemetry.py")) +
+                " run --format " + args.format
+            )
+            if args.db_url:
+                run_path = run_path + (
+                    " --host " if args.format == "timescaledb" else " --url "
+                ) + args.db_url
+
+    if path_dict["codec"]["decompress"]:
+        full_command = path_dict["codec"]["decompress"] + " < " + file_path + " | "
+    else:
+        full_command = "cat " + file_path + " | "
+
     full_command = (
-        "cat " + file_path +
-        " | gunzip | " +
+        full_command +
         run_path +
         " --workers " + str(args.workers)
     )
 
     if args.operation == "write":
         full_command = full_command + " --batch-size " + str(args.batch)
+        if not create_db:
+            full_command = full_command + " --do-create-db=false"
 
     for arg in db_setup[args.format]["extra_args"]:
         full_command = full_command + arg
 
-    output = subprocess.run(full_command, shell=True, capture_output=True, text=True, check=False)
+    # Digests the responses on their way out, tsbs prints them to stdout or stderr
+    # depending on the database, so both go through the stage
+    digest_responses = args.operation == "read" and args.response_digest
+    digest_path = pathlib.Path(file_path + ".digest")
+
+    if digest_responses:
+        full_command = (
+            full_command + " --print-responses 2>&1 | " +
+            sys.executable + " " + str(pathlib.Path(__file__).with_name("response_digest.py")) +
+            " --output " + str(digest_path)
+        )
+
+    harness_metrics.set_phase("load" if args.operation == "write" else "query")
+
+    try:
+        output = run_command(full_command, timeout)
+    except subprocess.TimeoutExpired:
+        print("Timed out after " + str(timeout) + " seconds")
+        digest_path.unlink(missing_ok=True)
+        if not keep_file:
+            harness_metrics.set_phase("cleanup")
+            pathlib.Path.unlink(pathlib.Path(file_path))
+
+        return {"timeout": timeout}
+
+    harness_metrics.set_phase("parse")
+
+    processed_output = {}
+
+    error_output = output.stderr
+    if digest_responses:
+        error_output = error_output + output.stdout
 
     # Checks if there has been any error in loading with tsbs,
-    # and prints the error and exits the program
-    for line in output.stderr.strip().split("\n"):
+    # and prints the error and returns it instead of the run
+    for line in error_output.strip().split("\n"):
         if re.findall(r'panic', line, re.IGNORECASE):
             print(output.stderr)
-            sys.exit("Database error!")
+            print("Database error!")
+            processed_output = {"error": line.strip()}
+            break
 
-    processed_output = ()
+    if not processed_output:
+        try:
+            if args.operation == "write":
+                processed_output = handle_load(output)
+            if args.operation == "read":
+                processed_output = handle_query(output)
+        except (IndexError, ValueError):
+            print(output.stderr)
+            print("Could not read the output from tsbs!")
+            processed_output = {
+                "error": "No results in output: " + output.stderr.strip()[-500:]
+            }
 
-    if args.operation == "write":
-        processed_output = handle_load(output)
-    if args.operation == "read":
-        processed_output = handle_query(output)
+    if digest_responses:
+        try:
+            with open(digest_path, "r", encoding="ASCII") as f:
+                processed_output["digest"] = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            print("No response digest for " + file_path)
+
+        digest_path.unlink(missing_ok=True)
 
     # Removes the file after done loading
-    path_file_path = pathlib.Path(file_path)
-    pathlib.Path.unlink(path_file_path)
+    if not keep_file:
+        harness_metrics.set_phase("cleanup")
+        path_file_path = pathlib.Path(file_path)
+        pathlib.Path.unlink(path_file_path)
 
     return processed_output
 
@@ -205,163 +542,1299 @@ def handle_load(output):
         "time": round(float(time_match[0]), 2)
     }
 
-    return load_return_dict
+    return load_return_dict
+
+def handle_query(output):
+    """
+    For formatting the output from the query
+
+    Parameters:
+        output : str
+
+    Returns:
+        query_return_dict : dict
+            A dict with the query amount and time, and the mean latency if tsbs reported it
+    """
+
+    last_line = ""
+    query_match = 0
+    latency_dict = {}
+
+    output_lines = output.stdout.strip().split("\n")
+
+    for line in output_lines:
+        if "(" in line and ")" in line:
+            # Finds all floats to grab the time per run
+            found_query = re.findall(r"-?\d+\.\d+", line)
+
+            if found_query:
+                query_match = int(round(float(found_query[0])))
+
+        # The latency over all queries follows the "all queries" label
+        if last_line.startswith("all queries") and line.startswith("min:"):
+            latency_dict = parse_latency(line)
+
+        last_line = line
+
+    query_return_dict = {
+        "query": query_match,
+        "time": round(float(re.findall(r"-?\d+\.\d+", last_line)[0]), 2)
+    }
+
+    if "mean" in latency_dict:
+        query_return_dict["latency_ms"] = round(latency_dict["mean"] * 1000, 2)
+
+    return query_return_dict
+
+def create_averages(db_dict, args):
+    """
+    Creates the averages for each file per metrics, rows and time for load
+    and for time and queries for read
+    Cold and warm runs are also averaged on their own when the run policy makes cold runs
+
+    Parameters:
+        db_dict : dict
+            A dictionary containing all the data about all the runs; time/run, metrics/sec, 
+            rows/sec, and total metrics and rows; or queries/sec
+    
+    Returns:
+        avg_runs_dict : dict
+            The same dict as db, but including the average time/run/file, metrics/sec/file, 
+            and rows/sec/file; or queries/sec/file
+    """
+
+    avg_runs_dict = {}
+    for file in db_dict:
+        # Query types where every run timed out have nothing to average
+        if not db_dict[file]["t_run"]:
+            continue
+
+        avg_runs_dict[file] = {}
+        if args.operation == "write":
+            avg_runs_dict[file].update(average_runs(db_dict[file], args))
+            avg_runs_dict[file].update({
+                "total_metrics": db_dict[file]["total_metrics"],
+                "total_rows": db_dict[file]["total_rows"]
+            })
+
+            if any(db_dict[file]["stream"]):
+                avg_runs_dict[file]["bytes"] = average_bytes(db_dict[file])
+        elif args.operation == "read":
+            avg_runs_dict[file]["use_case"] = db_dict[file]["use_case"]
+            avg_runs_dict[file].update(average_runs(db_dict[file], args))
+            avg_runs_dict[file]["timeouts"] = db_dict[file]["timeouts"]
+
+            if any(db_dict[file]["digest"]):
+                avg_runs_dict[file]["responses"] = average_responses(db_dict[file])
+
+            if db_dict[file]["hot"]["t_run"]:
+                avg_runs_dict[file]["cache"] = {
+                    "cold": average_runs(db_dict[file], args),
+                    "hot": average_runs(db_dict[file]["hot"], args)
+                }
+                # How many times faster the hot phases ran the same queries
+                avg_runs_dict[file]["cache"]["hot_speedup"] = round(
+                    avg_runs_dict[file]["cache"]["cold"]["time_avg"] /
+                    avg_runs_dict[file]["cache"]["hot"]["time_avg"], 2
+                ) if avg_runs_dict[file]["cache"]["hot"]["time_avg"] else None
+
+        avg_runs_dict[file]["run_state"] = db_dict[file]["state"]
+
+        if any(db_dict[file]["timing"]):
+            avg_runs_dict[file]["timing"] = average_timing(db_dict[file]["timing"])
+
+        if args.run_policy != "warm":
+            for state in ["cold", "warm"]:
+                state_runs = [
+                    index for index, run_state in enumerate(db_dict[file]["state"])
+                    if run_state == state
+                ]
+                if state_runs:
+                    avg_runs_dict[file][state] = average_runs(db_dict[file], args, state_runs)
+
+        if db_dict[file]["errors"]:
+            avg_runs_dict[file]["errors"] = db_dict[file]["errors"]
+
+    return avg_runs_dict
+
+def average_runs(run_dict, args, run_indexes=None):
+    """
+    Averages time/run and metrics/sec and rows/sec, or queries/sec, over the selected runs
+
+    Parameters:
+        run_dict : dict
+            The lists for every run of one use case or query type
+        args : argparse.Namespace
+            The list of inline arguments given to the program
+        run_indexes : list
+            The indexes of the runs to average, None for all runs
+
+    Returns:
+        avg_dict : dict
+            The lists for the selected runs and their averages
+    """
+
+    if run_indexes is None:
+        run_indexes = range(len(run_dict["t_run"]))
+
+    t_run = [run_dict["t_run"][index] for index in run_indexes]
+
+    avg_dict = {
+        "time_run": t_run,
+        "time_avg": round(sum(t_run) / len(t_run), 2)
+    }
+
+    if args.operation == "write":
+        metrics = [run_dict["metrics"][index] for index in run_indexes]
+        rows = [run_dict["rows"][index] for index in run_indexes]
+
+        avg_dict.update({
+            "metrics_sec": metrics,
+            "metrics_avg": sum(metrics) // len(metrics),
+            "rows_sec": rows,
+            "rows_avg": sum(rows) // len(rows)
+        })
+    elif args.operation == "read":
+        queries = [run_dict["queries"][index] for index in run_indexes]
+
+        avg_dict.update({
+            "queries_sec": queries,
+            "queries_avg": sum(queries) // len(queries)
+        })
+
+        latency = [
+            run_dict["latency"][index] for index in run_indexes
+            if run_dict["latency"][index] is not None
+        ]
+        if latency:
+            avg_dict["latency_ms_avg"] = round(sum(latency) / len(latency), 2)
+
+    return avg_dict
+
+def average_bytes(run_dict):
+    """
+    Creates the bytes/sec ingested and the bytes per row and metric from the byte accounting,
+    and checks the counted rows and metrics against the totals from tsbs_load
+
+    Parameters:
+        run_dict : dict
+            The lists for every run of one use case, with the stream counts
+
+    Returns:
+        bytes_dict : dict
+            The bytes and bytes/sec for each run, their averages, and if the counts matched
+    """
+
+    run_indexes = [index for index, stream in enumerate(run_dict["stream"]) if stream]
+    streams = [run_dict["stream"][index] for index in run_indexes]
+    totals = [run_dict["totals"][index] for index in run_indexes]
+
+    bytes_sec = [
+        round(run_dict["stream"][index]["bytes"] / run_dict["t_run"][index])
+        for index in run_indexes
+    ]
+    total_bytes = sum(stream["bytes"] for stream in streams)
+
+    return {
+        "bytes_run": [stream["bytes"] for stream in streams],
+        "bytes_sec": bytes_sec,
+        "bytes_avg": sum(bytes_sec) // len(bytes_sec),
+        "bytes_per_row": round(total_bytes / max(sum(total[1] for total in totals), 1), 2),
+        "bytes_per_metric": round(total_bytes / max(sum(total[0] for total in totals), 1), 2),
+        "lines_run": [stream["lines"] for stream in streams],
+        "series_run": [stream["series"] for stream in streams],
+        "rows_counted": [stream["rows"] for stream in streams],
+        "metrics_counted": [stream["metrics"] for stream in streams],
+        "counts_match": all(
+            stream["rows"] == total[1] and stream["metrics"] == total[0]
+            for stream, total in zip(streams, totals)
+        )
+    }
+
+def average_responses(run_dict):
+    """
+    Collects the response digests of the runs, with the sizes of the responses,
+    to tell the cost of sending the results apart from computing them
+
+    Parameters:
+        run_dict : dict
+            The lists for every run of one query type, with the digests
+
+    Returns:
+        responses_dict : dict
+            The digest, rows and bytes of the responses for each run, and the averages
+    """
+
+    run_indexes = [index for index, digest in enumerate(run_dict["digest"]) if digest]
+    digests = [run_dict["digest"][index] for index in run_indexes]
+    total_responses = max(sum(digest["responses"] for digest in digests), 1)
+
+    bytes_sec = [
+        round(run_dict["digest"][index]["bytes"] / run_dict["t_run"][index])
+        for index in run_indexes
+    ]
+
+    return {
+        "digest_run": [digest["digest"] for digest in digests],
+        "responses_run": [digest["responses"] for digest in digests],
+        "rows_run": [digest["rows"] for digest in digests],
+        "bytes_run": [digest["bytes"] for digest in digests],
+        "bytes_sec": bytes_sec,
+        "bytes_avg": sum(bytes_sec) // len(bytes_sec),
+        "bytes_per_response": round(sum(digest["bytes"] for digest in digests) / total_responses, 2),
+        "rows_per_response": round(sum(digest["rows"] for digest in digests) / total_responses, 2),
+        "unparsed": sum(digest["unparsed"] for digest in digests)
+    }
+
+def running_handler(path_dict, args, db_setup, timestamps, query_suites, checkpoint):
+    """
+    Runs the TSBS scripts for ingesting and querying data
+    Each finished run is saved to the checkpoint, and runs already in it are skipped
+
+    Parameters:
+        path_dict : dict
+            A dict with the path to TSBS, and the use_case
+        args : argparse.Namespace
+            The list of inline arguments given to the program
+        db_setup : dict
+            The dict with all metadata about the selected database
+        timestamps : dict
+            A dict with the timestamps
+        query_suites : dict
+            A dict with the query types and their timeouts for each use case
+        checkpoint : dict
+            The dict with the results and errors of every run so far, and its file
+    """
+
+    use_dict = {}
+    file_number = 0
+
+    if args.operation == "write":
+        use_dict = path_dict["use_case"]
+    elif args.operation == "read":
+        use_dict = get_read_dict(path_dict, args, db_setup, query_suites)
+
+    for key_name in use_dict:
+        path_dict["test_file"] = args.format + "_" + key_name
+        print("Running with " + path_dict["test_file"])
+
+        for run in range(args.runs):
+            print("Run number: " + str(run+1))
+
+            if str(run) in checkpoint["runs"].get(key_name, {}):
+                print("Already finished in " + checkpoint["file"] + ", skipping")
+                continue
+
+            harness_metrics.set_run(args.format, args.operation, key_name, run + 1, args.runs)
+
+            try:
+                state_dict = apply_run_policy(args, db_setup, run)
+            except RuntimeError as error:
+                print("Could not reset the database: " + str(error))
+                harness_metrics.end_run()
+                store_run(checkpoint, key_name, run, {"error": str(error)})
+                continue
+
+            if args.operation == "write":
+                run_dict = {"file_number": file_number, "run": run}
+                query_dict = {}
+
+                stream_dict = generate_files(path_dict, args, timestamps, run_dict, query_dict)
+
+                run_return_dict = process_tsbs(path_dict, args, db_setup)
+
+                if stream_dict:
+                    run_return_dict["stream"] = stream_dict
+
+            elif args.operation == "read":
+                run_dict = {"file_number": use_dict[key_name]["file_number"], "run": run}
+                query_dict = {"query": use_dict[key_name]["query"], "query_name": key_name}
+                path_dict["active_use_case"] = use_dict[key_name]["use_case"]
+
+                generate_files(path_dict, args, timestamps, run_dict, query_dict)
+
+                if args.read_mode == "cold-hot":
+                    run_return_dict = run_cache_phases(
+                        path_dict, args, db_setup, use_dict[key_name]["timeout"]
+                    )
+                else:
+                    run_return_dict = process_tsbs(
+                        path_dict, args, db_setup, use_dict[key_name]["timeout"]
+                    )
+                run_return_dict["use_case"] = use_dict[key_name]["use_case"]
+
+            run_return_dict.update(state_dict)
+            run_return_dict["timing"] = get_run_timing(harness_metrics.end_run(), run_return_dict)
+
+            store_run(checkpoint, key_name, run, run_return_dict)
+
+        print("All " + str(args.runs)+ " runs completed\n")
+        file_number += 1
+
+    harness_metrics.set_phase("done")
+
+def shared_running_handler(path_dict, engine_args, db_setup, timestamps, checkpoints):
+    """
+    Generates one line protocol dataset per run and loads it into each of the engines,
+    so every engine ingests the same bytes
+    The engines load in the given order, or in an order shuffled for each run
+
+    Parameters:
+        path_dict : dict
+            A dict with the path to TSBS, and the use_case
+        engine_args : dict
+            The arguments for each engine sharing the dataset, with the format set to the engine
+        db_setup : dict
+            The dict with all metadata about the databases
+        timestamps : dict
+            A dict with the timestamps
+        checkpoints : dict
+            The checkpoint of each engine
+    """
+
+    engines = list(engine_args)
+    args = engine_args[engines[0]]
+
+    # The dataset is generated once in the influx format, which the other engines load as well
+    generate_args = copy.copy(args)
+    generate_args.format = "influx"
+
+    for file_number, key_name in enumerate(path_dict["use_case"]):
+        path_dict["test_file"] = "shared_" + key_name
+        print("Running with " + path_dict["test_file"] + " for " + ", ".join(engines))
+
+        for run in range(args.runs):
+            print("Run number: " + str(run+1))
+
+            order = list(engines)
+            if args.engine_order == "random":
+                random.Random(args.seed + run).shuffle(order)
+
+            pending = [
+                engine for engine in order
+                if str(run) not in checkpoints[engine]["runs"].get(key_name, {})
+            ]
+            if not pending:
+                print("Already finished for every engine, skipping")
+                continue
+
+            harness_metrics.set_run("+".join(pending), "write", key_name, run + 1, args.runs)
+            run_dict = {"file_number": file_number, "run": run}
+            stream_dict = generate_files(path_dict, generate_args, timestamps, run_dict, {})
+            generate_phases = harness_metrics.end_run()
+
+            for engine in pending:
+                print("Loading into " + engine + ", " + str(order.index(engine) + 1) +
+                      " of " + str(len(order)))
+                harness_metrics.set_run(engine, "write", key_name, run + 1, args.runs)
+
+                try:
+                    state_dict = apply_run_policy(engine_args[engine], db_setup, run)
+                except RuntimeError as error:
+                    print("Could not reset the database: " + str(error))
+                    harness_metrics.end_run()
+                    store_run(checkpoints[engine], key_name, run, {"error": str(error)})
+                    continue
+
+                run_return_dict = process_tsbs(
+                    path_dict, engine_args[engine], db_setup, keep_file=True
+                )
+
+                if stream_dict:
+                    run_return_dict["stream"] = stream_dict
+
+                run_return_dict.update(state_dict)
+                run_return_dict["load_order"] = order
+                run_return_dict["timing"] = get_run_timing(
+                    harness_metrics.end_run(), run_return_dict
+                )
+                run_return_dict["timing"]["shared_phases"] = generate_phases
+
+                store_run(checkpoints[engine], key_name, run, run_return_dict)
+
+            pathlib.Path(get_file_path(path_dict)).unlink()
+
+        print("All " + str(args.runs)+ " runs completed\n")
+
+    harness_metrics.set_phase("done")
+
+def store_run(checkpoint, key_name, run, run_return_dict):
+    """
+    Saves the result of a run, or its error, to the checkpoint
+
+    Parameters:
+        checkpoint : dict
+            The dict with the results and errors of every run so far, and its file
+        key_name : str
+            The use case or query type
+        run : int
+            The run number, starting at 0
+        run_return_dict : dict
+            The result of the run
+    """
+
+    if "error" in run_return_dict:
+        checkpoint["errors"].setdefault(key_name, {})[str(run)] = run_return_dict["error"]
+    else:
+        checkpoint["runs"].setdefault(key_name, {})[str(run)] = run_return_dict
+        checkpoint["errors"].get(key_name, {}).pop(str(run), None)
+        if not checkpoint["errors"].get(key_name, True):
+            del checkpoint["errors"][key_name]
+
+    save_checkpoint(checkpoint)
+
+def get_run_timing(run_phases, run_return_dict):
+    """
+    Compares the time tsbs measured itself with the phases the harness timed around it
+
+    Parameters:
+        run_phases : list
+            The phases of the run from harness_metrics.end_run
+        run_return_dict : dict
+            The result of the run, with the hot phases for the cold-hot read mode
+
+    Returns:
+        timing_dict : dict
+            The phases, the wall time of the run, and how much of the load or query
+            phases was outside the time tsbs reported
+    """
+
+    tsbs_phases = [phase for phase in run_phases if phase["phase"] in ["load", "query"]]
+    tsbs_time = sum(
+        result["time"] for result in [run_return_dict] + run_return_dict.get("hot", [])
+        if "time" in result
+    )
+    tsbs_phases_wall = sum(phase["wall"] for phase in tsbs_phases)
+
+    return {
+        "phases": run_phases,
+        "wall": run_phases[-1]["end"] if run_phases else 0.0,
+        "tsbs_time": round(tsbs_time, 2),
+        "tsbs_phases_wall": round(tsbs_phases_wall, 3),
+        # Starting the pipeline and decompressing before tsbs starts its clock
+        "outside_tsbs": round(tsbs_phases_wall - tsbs_time, 3),
+        # The harness work that overlaps the window tsbs measures
+        "harness_cpu_in_tsbs": round(sum(phase["cpu"] for phase in tsbs_phases), 3),
+        "progress_seconds": round(sum(phase["progress_seconds"] for phase in tsbs_phases), 3)
+    }
+
+def average_timing(timing_list):
+    """
+    Averages the time and CPU spent in each phase over the runs
+
+    Parameters:
+        timing_list : list
+            The timing of each run, None for runs from before timing was recorded
+
+    Returns:
+        timing_dict : dict
+            The averages for each phase and for the harness overhead, and the timing of each run
+    """
+
+    timings = [timing for timing in timing_list if timing]
+    phase_dict = {}
+
+    for timing in timings:
+        for phase in timing["phases"]:
+            totals = phase_dict.setdefault(
+                phase["phase"], {"wall": 0.0, "cpu": 0.0, "children_cpu": 0.0}
+            )
+            totals["wall"] += phase["wall"]
+            totals["cpu"] += phase["cpu"]
+            totals["children_cpu"] += phase["children_user"] + phase["children_system"]
+
+    return {
+        "wall_avg": round(sum(timing["wall"] for timing in timings) / len(timings), 3),
+        "phases_avg": {
+            name: {key: round(value / len(timings), 3) for key, value in totals.items()}
+            for name, totals in phase_dict.items()
+        },
+        "outside_tsbs_avg": round(
+            sum(timing["outside_tsbs"] for timing in timings) / len(timings), 3
+        ),
+        "harness_cpu_in_tsbs_avg": round(
+            sum(timing["harness_cpu_in_tsbs"] for timing in timings) / len(timings), 3
+        ),
+        "children_maxrss_kb": max(
+            phase["children_maxrss_kb"] for timing in timings for phase in timing["phases"]
+        ) if any(timing["phases"] for timing in timings) else 0,
+        "timing_run": timings
+    }
+
+def apply_run_policy(args, db_setup, run):
+    """
+    Resets the database before the run if the run policy makes it a cold run
+    Writes drop the data, reads only empty the caches so the data is still there to query
+
+    Parameters:
+        args : argparse.Namespace
+            The list of inline arguments given to the program
+        db_setup : dict
+            The dict with all metadata about the selected database
+        run : int
+            The run number, starting at 0
+
+    Returns:
+        state_dict : dict
+            The state of the run, cold or warm, and what the reset did
+
+    Raises:
+        RuntimeError
+            If the database could not be reset
+    """
+
+    cold = (
+        args.run_policy == "cold" or
+        (args.run_policy == "cold-first" and run == 0) or
+        (args.run_policy == "alternate" and run % 2 == 0)
+    )
+
+    if not cold:
+        return {"state": "warm"}
+
+    harness_metrics.set_phase("reset")
+
+    if args.operation == "write":
+        print("Resetting " + args.format + " for a cold run")
+        hook_dict = engine_hooks.reset(args.format, db_setup[args.format]["hook_config"])
+    else:
+        print("Flushing the caches of " + args.format + " for a cold run")
+        hook_dict = engine_hooks.flush(args.format, db_setup[args.format]["hook_config"])
+
+        if args.drop_page_cache:
+            hook_dict["actions"].extend(engine_hooks.drop_page_cache())
+
+    return {"state": "cold", "reset": hook_dict}
+
+def run_cache_phases(path_dict, args, db_setup, timeout):
+    """
+    Runs the same query file with the caches emptied first, and then again with the
+    caches filled by the earlier runs
+
+    Parameters:
+        path_dict : dict
+            A dict with the path to TSBS, the use_case, and the file name
+        args : argparse.Namespace
+            The list of inline arguments given to the program
+        db_setup : dict
+            The dict with all metadata about the selected database
+        timeout : int
+            The seconds each phase is allowed to take, None for no limit
+
+    Returns:
+        cold_return_dict : dict
+            The dict from handle_query for the cold phase, with a list of
+            the dicts for the hot phases
+    """
+
+    try:
+        harness_metrics.set_phase("reset")
+        print("Flushing the caches of " + args.format + " for the cold phase")
+        flush_dict = engine_hooks.flush(args.format, db_setup[args.format]["hook_config"])
+
+        if args.drop_page_cache:
+            flush_dict["actions"].extend(engine_hooks.drop_page_cache())
+    except RuntimeError as error:
+        print("Could not flush the caches: " + str(error))
+        pathlib.Path(get_file_path(path_dict)).unlink()
+
+        return {"error": str(error)}
+
+    print("Cold phase")
+    cold_return_dict = process_tsbs(path_dict, args, db_setup, timeout, keep_file=True)
+    cold_return_dict.update({"flush": flush_dict, "hot": []})
+
+    # Replays the identical file, unless the cold phase did not finish
+    if "error" not in cold_return_dict and "timeout" not in cold_return_dict:
+        for hot_run in range(args.hot_runs):
+            print("Hot phase " + str(hot_run + 1))
+            cold_return_dict["hot"].append(
+                process_tsbs(path_dict, args, db_setup, timeout, keep_file=True)
+            )
+
+    harness_metrics.set_phase("cleanup")
+    pathlib.Path(get_file_path(path_dict)).unlink()
+
+    return cold_return_dict
+
+def collect_runs(checkpoint, args):
+    """
+    Collects the runs saved in the checkpoint into lists per use case or query type
+
+    Parameters:
+        checkpoint : dict
+            The dict with the results and errors of every run so far
+        args : argparse.Namespace
+            The list of inline arguments given to the program
+
+    Returns:
+        db_runs_dict : dict
+            A dictionary containing all the data about all the runs; time/run,
+            metrics/sec, rows/sec, and total metrics and rows; or queries/sec
+    """
+
+    db_runs_dict = {}
+
+    for key_name in list(checkpoint["runs"]) + list(checkpoint["errors"]):
+        if key_name in db_runs_dict:
+            continue
+
+        runs = checkpoint["runs"].get(key_name, {})
+        errors = checkpoint["errors"].get(key_name, {})
+
+        # Runs are stored by run number, and may have finished out of order on resume
+        run_list = [runs[run] for run in sorted(runs, key=int)]
+        db_runs_dict[key_name] = {
+            "t_run": [],
+            "errors": {str(int(run) + 1): errors[run] for run in sorted(errors, key=int)}
+        }
+
+        if args.operation == "write":
+            db_runs_dict[key_name].update({
+                "metrics": [run["metrics"] for run in run_list],
+                "rows": [run["rows"] for run in run_list],
+                "total_metrics": run_list[0]["totals"][0] if run_list else 0,
+                "total_rows": run_list[0]["totals"][1] if run_list else 0
+            })
+            db_runs_dict[key_name]["t_run"] = [run["time"] for run in run_list]
+            db_runs_dict[key_name]["state"] = [run.get("state", "warm") for run in run_list]
+            db_runs_dict[key_name]["totals"] = [run["totals"] for run in run_list]
+            db_runs_dict[key_name]["stream"] = [run.get("stream") for run in run_list]
+            db_runs_dict[key_name]["timing"] = [run.get("timing") for run in run_list]
+
+        elif args.operation == "read":
+            finished = [run for run in run_list if "timeout" not in run]
+            db_runs_dict[key_name].update({
+                "use_case": run_list[0]["use_case"] if run_list else "",
+                "queries": [run["query"] for run in finished],
+                "timeouts": len(run_list) - len(finished)
+            })
+            db_runs_dict[key_name]["t_run"] = [run["time"] for run in finished]
+            db_runs_dict[key_name]["state"] = [run.get("state", "warm") for run in finished]
+            db_runs_dict[key_name]["latency"] = [run.get("latency_ms") for run in finished]
+            db_runs_dict[key_name]["timing"] = [run.get("timing") for run in finished]
+            db_runs_dict[key_name]["digest"] = [run.get("digest") for run in finished]
+
+            # The hot phases of all runs, for the cold-hot read mode
+            hot_finished = [
+                hot for run in finished for hot in run.get("hot", [])
+                if "error" not in hot and "timeout" not in hot
+            ]
+            db_runs_dict[key_name]["hot"] = {
+                "t_run": [hot["time"] for hot in hot_finished],
+                "queries": [hot["query"] for hot in hot_finished],
+                "latency": [hot.get("latency_ms") for hot in hot_finished]
+            }
+
+    return db_runs_dict
+
+def get_checkpoint_metadata(args):
+    """
+    Creates the arguments a checkpoint has to match to be resumed
+
+    Parameters:
+        args : argparse.Namespace
+            The list of inline arguments given to the program
+
+    Returns:
+        checkpoint_metadata : dict
+            The arguments that decide what data and queries each run uses
+    """
+
+    return {
+        "db_engine": args.format,
+        "operation": args.operation,
+        "use_case": args.use_case,
+        "scale": args.scale,
+        "seed": args.seed,
+        "workers": args.workers,
+        "runs": args.runs,
+        "batch": args.batch,
+        "log_time": args.log_time,
+        "time": args.time,
+        "read_queries": args.queries,
+        "run_policy": args.run_policy,
+        "read_mode": args.read_mode,
+        "hot_runs": args.hot_runs,
+        "response_digest": args.response_digest
+    }
+
+def load_checkpoint(checkpoint_file, args):
+    """
+    Creates the checkpoint for this invocation, from the checkpoint file if resuming
+
+    Parameters:
+        checkpoint_file : str
+            The file the checkpoint is saved to
+        args : argparse.Namespace
+            The list of inline arguments given to the program
+
+    Returns:
+        checkpoint : dict
+            The dict with the results and errors of every run so far, and its file
+    """
+
+    checkpoint = {
+        "file": checkpoint_file,
+        "metadata": get_checkpoint_metadata(args),
+        "runs": {},
+        "errors": {}
+    }
+
+    if not args.resume:
+        return checkpoint
+
+    try:
+        with open(checkpoint_file, "r", encoding="ASCII") as f:
+            saved_checkpoint = json.load(f)
+    except FileNotFoundError:
+        print("No checkpoint in " + checkpoint_file + ", starting from the first run")
+        return checkpoint
+
+    if saved_checkpoint["metadata"] != checkpoint["metadata"]:
+        sys.exit("The checkpoint " + checkpoint_file + " was made with other arguments")
+
+    checkpoint["runs"] = saved_checkpoint["runs"]
+    checkpoint["errors"] = saved_checkpoint["errors"]
+
+    print(
+        "Resuming from " + checkpoint_file + " with " +
+        str(sum(len(runs) for runs in checkpoint["runs"].values())) + " finished runs"
+    )
+
+    return checkpoint
+
+def save_checkpoint(checkpoint):
+    """
+    Saves the checkpoint, replacing the file in one step so a crash can not leave half a file
+
+    Parameters:
+        checkpoint : dict
+            The dict with the results and errors of every run so far, and its file
+    """
+
+    temp_file = checkpoint["file"] + ".tmp"
+
+    with open(temp_file, "w", encoding="ASCII") as f:
+        json.dump(checkpoint, f, indent=4)
+
+    os.replace(temp_file, checkpoint["file"])
+
+def get_read_dict(path_dict, args, db_setup, query_suites):
+    """
+    Creates the query types to run for the selected use cases, skipping the
+    query types the database does not support
+
+    Parameters:
+        path_dict : dict
+            A dict with the path to TSBS, and the use_case
+        args : argparse.Namespace
+            The list of inline arguments given to the program
+        db_setup : dict
+            The dict with all metadata about the selected database
+        query_suites : dict
+            A dict with the query types and their timeouts for each use case
+
+    Returns:
+        read_dict : dict
+            A dict with the query type, use case, file number and timeout for each
+            JSON safe query name
+    """
+
+    read_dict = {}
+
+    for file_number, use_case in enumerate(path_dict["use_case"]):
+        for query_name, query in query_suites[use_case].items():
+            if query["query"] in db_setup[args.format]["unsupported_queries"]:
+                print("Skipping " + query["query"] + ", not supported by " + args.format)
+                continue
+
+            read_dict[query_name] = {
+                "query": query["query"],
+                "use_case": use_case,
+                "file_number": file_number,
+                "timeout": args.query_timeout if args.query_timeout else query["timeout"]
+            }
+
+    return read_dict
+
+def codec_benchmark(path_dict, args, timestamps):
+    """
+    Measures the compression ratio and throughput of every installed codec on a generated
+    dataset, and whether decompressing is faster than the database loads the data
+
+    Parameters:
+        path_dict : dict
+            A dict with the path to TSBS, and the use_case
+        args : argparse.Namespace
+            The list of inline arguments given to the program
+        timestamps : dict
+            A dict with the timestamps
+
+    Returns:
+        codec_bench_dict : dict
+            The dataset size and the results for each codec
+    """
+
+    # Generates the first run of the first use case, without compression
+    write_args = copy.copy(args)
+    write_args.operation = "write"
+    write_args.codec = "none"
+    write_args.byte_accounting = False
+
+    path_dict = dict(path_dict, codec=get_codec(write_args))
+    path_dict["test_file"] = args.format + "_codec_bench_" + path_dict["use_case"][0]
+
+    generate_files(path_dict, write_args, timestamps, {"file_number": 0, "run": 0}, {})
+
+    raw_path = pathlib.Path(get_file_path(path_dict))
+    raw_bytes = raw_path.stat().st_size
+
+    if raw_bytes == 0:
+        raw_path.unlink()
+        sys.exit("No data was generated for the codec benchmark")
+
+    # The rate the loader consumed the same dataset at, from an earlier write with the same arguments
+    loader_bytes_sec = None
+    try:
+        with open(get_output_file(write_args), "r", encoding="ASCII") as f:
+            loader_bytes_sec = raw_bytes / json.load(f)[path_dict["use_case"][0]]["time_avg"]
+    except (FileNotFoundError, KeyError, ZeroDivisionError):
+        print("No write results for this dataset, not comparing against the loader")
+
+    codec_bench_dict = {
+        "dataset": {
+            "use_case": path_dict["use_case"][0],
+            "bytes": raw_bytes,
+            "loader_bytes_sec": round(loader_bytes_sec) if loader_bytes_sec else None
+        },
+        "codecs": {}
+    }
+
+    for codec in ["gzip", "pigz", "zstd", "lz4"]:
+        codec_args = copy.copy(args)
+        codec_args.codec = codec
+        codec_dict = get_codec(codec_args)
+
+        if not codec_installed(codec_dict):
+            print("Skipping " + codec + ", not installed")
+            continue
+
+        compressed_path = str(raw_path) + codec_dict["extension"]
+
+        print("Compressing with " + codec)
+        start = time.monotonic()
+        subprocess.run(
+            codec_dict["compress"] + " < " + str(raw_path) + " > " + compressed_path,
+            shell=True, check=True
+        )
+        compress_time = time.monotonic() - start
+
+        print("Decompressing with " + codec)
+        start = time.monotonic()
+        subprocess.run(
+            codec_dict["decompress"] + " < " + compressed_path + " > /dev/null",
+            shell=True, check=True
+        )
+        decompress_time = time.monotonic() - start
+
+        compressed_bytes = pathlib.Path(compressed_path).stat().st_size
+        pathlib.Path(compressed_path).unlink()
+
+        codec_bench_dict["codecs"][codec] = {
+            "bytes": compressed_bytes,
+            "ratio": round(raw_bytes / compressed_bytes, 2),
+            "compress_time": round(compress_time, 3),
+            "compress_bytes_sec": round(raw_bytes / compress_time),
+            "decompress_time": round(decompress_time, 3),
+            "decompress_bytes_sec": round(raw_bytes / decompress_time)
+        }
+
+        # Above 1 the decompression can feed the loader faster than the database consumes
+        if loader_bytes_sec:
+            codec_bench_dict["codecs"][codec]["loader_headroom"] = round(
+                raw_bytes / decompress_time / loader_bytes_sec, 2
+            )
+
+    raw_path.unlink()
+
+    return codec_bench_dict
+
+def retention_handler(path_dict, args, db_setup, timestamps, query_suites):
+    """
+    Runs the retention workload on the first use case
+    The database is reset and loaded with all but one of the retention windows, then the
+    last window is loaded with the query running, as the baseline
+    Each run then loads the next window with the query running, and deletes the oldest window
+    while they run, like a rolling retention
+
+    Parameters:
+        path_dict : dict
+            A dict with the path to TSBS, and the use_case
+        args : argparse.Namespace
+            The list of inline arguments given to the program
+        db_setup : dict
+            The dict with all metadata about the selected database
+        timestamps : dict
+            A dict with the timestamps, one window each
+        query_suites : dict
+            A dict with the query types and their timeouts for each use case
+
+    Returns:
+        retention_dict : dict
+            The baseline, each run with the delete, disk usage, ingest and query,
+            and a summary of the impact of the deletes
+
+    Raises:
+        RuntimeError
+            If the database could not be reset, or the preloading failed
+    """
+
+    use_case = path_dict["use_case"][0]
+    hook_config = db_setup[args.format]["hook_config"]
+    query = get_retention_query(args, db_setup, query_suites, use_case)
+
+    harness_metrics.set_run(args.format, "retention", use_case, 0, args.runs)
+    harness_metrics.set_phase("reset")
+    print("Resetting " + args.format + " before the retention workload")
+
+    retention_dict = {
+        "windows": args.retention_windows,
+        "query": query["name"] if query else None,
+        "reset": engine_hooks.reset(args.format, hook_config)
+    }
+
+    write_args = copy.copy(args)
+    write_args.operation = "write"
+    ingest_path = dict(path_dict, test_file=args.format + "_retention_" + use_case)
+
+    # Only the first load after the reset creates the database, the rest add their window to it
+    retention_dict["preload_disk"] = []
+    for window in range(args.retention_windows - 1):
+        print("Preloading window " + str(window + 1) + ": " + timestamps[str(window)][0])
+        generate_files(
+            ingest_path, write_args, timestamps,
+            {"file_number": 0, "run": 0, "window": timestamps[str(window)]}, {}
+        )
+        preload_dict = process_tsbs(ingest_path, write_args, db_setup, create_db=window == 0)
+        if "error" in preload_dict:
+            raise RuntimeError("Preloading failed: " + preload_dict["error"])
+        retention_dict["preload_disk"].append(get_disk_usage(hook_config))
+
+    harness_metrics.set_run(args.format, "retention", use_case, 0, args.runs)
+    print("Baseline: loading window " + str(args.retention_windows) + " without deleting")
+    retention_dict["baseline"] = run_retention_phase(
+        path_dict, args, db_setup, timestamps, query, args.retention_windows - 1, None,
+        args.retention_windows == 1
+    )
+
+    retention_dict["runs"] = []
+    for run in range(args.runs):
+        print("Run number: " + str(run+1))
+        harness_metrics.set_run(args.format, "retention", use_case, run + 1, args.runs)
+        retention_dict["runs"].append(run_retention_phase(
+            path_dict, args, db_setup, timestamps, query, args.retention_windows + run, run
+        ))
+
+    harness_metrics.set_phase("done")
+
+    retention_dict["summary"] = summarize_retention(
+        retention_dict["baseline"], retention_dict["runs"], retention_dict["preload_disk"]
+    )
+
+    if retention_dict["summary"].get("disk_grows") is False:
+        print(
+            "The disk usage did not grow with each window loaded, " +
+            "so the database may not hold all " + str(args.retention_windows) + " windows"
+        )
+
+    return retention_dict
+
+def get_retention_query(args, db_setup, query_suites, use_case):
+    """
+    Finds the query type to run alongside the retention workload
+
+    Parameters:
+        args : argparse.Namespace
+            The list of inline arguments given to the program
+        db_setup : dict
+            The dict with all metadata about the selected database
+        query_suites : dict
+            A dict with the query types and their timeouts for each use case
+        use_case : str
+            The use case of the workload
+
+    Returns:
+        query : dict
+            The query type, its timeout and its JSON safe name, None for no queries
+    """
+
+    if args.retention_query == "none":
+        return None
+
+    for query_name, query in query_suites[use_case].items():
+        if query["query"] in db_setup[args.format]["unsupported_queries"]:
+            continue
+
+        # The first supported query type, if none was chosen
+        if args.retention_query in [None, query_name, query["query"]]:
+            return dict(query, name=query_name)
+
+    sys.exit(
+        "No query type " + str(args.retention_query) + " for " + use_case +
+        " that " + args.format + " supports"
+    )
+
+def run_retention_phase(
+    path_dict, args, db_setup, timestamps, query, load_window, delete_window, create_db=False
+):
+    """
+    Loads a window with the query running against the newest complete window,
+    and deletes the oldest window while they run
+
+    Parameters:
+        path_dict : dict
+            A dict with the path to TSBS, and the use_case
+        args : argparse.Namespace
+            The list of inline arguments given to the program
+        db_setup : dict
+            The dict with all metadata about the selected database
+        timestamps : dict
+            A dict with the timestamps, one window each
+        query : dict
+            The query type to run, None for no queries
+        load_window : int
+            The window to load
+        delete_window : int
+            The window to delete, None for the baseline
+        create_db : bool
+            Lets tsbs_load create the database, when it is the first load after the reset
+
+    Returns:
+        phase_dict : dict
+            The windows, the delete, the disk usage, and the ingest and query results
+    """
+
+    use_case = path_dict["use_case"][0]
+    hook_config = db_setup[args.format]["hook_config"]
+
+    write_args = copy.copy(args)
+    write_args.operation = "write"
+    read_args = copy.copy(args)
+    read_args.operation = "read"
+
+    ingest_path = dict(path_dict, test_file=args.format + "_retention_" + use_case)
+    generate_files(
+        ingest_path, write_args, timestamps,
+        {"file_number": 0, "run": 0, "window": timestamps[str(load_window)]}, {}
+    )
+
+    results = {}
+    # Only the ingest drives the phase, progress and timing of the run
+    threads = [threading.Thread(
+        target=run_tsbs_thread,
+        args=(results, "ingest", False, ingest_path, write_args, db_setup),
+        kwargs={"create_db": create_db}
+    )]
+
+    if query:
+        query_path = dict(
+            path_dict,
+            test_file=args.format + "_retention_" + query["name"],
+            active_use_case=use_case
+        )
+        generate_files(
+            query_path, read_args, timestamps,
+            {
+                "file_number": 0,
+                "run": load_window,
+                "window": [timestamps[str(load_window - 1)][0], timestamps[str(load_window)][0]]
+            },
+            {"query": query["query"], "query_name": query["name"]}
+        )
+        threads.append(threading.Thread(
+            target=run_tsbs_thread,
+            args=(results, "query", True, query_path, read_args, db_setup, query["timeout"])
+        ))
 
-def handle_query(output):
-    """
-    For formatting the output from the query
+    phase_dict = {"window": timestamps[str(load_window)]}
 
-    Parameters:
-        output : str
+    for thread in threads:
+        thread.start()
 
-    Returns:
-        query_return_dict : dict
-            A dict with the query amount and time
-    """
+    phase_dict["disk"] = {"before": get_disk_usage(hook_config)}
 
-    last_line = ""
-    query_match = 0
+    if delete_window is not None:
+        # Lets the ingest and queries get going before the delete
+        time.sleep(args.delete_delay)
 
-    output_lines = output.stdout.strip().split("\n")
+        phase_dict["deleted_window"] = [
+            timestamps[str(delete_window)][0], timestamps[str(delete_window + 1)][0]
+        ]
+        phase_dict["disk"]["before"] = get_disk_usage(hook_config)
 
-    for line in output_lines:
-        if "(" in line and ")" in line:
-            # Finds all floats to grab the time per run
-            found_query = re.findall(r"-?\d+\.\d+", line)
+        print("Deleting " + " to ".join(phase_dict["deleted_window"]) + " from " + args.format)
+        try:
+            phase_dict["delete"] = engine_hooks.delete(
+                args.format, hook_config, *phase_dict["deleted_window"]
+            )
+        except RuntimeError as error:
+            print("Could not delete the window: " + str(error))
+            phase_dict["delete"] = {"error": str(error)}
 
-            if found_query:
-                query_match = int(round(float(found_query[0])))
+        phase_dict["disk"]["after_delete"] = get_disk_usage(hook_config)
 
-        last_line = line
+    for thread in threads:
+        thread.join()
 
-    query_return_dict = {
-        "query": query_match,
-        "time": round(float(re.findall(r"-?\d+\.\d+", last_line)[0]), 2)
-    }
+    phase_dict["disk"]["after_run"] = get_disk_usage(hook_config)
+    phase_dict.update(results)
+    phase_dict["timing"] = harness_metrics.end_run()
 
-    return query_return_dict
+    return phase_dict
 
-def create_averages(db_dict, args):
+def run_tsbs_thread(results, key, quiet, *process_args, **process_kwargs):
     """
-    Creates the averages for each file per metrics, rows and time for load
-    and for time and queries for read
+    Runs process_tsbs on its own thread, keeping the result, or the error if it raised
 
     Parameters:
-        db_dict : dict
-            A dictionary containing all the data about all the runs; time/run, metrics/sec, 
-            rows/sec, and total metrics and rows; or queries/sec
-    
-    Returns:
-        avg_runs_dict : dict
-            The same dict as db, but including the average time/run/file, metrics/sec/file, 
-            and rows/sec/file; or queries/sec/file
+        results : dict
+            Where the result is kept
+        key : str
+            The key of the result, ingest or query
+        quiet : bool
+            Leaves the phase, progress and timing of the run to the other thread
+        process_args : tuple
+            The arguments for process_tsbs
+        process_kwargs : dict
+            The keyword arguments for process_tsbs
     """
 
-    avg_runs_dict = {}
-    for file in db_dict:
-        avg_runs_dict[file] = {}
-        if args.operation == "write":
-            avg_runs_dict[file].update({
-                "time_run": db_dict[file]["t_run"],
-                "time_avg": round(sum(db_dict[file]["t_run"]) / len(db_dict[file]["t_run"]), 2),
-                "metrics_sec": db_dict[file]["metrics"], 
-                "total_metrics": db_dict[file]["total_metrics"],
-                "metrics_avg": sum(db_dict[file]["metrics"]) // len(db_dict[file]["metrics"]),
-                "rows_sec": db_dict[file]["rows"], 
-                "total_rows": db_dict[file]["total_rows"],
-                "rows_avg": sum(db_dict[file]["rows"]) // len(db_dict[file]["rows"])
-            })
-        elif args.operation == "read":
-            avg_runs_dict[file].update({
-                "time_run": db_dict[file]["t_run"],
-                "time_avg": round(sum(db_dict[file]["t_run"]) / len(db_dict[file]["t_run"]), 2),
-                "queries_sec": db_dict[file]["queries"],
-                "queries_avg": sum(db_dict[file]["queries"]) // len(db_dict[file]["queries"])
-            })
+    harness_metrics.set_quiet(quiet)
 
-    return avg_runs_dict
+    try:
+        results[key] = process_tsbs(*process_args, **process_kwargs)
+    except Exception as error: # pylint: disable=broad-exception-caught
+        print("The " + key + " failed: " + repr(error))
+        results[key] = {"error": type(error).__name__ + ": " + str(error)}
 
-def running_handler(path_dict, args, db_setup, timestamps, read_dict):
+def get_disk_usage(hook_config):
     """
-    Runs the TSBS scripts for ingesting and querying data
+    Measures the disk used by the data directory of the database
 
     Parameters:
-        path_dict : dict
-            A dict with the path to TSBS, and the use_case
-        args : argparse.Namespace
-            The list of inline arguments given to the program
-        db_setup : dict
-            The dict with all metadata about the selected database
-        timestamps : dict
-            A dict with the timestamps
-        read_dict : dict
-            A dict containing all the different query types
+        hook_config : dict
+            The config of the database, with its data directory
 
     Returns:
-        db_runs_dict : dict
-            A dictionary containing all the data about all the runs; time/run, 
-            metrics/sec, rows/sec, and total metrics and rows
+        used : int
+            The bytes used, None if the directory could not be read
     """
 
-    use_dict = {}
-    db_runs_dict = {}
-    file_number = 0
-
-    if args.operation == "write":
-        use_dict = path_dict["use_case"]
-    elif args.operation == "read":
-        use_dict = read_dict
-
+    try:
+        return engine_hooks.disk_usage(hook_config["data_dir"])
+    except RuntimeError as error:
+        print("No disk usage: " + str(error))
+        return None
 
-    for key_name in use_dict:
-        path_dict["test_file"] = args.format + "_" + key_name
-        print("Running with " + path_dict["test_file"])
+def summarize_retention(baseline, runs, preload_disk):
+    """
+    Compares the runs with deletes against the baseline without
 
-        for run in range(args.runs):
-            print("Run number: " + str(run+1))
+    Parameters:
+        baseline : dict
+            The phase that loaded the last window without deleting
+        runs : list
+            The phases that deleted the oldest window
+        preload_disk : list
+            The disk usage after each preloaded window
 
-            if args.operation == "write":
-                run_dict = {"file_number": file_number, "run": run}
-                query_dict = {}
+    Returns:
+        summary_dict : dict
+            The delete time, space reclaimed, the ingest and query speed against the baseline,
+            and if the disk usage grew with each window loaded before the deletes
+    """
 
-                generate_files(path_dict, args, timestamps, run_dict, query_dict)
+    summary_dict = {}
 
-                load_return_dict = process_tsbs(path_dict, args, db_setup)
+    # Each load before the deletes adds a window, so the disk usage grows with each of them.
+    # If it does not, a load replaced the data and the deletes ran on fewer windows
+    disk = preload_disk + [baseline["disk"]["after_run"]]
+    if len(disk) > 1 and None not in disk:
+        summary_dict["disk_grows"] = all(
+            before < after for before, after in zip(disk, disk[1:])
+        )
 
-                if run == 0:
-                    db_runs_dict[key_name] = {
-                        "t_run": [load_return_dict["time"]], 
-                        "metrics": [load_return_dict["metrics"]], 
-                        "total_metrics": load_return_dict["totals"][0], 
-                        "rows": [load_return_dict["rows"]], 
-                        "total_rows": load_return_dict["totals"][1] 
-                    }
-                else:
-                    db_runs_dict[key_name]["t_run"].append(load_return_dict["time"])
-                    db_runs_dict[key_name]["metrics"].append(load_return_dict["metrics"])
-                    db_runs_dict[key_name]["rows"].append(load_return_dict["rows"])
+    deletes = [run["delete"]["seconds"] for run in runs if "seconds" in run.get("delete", {})]
+    if deletes:
+        summary_dict["delete_seconds_avg"] = round(sum(deletes) / len(deletes), 2)
+
+    # One window grows the disk by this much when nothing is deleted
+    baseline_disk = baseline["disk"]
+    if baseline_disk["before"] is not None and baseline_disk["after_run"] is not None:
+        window_bytes = baseline_disk["after_run"] - baseline_disk["before"]
+        reclaimed = [
+            run["disk"]["before"] + window_bytes - run["disk"]["after_run"]
+            for run in runs
+            if run["disk"]["before"] is not None and run["disk"]["after_run"] is not None
+        ]
+        summary_dict["window_bytes"] = window_bytes
+        if reclaimed:
+            summary_dict["reclaimed_run"] = reclaimed
+            summary_dict["reclaimed_avg"] = sum(reclaimed) // len(reclaimed)
+
+    ingest = [run["ingest"]["rows"] for run in runs if "rows" in run.get("ingest", {})]
+    if ingest and "rows" in baseline.get("ingest", {}):
+        summary_dict["baseline_rows_sec"] = baseline["ingest"]["rows"]
+        summary_dict["rows_sec_avg"] = sum(ingest) // len(ingest)
+        # Above 1 when the deletes slowed down the ingest
+        summary_dict["ingest_slowdown"] = round(
+            baseline["ingest"]["rows"] / summary_dict["rows_sec_avg"], 2
+        ) if summary_dict["rows_sec_avg"] else None
+
+    latency = [run["query"]["latency_ms"] for run in runs if "latency_ms" in run.get("query", {})]
+    if latency and "latency_ms" in baseline.get("query", {}):
+        summary_dict["baseline_latency_ms"] = baseline["query"]["latency_ms"]
+        summary_dict["latency_ms_avg"] = round(sum(latency) / len(latency), 2)
+        # Above 1 when the deletes slowed down the queries
+        summary_dict["query_latency_ratio"] = round(
+            summary_dict["latency_ms_avg"] / baseline["query"]["latency_ms"], 2
+        ) if baseline["query"]["latency_ms"] else None
+
+    return summary_dict
+
+def get_output_file(args):
+    """
+    Creates the name of the JSON output file
 
-            elif args.operation == "read":
-                run_dict = {"file_number": 0, "run": run}
-                query_dict = {"query": read_dict[key_name], "query_name": key_name}
+    Parameters:
+        args : argparse.Namespace
+            The list of inline arguments given to the program
 
-                generate_files(path_dict, args, timestamps, run_dict, query_dict)
+    Returns:
+        output_file : str
+            The name of the output file
+    """
 
-                query_return_dict = process_tsbs(path_dict, args, db_setup)
+    output_file = "tsbs_" + args.format
 
-                if run == 0:
-                    db_runs_dict[key_name] = {
-                        "t_run": [query_return_dict["time"]],
-                        "queries": [query_return_dict["query"]]
-                    }
-                else:
-                    db_runs_dict[key_name]["t_run"].append(query_return_dict["time"])
-                    db_runs_dict[key_name]["queries"].append(query_return_dict["query"])
+    if args.operation == "write":
+        output_file += "_write"
+    elif args.operation == "read":
+        output_file += "_read"
+    elif args.operation == "codec-bench":
+        output_file += "_codec"
+    elif args.operation == "retention":
+        output_file += "_retention"
 
-        print("All " + str(args.runs)+ " runs completed\n")
-        file_number += 1
+    output_file += (
+        "_s" + str(args.scale) +
+        "_w" + str(args.workers) +
+        "_q" + str(args.queries) +
+        ".json"
+    )
 
-    return db_runs_dict
+    return output_file
 
 def create_timestamps(args):
     """
@@ -388,7 +1861,12 @@ def create_timestamps(args):
     datestamp = datetime.datetime(year_month_list[0], year_month_list[1], 1)
     start_date = str(datestamp).split(" ", maxsplit=1)[0]
 
-    for i in range(args.runs*2):
+    # The retention workload needs a day for each window, each run, and the end of the last
+    days = args.runs*2
+    if args.operation == "retention":
+        days = max(days, args.retention_windows + args.runs + 1)
+
+    for i in range(days):
         date_str = str(datestamp).split(" ", maxsplit=1)[0]
         timestamps[str(i)] = [date_str + "T00:00:00Z", date_str + "T23:59:59Z"]
 
@@ -396,10 +1874,14 @@ def create_timestamps(args):
 
     return start_date, timestamps
 
-def handle_args():
+def handle_args(argv=None):
     """
     Handles the inline arguments for the running of the file
 
+    Parameters:
+        argv : list
+            The arguments to parse, None for the command line
+
     Returns:
         args : argparse.Namespace
             The object with the arguments, it handles arguments...
@@ -438,24 +1920,37 @@ def handle_args():
     parser.add_argument(
         "-f", 
         "--format", 
-        help="The database format, REQUIRED",
-        choices=["influx", "questdb", "timescaledb", "victoriametrics"],
+        help="The database formats, REQUIRED, one or more of\n"
+        "influx, questdb, timescaledb and victoriametrics, separated by spaces or commas",
+        nargs="+",
         required=True,
         type=str
     )
+    parser.add_argument(
+        "--engine_order",
+        help="The order several engines load a shared dataset in each run, default=fixed\n"
+        "fixed: the order given to --format\n"
+        "random: shuffled for each run with the seed and run number",
+        choices=["fixed", "random"],
+        default="fixed",
+        type=str
+    )
     parser.add_argument(
         "-o",
         "--operation",
-        help="Which type of operation you want to run, REQUIRED",
-        choices=["read", "write"],
+        help="Which type of operation you want to run, REQUIRED\n"
+        "codec-bench compares the codecs for the generated files on one generated dataset\n"
+        "retention deletes the oldest day of data while the next day is loaded and queried",
+        choices=["read", "write", "codec-bench", "retention"],
         required=True,
         type=str
     )
     parser.add_argument(
         "-u",
         "--use_case",
-        help="If you only want to ingest one use case",
-        choices=["devops", "iot"],
+        help="If you only want to ingest one use case,\n"
+        "netmon is generated by nettelemetry.py and only runs when chosen",
+        choices=["devops", "iot", "netmon"],
         type=str
     )
 
@@ -524,6 +2019,27 @@ def handle_args():
         type=int
     )
 
+    parser.add_argument(
+        "--byte_accounting",
+        help="Counts the bytes, rows, metrics and series of the generated data on its way\n"
+        "to the loader, for bytes/sec ingested and bytes per row",
+        action="store_true"
+    )
+    parser.add_argument(
+        "-c",
+        "--codec",
+        help="The compression for the generated files, default=gzip\n"
+        "pigz and zstd compress on several threads",
+        choices=["none", "gzip", "pigz", "zstd", "lz4"],
+        default="gzip",
+        type=str
+    )
+    parser.add_argument(
+        "--codec_threads",
+        help="The threads for pigz and zstd, default is all cores",
+        type=int
+    )
+
     # Arguments for query generation
     parser.add_argument(
         "-q",
@@ -531,14 +2047,140 @@ def handle_args():
         help="The number of queries to be ran, default=5000",
         type=int
     )
+    parser.add_argument(
+        "--query_timeout",
+        help="The seconds each query type may run before it is stopped, overrides the\n"
+        "per query type default",
+        type=int
+    )
+
+    # Arguments for resetting the database between runs
+    parser.add_argument(
+        "--run_policy",
+        help="Which runs are cold, the database is reset before a cold run, default=warm\n"
+        "warm: no resets, cold: every run, cold-first: the first run of each use case,\n"
+        "alternate: every other run, starting with the first\n"
+        "Writes drop the benchmark data, reads only empty the database caches",
+        choices=["warm", "cold", "cold-first", "alternate"],
+        default="warm",
+        type=str
+    )
+    parser.add_argument(
+        "--db_url",
+        help="The URL or host of the database for the resets and the netmon queries,\n"
+        "default is the local database",
+        type=str
+    )
+    parser.add_argument(
+        "--restart_command",
+        help="The command that restarts the database to empty its caches before cold reads,\n"
+        "as in \"sudo systemctl restart questdb\", needed for every database but VictoriaMetrics",
+        type=str
+    )
+
+    parser.add_argument(
+        "--settle_time",
+        help="The seconds to wait after a reset before the run starts, default=10",
+        default=10,
+        type=int
+    )
+
+    parser.add_argument(
+        "--read_mode",
+        help="single: runs each query file once, default\n"
+        "cold-hot: runs each query file with emptied caches, then --hot_runs times again",
+        choices=["single", "cold-hot"],
+        default="single",
+        type=str
+    )
+    parser.add_argument(
+        "--hot_runs",
+        help="The number of hot replays of each query file in cold-hot mode, default=1",
+        default=1,
+        type=int
+    )
+    parser.add_argument(
+        "--drop_page_cache",
+        help="Also drops the OS page cache before cold reads, needs root",
+        action="store_true"
+    )
+
+    # Arguments for following the harness
+    parser.add_argument(
+        "--resume",
+        help="Continues from the checkpoint of an earlier invocation with the same arguments,\n"
+        "skipping the runs that already finished",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--metrics_port",
+        help="Serves live progress in the OpenMetrics format on this port at /metrics",
+        type=int
+    )
+    parser.add_argument(
+        "--metrics_address",
+        help="The address for the metrics endpoint, default=0.0.0.0",
+        default="0.0.0.0",
+        type=str
+    )
+    parser.add_argument(
+        "--retention_windows",
+        help="The days kept by the retention workload, at least 2, default=3",
+        default=3,
+        type=int
+    )
+    parser.add_argument(
+        "--retention_query",
+        help="The query type run alongside the retention workload, default is the first\n"
+        "the database supports for the use case, none for no queries",
+        type=str
+    )
+    parser.add_argument(
+        "--delete_delay",
+        help="The seconds the load and queries run before the oldest day is deleted, default=10",
+        default=10,
+        type=int
+    )
+    parser.add_argument(
+        "--data_dir",
+        help="The data directory of the database, for measuring the disk used,\n"
+        "default is where the setup guides put it",
+        type=str
+    )
+    parser.add_argument(
+        "--response_digest",
+        help="Digests the query responses to compare the results across databases,\n"
+        "and records their rows and bytes, printing the responses slows the queries",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--profile",
+        help="Profiles the harness itself with cProfile, writing <output file>.prof\n"
+        "and printing the functions with the most cumulative time",
+        action="store_true"
+    )
+
+    args = parser.parse_args(argv)
+
+    # The formats can be given separated by spaces or commas
+    args.formats = []
+    for value in args.format:
+        for engine in value.split(","):
+            if engine and engine not in args.formats:
+                args.formats.append(engine)
+
+    for engine in args.formats:
+        if engine not in ["influx", "questdb", "timescaledb", "victoriametrics"]:
+            parser.error("argument -f/--format: invalid choice: '" + engine + "'")
 
-    args = parser.parse_args()
+    # Each engine is run with its own copy of the arguments
+    args.format = args.formats[0]
 
     # Check if right arguments for the format
-    if args.format == "influx":
+    if "influx" in args.formats:
         if args.auth_token is None:
             sys.exit("Influx needs --auth_token")
-    elif args.format == "timescaledb":
+    if "timescaledb" in args.formats:
         if args.password is None:
             sys.exit("TimeScale needs --password")
         if args.db_name is None:
@@ -558,6 +2200,22 @@ def handle_args():
 
     args.queries = fix_args({"queries": args.queries})
 
+    if args.query_timeout is not None and args.query_timeout <= 0:
+        args.query_timeout = None
+
+    # Only VictoriaMetrics can empty its caches without a restart, without one the cold reads
+    # would be warm runs labelled cold
+    cold_reads = args.run_policy != "warm" or args.read_mode == "cold-hot"
+    if args.operation == "read" and cold_reads and not args.restart_command:
+        if any(engine != "victoriametrics" for engine in args.formats):
+            sys.exit("Cold reads need --restart_command to empty the caches of the database")
+
+    if args.operation == "retention":
+        if args.retention_windows < 2:
+            sys.exit("The retention workload needs at least 2 --retention_windows")
+        if "victoriametrics" in args.formats:
+            sys.exit("VictoriaMetrics can not delete a time window, only whole series")
+
     if not re.findall(r"\d\d\d\d-\d\d", args.time, re.IGNORECASE):
         args.time = "2025-01"
 
@@ -598,49 +2256,328 @@ def fix_args(argument_dict):
 
     return argument
 
-def main():
+def write_profile(profiler, output_file):
     """
-    Runs the program
+    Stops the profiler, writes the profile next to the output file, and prints the top functions
+
+    Parameters:
+        profiler : cProfile.Profile
+            The running profiler, None without --profile
+        output_file : str
+            The name of the output file
     """
 
-    args = handle_args()
+    if profiler is None:
+        return
 
-    # The database setups
-    db_setup = {
-        "influx": {"extra_args": [" --auth-token ", args.auth_token]},
-        "questdb": {"extra_args": []},
-        "timescaledb": {"extra_args": [" --db-name ", args.db_name, " --pass ", args.password]},
-        "victoriametrics": {"extra_args": []}
+    profiler.disable()
+
+    profile_file = str(pathlib.Path(output_file).with_suffix(".prof"))
+    profiler.dump_stats(profile_file)
+
+    print("Profile written to: " + profile_file)
+    pstats.Stats(profiler).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(25)
+
+def get_query_suites():
+    """
+    The query types for each use case, with the seconds each query file may run
+
+    Returns:
+        query_suites : dict
+            A dict with the query types and their timeouts for each use case
+    """
+
+    query_suites = {
+        "devops": {
+            "single_groupby_1_1_1": {"query": "single-groupby-1-1-1", "timeout": 600},
+            "single_groupby_1_1_12": {"query": "single-groupby-1-1-12", "timeout": 600},
+            "single_groupby_1_8_1": {"query": "single-groupby-1-8-1", "timeout": 600},
+            "single_groupby_5_1_1": {"query": "single-groupby-5-1-1", "timeout": 600},
+            "single_groupby_5_1_12": {"query": "single-groupby-5-1-12", "timeout": 600},
+            "single_groupby_5_8_1": {"query": "single-groupby-5-8-1", "timeout": 600},
+            "cpu_max_all_1": {"query": "cpu-max-all-1", "timeout": 600},
+            "cpu_max_all_8": {"query": "cpu-max-all-8", "timeout": 900},
+            "double_groupby_1": {"query": "double-groupby-1", "timeout": 900},
+            "double_groupby_5": {"query": "double-groupby-5", "timeout": 1200},
+            "double_groupby_all": {"query": "double-groupby-all", "timeout": 1800},
+            "high_cpu_1": {"query": "high-cpu-1", "timeout": 900},
+            "high_cpu_all": {"query": "high-cpu-all", "timeout": 1800},
+            "lastpoint": {"query": "lastpoint", "timeout": 1800},
+            "groupby_orderby_limit": {"query": "groupby-orderby-limit", "timeout": 1800}
+        },
+        "iot": {
+            "last_loc": {"query": "last-loc", "timeout": 900},
+            "low_fuel": {"query": "low-fuel", "timeout": 900},
+            "high_load": {"query": "high-load", "timeout": 900},
+            "stationary_trucks": {"query": "stationary-trucks", "timeout": 1200},
+            "long_driving_sessions": {"query": "long-driving-sessions", "timeout": 1800},
+            "long_daily_sessions": {"query": "long-daily-sessions", "timeout": 1800},
+            "avg_vs_projected_fuel_consumption": {
+                "query": "avg-vs-projected-fuel-consumption", "timeout": 1800
+            },
+            "avg_daily_driving_duration": {"query": "avg-daily-driving-duration", "timeout": 1800},
+            "avg_daily_driving_session": {"query": "avg-daily-driving-session", "timeout": 1800},
+            "avg_load": {"query": "avg-load", "timeout": 1200},
+            "daily_activity": {"query": "daily-activity", "timeout": 1800},
+            "breakdown_frequency": {"query": "breakdown-frequency", "timeout": 1800}
+        },
+        "netmon": {
+            "interface_rate_1h": {"query": "interface-rate-1h", "timeout": 900},
+            "topn_interfaces_1h": {"query": "topn-interfaces-1h", "timeout": 1200},
+            "site_rollup_1h": {"query": "site-rollup-1h", "timeout": 1800}
+        }
     }
 
-    read_dict = {
-        "single_groupby_1_1_1": "single-groupby-1-1-1", 
-        "single_groupby_1_1_12": "single-groupby-1-1-12", 
-        "single_groupby_1_8_1": "single-groupby-1-8-1", 
-        "single_groupby_5_1_1": "single-groupby-5-1-1", 
-        "single_groupby_5_1_12": "single-groupby-5-1-12", 
-        "single_groupby_5_8_1": "single-groupby-5-8-1", 
-        "cpu_max_all_1": "cpu-max-all-1", 
-        "cpu_max_all_8": "cpu-max-all-8", 
-        "double_groupby_1": "double-groupby-1", 
-        "double_groupby_5": "double-groupby-5", 
-        "double_groupby_all": "double-groupby-all"
+    return query_suites
+
+def get_db_setup(args, query_suites):
+    """
+    The database setups
+
+    Parameters:
+        args : argparse.Namespace
+            The list of inline arguments given to the program
+        query_suites : dict
+            A dict with the query types and their timeouts for each use case
+
+    Returns:
+        db_setup : dict
+            The dict with all metadata about each database
+    """
+
+    iot_queries = [query["query"] for query in query_suites["iot"].values()]
+
+    # unsupported_queries are the query types tsbs_generate_queries can not create
+    # for the database, they are skipped instead of failing the run
+    # hook_config is how engine_hooks reaches the database to reset it between runs
+    db_setup = {
+        "influx": {
+            "extra_args": [" --auth-token ", args.auth_token],
+            "unsupported_queries": [],
+            "hook_config": {
+                "url": args.db_url or "http://localhost:8086",
+                "restart_command": args.restart_command,
+                "ready_timeout": 300,
+                "token": args.auth_token,
+                "db_name": args.db_name or "benchmark",
+                "settle_time": args.settle_time,
+                "data_dir": args.data_dir or "/var/lib/influxdb"
+            }
+        },
+        "questdb": {
+            "extra_args": [],
+            "unsupported_queries": iot_queries,
+            "hook_config": {
+                "url": args.db_url or "http://localhost:9000",
+                "restart_command": args.restart_command,
+                "ready_timeout": 300,
+                "settle_time": args.settle_time,
+                "data_dir": args.data_dir or "/var/lib/questdb"
+            }
+        },
+        "timescaledb": {
+            "extra_args": [" --db-name ", args.db_name, " --pass ", args.password],
+            "unsupported_queries": [],
+            "hook_config": {
+                "host": args.db_url or "localhost",
+                "restart_command": args.restart_command,
+                "ready_timeout": 300,
+                "port": 5432,
+                "user": "postgres",
+                "password": args.password,
+                "db_name": args.db_name,
+                "settle_time": args.settle_time,
+                "data_dir": args.data_dir or "/var/lib/postgresql"
+            }
+        },
+        "victoriametrics": {
+            "extra_args": [],
+            "unsupported_queries": ["lastpoint", "groupby-orderby-limit"] + iot_queries,
+            "hook_config": {
+                "url": args.db_url or "http://localhost:8428",
+                "merge_timeout": 600,
+                "settle_time": args.settle_time,
+                "data_dir": args.data_dir or "/var/lib/victoria-metrics"
+            }
+        }
     }
 
+    return db_setup
+
+def main():
+    """
+    Runs the program
+    """
+
+    args = handle_args()
+
+    query_suites = get_query_suites()
+    db_setup = get_db_setup(args, query_suites)
+
     # The file path for where tsbs is stored, default is in the project folder
     # The use cases for the files
     path_dict = {
         "main_path": str(pathlib.Path(pathlib.Path.cwd(), "tsbs")),
-        "use_case": ["devops", "iot"]
+        "use_case": ["devops", "iot"],
+        "codec": get_codec(args)
     }
 
+    if not codec_installed(path_dict["codec"]):
+        sys.exit("The " + args.codec + " codec is not installed")
+
     # Also Removes it from path_dict use_case
     if args.use_case:
         path_dict["use_case"] = [args.use_case]
 
+    if args.metrics_port is not None:
+        server = harness_metrics.start_server(args.metrics_port, args.metrics_address)
+        print(
+            "Serving metrics on http://" + server.server_address[0] + ":" +
+            str(server.server_address[1]) + "/metrics"
+        )
+
     start_date, timestamps = create_timestamps(args)
 
-    db_runs_dict = running_handler(path_dict, args, db_setup, timestamps, read_dict)
+    # The arguments for each engine, with the format set to the engine
+    engine_args = {}
+    for engine in args.formats:
+        engine_args[engine] = copy.copy(args)
+        engine_args[engine].format = engine
+
+    # With several line protocol engines, writes share one generated dataset
+    shared_formats = [engine for engine in args.formats if engine in LINE_PROTOCOL_FORMATS]
+    if args.operation != "write" or len(shared_formats) < 2:
+        shared_formats = []
+
+    for engine in args.formats:
+        engine_args[engine].shared_formats = shared_formats if engine in shared_formats else []
+
+    output_file = get_output_file(args)
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+
+    if args.operation == "codec-bench":
+        for engine in args.formats:
+            codec_bench_dict = codec_benchmark(path_dict, engine_args[engine], timestamps)
+            codec_bench_dict["metadata"] = {
+                "db_engine": engine,
+                "scale": args.scale,
+                "seed": args.seed,
+                "start_date": start_date,
+                "operation": args.operation
+            }
+
+            with open(get_output_file(engine_args[engine]), "w", encoding="ASCII") as f:
+                json.dump(codec_bench_dict, f, indent=4)
+
+            print("Output written to: " + get_output_file(engine_args[engine]))
+
+        write_profile(profiler, output_file)
+        return
+
+    if args.operation == "retention":
+        exit_messages = []
+        for engine in args.formats:
+            try:
+                retention_dict = {
+                    path_dict["use_case"][0]: retention_handler(
+                        path_dict, engine_args[engine], db_setup, timestamps, query_suites
+                    )
+                }
+            except RuntimeError as error:
+                exit_messages.append(engine + ": " + str(error))
+                continue
+
+            retention_dict["metadata"] = {
+                "db_engine": engine,
+                "scale": args.scale,
+                "seed": args.seed,
+                "workers": args.workers,
+                "runs": args.runs,
+                "start_date": start_date,
+                "operation": args.operation,
+                "delete_delay": args.delete_delay
+            }
+
+            with open(get_output_file(engine_args[engine]), "w", encoding="ASCII") as f:
+                json.dump(retention_dict, f, indent=4)
+
+            print("Output written to: " + get_output_file(engine_args[engine]))
+
+        write_profile(profiler, output_file)
+
+        if exit_messages:
+            sys.exit("\n".join(exit_messages))
+        return
+
+    checkpoints = {
+        engine: load_checkpoint(
+            get_output_file(engine_args[engine]) + ".checkpoint", engine_args[engine]
+        )
+        for engine in args.formats
+    }
+
+    # Writes the finished runs even if the invocation stops early
+    failure = None
+    try:
+        if shared_formats:
+            shared_running_handler(
+                path_dict,
+                {engine: engine_args[engine] for engine in shared_formats},
+                db_setup,
+                timestamps,
+                checkpoints
+            )
+
+        for engine in args.formats:
+            if engine not in shared_formats:
+                running_handler(
+                    path_dict, engine_args[engine], db_setup, timestamps,
+                    query_suites, checkpoints[engine]
+                )
+    except KeyboardInterrupt:
+        failure = "Interrupted"
+    except Exception as error: # pylint: disable=broad-exception-caught
+        failure = repr(error)
+
+    write_profile(profiler, output_file)
+
+    exit_messages = []
+    for engine in args.formats:
+        exit_message = write_results(
+            engine_args[engine], checkpoints[engine], start_date, failure
+        )
+        if exit_message:
+            exit_messages.append(exit_message)
+
+    if exit_messages:
+        sys.exit("\n".join(exit_messages))
+
+def write_results(args, checkpoint, start_date, failure):
+    """
+    Averages the runs of one engine from its checkpoint and writes its output file
+    The checkpoint is removed when every run finished
+
+    Parameters:
+        args : argparse.Namespace
+            The arguments of the engine
+        checkpoint : dict
+            The dict with the results and errors of every run of the engine
+        start_date : str
+            The first timestamp of the generated data
+        failure : str
+            Why the invocation stopped early, None if it did not
+
+    Returns:
+        exit_message : str
+            Why the engine needs --resume, None if every run finished
+    """
+
+    output_file = get_output_file(args)
+
+    db_runs_dict = collect_runs(checkpoint, args)
 
     avg_dict = create_averages(db_runs_dict, args)
 
@@ -652,27 +2589,58 @@ def main():
         "runs": args.runs,
         "read_queries": args.queries,
         "start_date": start_date,
-        "operation": args.operation
+        "operation": args.operation,
+        "run_policy": args.run_policy
     }
 
-    output_file = "tsbs_" + args.format
+    if args.operation == "read" and args.read_mode == "cold-hot":
+        avg_dict["metadata"].update({
+            "read_mode": args.read_mode,
+            "hot_runs": args.hot_runs,
+            "drop_page_cache": args.drop_page_cache
+        })
 
-    if args.operation == "write":
-        output_file += "_write"
-    elif args.operation == "read":
-        output_file += "_read"
-        
-    output_file += (
-        "_s" + str(args.scale) +
-        "_w" + str(args.workers) +
-        "_q" + str(args.queries) +
-        ".json"
-    )
+    if args.operation == "read" and args.response_digest:
+        avg_dict["metadata"]["response_digest"] = True
+
+    if args.shared_formats:
+        avg_dict["metadata"]["shared_dataset"] = {
+            "format": "influx",
+            "engines": args.shared_formats,
+            "engine_order": args.engine_order
+        }
+
+    if args.operation == "read":
+        avg_dict["metadata"]["timed_out_queries"] = [
+            query_name for query_name in db_runs_dict
+            if not db_runs_dict[query_name]["t_run"] and db_runs_dict[query_name]["timeouts"]
+        ]
+
+    # The errors for each use case or query type, by run number
+    errors = {
+        key_name: db_runs_dict[key_name]["errors"]
+        for key_name in db_runs_dict if db_runs_dict[key_name]["errors"]
+    }
+    if errors:
+        avg_dict["metadata"]["errors"] = errors
+
+    if failure:
+        avg_dict["metadata"]["failure"] = failure
 
     with open(output_file, "w", encoding="ASCII") as f:
         json.dump(avg_dict, f, indent=4)
 
     print("Output written to: " + output_file)
 
+    if failure:
+        return "Stopped early: " + failure + ", continue with --resume from " + checkpoint["file"]
+
+    if errors:
+        return "Some runs failed, run them again with --resume from " + checkpoint["file"]
+
+    pathlib.Path(checkpoint["file"]).unlink(missing_ok=True)
+
+    return None
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,647 @@
+"""
+Hooks for resetting the databases between benchmark runs
+A reset drops the benchmark data, a flush empties the caches but keeps the data,
+and a delete drops the data of a time window, as retention does
+Databases without a cache that can be emptied over the API are restarted to flush them
+"""
+
+import json
+import os
+import subprocess
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+def http_request(url, method="GET", data=None, headers=None):
+    """
+    Sends a HTTP request to the database
+
+    Parameters:
+        url : str
+            The full URL, with the query string
+        method : str
+            The HTTP method
+        data : bytes
+            The body of the request
+        headers : dict
+            The headers of the request
+
+    Returns:
+        body : str
+            The body of the response
+
+    Raises:
+        RuntimeError
+            If the database could not be reached or answered with an error
+    """
+
+    request = urllib.request.Request(url, data=data, headers=headers or {}, method=method)
+
+    try:
+        with urllib.request.urlopen(request, timeout=600) as response:
+            return response.read().decode("utf-8")
+    except (urllib.error.URLError, OSError) as error:
+        raise RuntimeError(method + " " + url + " failed: " + str(error)) from error
+
+def questdb_reset(config):
+    """
+    Drops all tables in QuestDB, the same as setup/questdb/drop-tables.sh
+
+    Parameters:
+        config : dict
+            The url of the database
+
+    Returns:
+        actions : list
+            What was done to the database
+    """
+
+    exec_url = config["url"] + "/exec?query="
+
+    tables = json.loads(
+        http_request(exec_url + urllib.parse.quote("SELECT table_name FROM tables();"))
+    )
+
+    actions = []
+    for row in tables.get("dataset", []):
+        http_request(exec_url + urllib.parse.quote("DROP TABLE \"" + row[0] + "\";"))
+        actions.append("dropped table " + row[0])
+
+    return actions
+
+def influx_reset(config):
+    """
+    Deletes the benchmark bucket in InfluxDB and creates it again empty
+
+    Parameters:
+        config : dict
+            The url of the database, the auth token and the bucket name
+
+    Returns:
+        actions : list
+            What was done to the database
+    """
+
+    headers = {"Authorization": "Token " + str(config["token"]), "Content-Type": "application/json"}
+
+    buckets = json.loads(http_request(
+        config["url"] + "/api/v2/buckets?name=" + urllib.parse.quote(config["db_name"]),
+        headers=headers
+    ))
+
+    actions = []
+    for bucket in buckets.get("buckets", []):
+        http_request(config["url"] + "/api/v2/buckets/" + bucket["id"], "DELETE", headers=headers)
+        http_request(
+            config["url"] + "/api/v2/buckets",
+            "POST",
+            json.dumps({
+                "name": bucket["name"],
+                "orgID": bucket["orgID"],
+                "retentionRules": bucket.get("retentionRules", [])
+            }).encode("utf-8"),
+            headers
+        )
+        actions.append("recreated bucket " + bucket["name"])
+
+    return actions
+
+def run_psql(config, database, sql):
+    """
+    Runs SQL in TimescaleDB with psql
+
+    Parameters:
+        config : dict
+            The host, port, user and password
+        database : str
+            The database to connect to
+        sql : str
+            The SQL to run
+
+    Returns:
+        output : str
+            What psql printed
+
+    Raises:
+        RuntimeError
+            If psql is missing or the SQL failed
+    """
+
+    psql_command = [
+        "psql",
+        "-h", config["host"],
+        "-p", str(config["port"]),
+        "-U", config["user"],
+        "-d", database,
+        "-v", "ON_ERROR_STOP=1",
+        "-c", sql
+    ]
+
+    try:
+        output = subprocess.run(
+            psql_command,
+            capture_output=True,
+            text=True,
+            check=False,
+            env=dict(os.environ, PGPASSWORD=str(config["password"]))
+        )
+    except FileNotFoundError as error:
+        raise RuntimeError("psql is needed for the TimescaleDB hooks") from error
+
+    if output.returncode != 0:
+        raise RuntimeError(sql + " failed: " + output.stderr.strip())
+
+    return output.stdout
+
+def timescaledb_reset(config):
+    """
+    Drops the benchmark database in TimescaleDB, tsbs_load_timescaledb creates it again
+
+    Parameters:
+        config : dict
+            The host, port, user, password and database name
+
+    Returns:
+        actions : list
+            What was done to the database
+    """
+
+    run_psql(
+        config, "postgres", "DROP DATABASE IF EXISTS \"" + config["db_name"] + "\" WITH (FORCE);"
+    )
+
+    return ["dropped database " + config["db_name"]]
+
+def victoriametrics_reset(config):
+    """
+    Deletes every series in VictoriaMetrics, and waits for the merges to finish
+    so the deleted data is gone before the next run
+
+    Parameters:
+        config : dict
+            The url of the database and the seconds to wait for merges
+
+    Returns:
+        actions : list
+            What was done to the database
+    """
+
+    http_request(
+        config["url"] + "/api/v1/admin/tsdb/delete_series?" +
+        urllib.parse.urlencode({"match[]": "{__name__=~\".+\"}"}),
+        "POST"
+    )
+    actions = ["deleted all series"]
+
+    http_request(config["url"] + "/internal/force_merge")
+    actions.append("started force merge")
+
+    actions.append(
+        "merges done after " + str(victoriametrics_wait_for_merges(config)) + " seconds"
+    )
+    actions.extend(victoriametrics_flush(config))
+
+    return actions
+
+def victoriametrics_wait_for_merges(config):
+    """
+    Polls the VictoriaMetrics metrics until no merges are running
+
+    Parameters:
+        config : dict
+            The url of the database and the seconds to wait for merges
+
+    Returns:
+        waited : float
+            The seconds waited
+    """
+
+    start = time.monotonic()
+
+    while time.monotonic() - start < config["merge_timeout"]:
+        active_merges = 0
+        for line in http_request(config["url"] + "/metrics").split("\n"):
+            if line.startswith("vm_active_merges"):
+                active_merges += float(line.split()[-1])
+
+        if active_merges == 0:
+            break
+
+        time.sleep(1)
+
+    return round(time.monotonic() - start, 2)
+
+def victoriametrics_flush(config):
+    """
+    Empties the rollup result cache in VictoriaMetrics
+
+    Parameters:
+        config : dict
+            The url of the database
+
+    Returns:
+        actions : list
+            What was done to the database
+    """
+
+    http_request(config["url"] + "/internal/resetRollupResultCache")
+
+    return ["reset rollup result cache"]
+
+def restart_service(config, ready):
+    """
+    Restarts the database with its restart command, which empties the caches of the process,
+    and waits until it answers again
+
+    Parameters:
+        config : dict
+            The restart command, and the seconds to wait for the database to answer
+        ready : function
+            Checks if the database answers, raising RuntimeError until it does
+
+    Returns:
+        actions : list
+            What was done to the database
+
+    Raises:
+        RuntimeError
+            If there is no restart command, it failed, or the database did not come back
+    """
+
+    if not config.get("restart_command"):
+        raise RuntimeError("Emptying the caches needs a restart, set --restart_command")
+
+    output = subprocess.run(
+        config["restart_command"], shell=True, capture_output=True, text=True, check=False
+    )
+    if output.returncode != 0:
+        raise RuntimeError(config["restart_command"] + " failed: " + output.stderr.strip())
+
+    start = time.monotonic()
+
+    while True:
+        try:
+            ready(config)
+            break
+        except RuntimeError as error:
+            if time.monotonic() - start >= config["ready_timeout"]:
+                raise RuntimeError(
+                    "Not answering " + str(config["ready_timeout"]) +
+                    " seconds after the restart: " + str(error)
+                ) from error
+            time.sleep(1)
+
+    return [
+        "restarted with " + config["restart_command"],
+        "answering after " + str(round(time.monotonic() - start, 2)) + " seconds"
+    ]
+
+def influx_flush(config):
+    """
+    Restarts InfluxDB, it has no API for emptying its caches
+
+    Parameters:
+        config : dict
+            The url of the database and the restart command
+
+    Returns:
+        actions : list
+            What was done to the database
+    """
+
+    return restart_service(config, lambda config: http_request(config["url"] + "/health"))
+
+def questdb_flush(config):
+    """
+    Restarts QuestDB, it has no API for emptying its caches
+
+    Parameters:
+        config : dict
+            The url of the database and the restart command
+
+    Returns:
+        actions : list
+            What was done to the database
+    """
+
+    return restart_service(
+        config,
+        lambda config: http_request(config["url"] + "/exec?query=" + urllib.parse.quote("SELECT 1;"))
+    )
+
+def timescaledb_flush(config):
+    """
+    Restarts PostgreSQL, which empties its shared buffers
+
+    Parameters:
+        config : dict
+            The host, port, user, password and database name, and the restart command
+
+    Returns:
+        actions : list
+            What was done to the database
+    """
+
+    return restart_service(config, lambda config: run_psql(config, "postgres", "SELECT 1;"))
+
+def drop_page_cache():
+    """
+    Writes dirty pages to disk and drops the OS page cache, needs root
+
+    Returns:
+        actions : list
+            What was done
+
+    Raises:
+        RuntimeError
+            If the page cache could not be dropped
+    """
+
+    os.sync()
+
+    try:
+        with open("/proc/sys/vm/drop_caches", "w", encoding="ASCII") as f:
+            f.write("3\n")
+    except OSError as error:
+        raise RuntimeError("Could not drop the page cache: " + str(error)) from error
+
+    return ["dropped page cache"]
+
+def questdb_delete(config, start, end): # pylint: disable=unused-argument
+    """
+    Drops the partitions older than the end of the window from every QuestDB table
+
+    Parameters:
+        config : dict
+            The url of the database
+        start : str
+            The start of the window, as in 2025-01-01T00:00:00Z
+        end : str
+            The end of the window
+
+    Returns:
+        actions : list
+            What was done to the database
+    """
+
+    exec_url = config["url"] + "/exec?query="
+
+    tables = json.loads(
+        http_request(exec_url + urllib.parse.quote("SELECT table_name FROM tables();"))
+    )
+
+    actions = []
+    for row in tables.get("dataset", []):
+        http_request(exec_url + urllib.parse.quote(
+            "ALTER TABLE \"" + row[0] + "\" DROP PARTITION WHERE timestamp < '" + end + "';"
+        ))
+        actions.append("dropped partitions of " + row[0] + " before " + end)
+
+    return actions
+
+def influx_delete(config, start, end):
+    """
+    Deletes the window from the benchmark bucket in InfluxDB
+
+    Parameters:
+        config : dict
+            The url of the database, the auth token and the bucket name
+        start : str
+            The start of the window, as in 2025-01-01T00:00:00Z
+        end : str
+            The end of the window
+
+    Returns:
+        actions : list
+            What was done to the database
+    """
+
+    headers = {"Authorization": "Token " + str(config["token"]), "Content-Type": "application/json"}
+
+    buckets = json.loads(http_request(
+        config["url"] + "/api/v2/buckets?name=" + urllib.parse.quote(config["db_name"]),
+        headers=headers
+    ))
+
+    actions = []
+    for bucket in buckets.get("buckets", []):
+        http_request(
+            config["url"] + "/api/v2/delete?" +
+            urllib.parse.urlencode({"orgID": bucket["orgID"], "bucketID": bucket["id"]}),
+            "POST",
+            json.dumps({"start": start, "stop": end}).encode("utf-8"),
+            headers
+        )
+        actions.append("deleted " + start + " to " + end + " from bucket " + bucket["name"])
+
+    return actions
+
+def timescaledb_delete(config, start, end): # pylint: disable=unused-argument
+    """
+    Drops the chunks older than the end of the window from every hypertable in TimescaleDB
+
+    Parameters:
+        config : dict
+            The host, port, user, password and database name
+        start : str
+            The start of the window, as in 2025-01-01T00:00:00Z
+        end : str
+            The end of the window
+
+    Returns:
+        actions : list
+            What was done to the database
+    """
+
+    output = run_psql(
+        config,
+        config["db_name"],
+        "SELECT drop_chunks(format('%I.%I', hypertable_schema, hypertable_name)::regclass, "
+        "older_than => '" + end + "'::timestamptz) FROM timescaledb_information.hypertables;"
+    )
+
+    dropped = [line for line in output.split("\n") if "_hyper_" in line]
+
+    return ["dropped " + str(len(dropped)) + " chunks before " + end]
+
+def victoriametrics_delete(config, start, end):
+    """
+    VictoriaMetrics can only delete whole series, old data is only removed by -retentionPeriod
+
+    Parameters:
+        config : dict
+            The url of the database
+        start : str
+            The start of the window, as in 2025-01-01T00:00:00Z
+        end : str
+            The end of the window
+
+    Raises:
+        RuntimeError
+            Always
+    """
+
+    raise RuntimeError(
+        "VictoriaMetrics can not delete a time window, only whole series, " +
+        "so " + start + " to " + end + " can not be dropped from " + config["url"]
+    )
+
+def disk_usage(path):
+    """
+    Adds up the disk space used by the files under a directory
+
+    Parameters:
+        path : str
+            The data directory of the database
+
+    Returns:
+        used : int
+            The bytes of disk used
+
+    Raises:
+        RuntimeError
+            If the directory can not be read
+    """
+
+    if not os.path.isdir(path):
+        raise RuntimeError(path + " is not a directory")
+
+    used = 0
+    errors = []
+
+    for root, _, files in os.walk(path, onerror=errors.append):
+        for name in files:
+            try:
+                used += os.lstat(os.path.join(root, name)).st_blocks * 512
+            except FileNotFoundError:
+                # Files come and go while the database runs
+                continue
+
+    if errors:
+        raise RuntimeError("Could not read all of " + path + ": " + str(errors[0]))
+
+    return used
+
+reset_hooks = {
+    "influx": influx_reset,
+    "questdb": questdb_reset,
+    "timescaledb": timescaledb_reset,
+    "victoriametrics": victoriametrics_reset
+}
+
+flush_hooks = {
+    "influx": influx_flush,
+    "questdb": questdb_flush,
+    "timescaledb": timescaledb_flush,
+    "victoriametrics": victoriametrics_flush
+}
+
+delete_hooks = {
+    "influx": influx_delete,
+    "questdb": questdb_delete,
+    "timescaledb": timescaledb_delete,
+    "victoriametrics": victoriametrics_delete
+}
+
+def run_hook(hooks, engine, config):
+    """
+    Runs the hook for the database, and waits the settle time after it
+
+    Parameters:
+        hooks : dict
+            reset_hooks or flush_hooks
+        engine : str
+            The database format
+        config : dict
+            The config of the database, with the settle time in seconds
+
+    Returns:
+        hook_dict : dict
+            The actions done, and the seconds the hook and settling took
+
+    Raises:
+        RuntimeError
+            If the hook failed, including when the database answered with something unexpected
+    """
+
+    start = time.monotonic()
+
+    try:
+        actions = hooks[engine](config)
+    except (urllib.error.URLError, OSError, ValueError, KeyError, TypeError) as error:
+        raise RuntimeError(
+            engine + " hook failed: " + type(error).__name__ + ": " + str(error)
+        ) from error
+
+    time.sleep(config["settle_time"])
+
+    return {"actions": actions, "seconds": round(time.monotonic() - start, 2)}
+
+def reset(engine, config):
+    """
+    Drops the benchmark data from the database
+
+    Parameters:
+        engine : str
+            The database format
+        config : dict
+            The config of the database
+
+    Returns:
+        hook_dict : dict
+            The actions done, and the seconds the reset took
+    """
+
+    return run_hook(reset_hooks, engine, config)
+
+def flush(engine, config):
+    """
+    Empties the caches of the database, keeping the data
+
+    Parameters:
+        engine : str
+            The database format
+        config : dict
+            The config of the database
+
+    Returns:
+        hook_dict : dict
+            The actions done, and the seconds the flush took
+    """
+
+    return run_hook(flush_hooks, engine, config)
+
+def delete(engine, config, start, end):
+    """
+    Drops the data of a time window from the database, without waiting for it to settle
+
+    Parameters:
+        engine : str
+            The database format
+        config : dict
+            The config of the database
+        start : str
+            The start of the window, as in 2025-01-01T00:00:00Z
+        end : str
+            The end of the window
+
+    Returns:
+        hook_dict : dict
+            The actions done, and the seconds the delete took
+
+    Raises:
+        RuntimeError
+            If the delete failed, including when the database answered with something unexpected
+    """
+
+    begin = time.monotonic()
+
+    try:
+        actions = delete_hooks[engine](config, start, end)
+    except (urllib.error.URLError, OSError, ValueError, KeyError, TypeError) as error:
+        raise RuntimeError(
+            engine + " delete failed: " + type(error).__name__ + ": " + str(error)
+        ) from error
+
+    return {"actions": actions, "seconds": round(time.monotonic() - begin, 2)}
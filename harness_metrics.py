@@ -0,0 +1,386 @@
+"""
+Live OpenMetrics endpoint for following the progress of benchmark.py
+Serves the current phase, run and throughput of the harness on /metrics
+Also times each phase of a run, with the CPU and memory used by the harness and its children
+"""
+
+import threading
+import time
+import resource
+import http.server
+
+PHASES = ["idle", "reset", "generate", "load", "query", "parse", "cleanup", "done"]
+
+# The state of the harness, updated by benchmark.py and read by the endpoint
+state = {
+    "engine": "",
+    "operation": "",
+    "use_case": "",
+    "run": 0,
+    "runs": 0,
+    "phase": "idle",
+    "phase_start": time.monotonic(),
+    "phase_seconds": {phase: 0.0 for phase in PHASES},
+    "rows_sec": 0.0,
+    "metrics_sec": 0.0,
+    "rows_total": 0.0,
+    "metrics_total": 0.0,
+    "queries_sec": 0.0,
+    "latency": {},
+    "last_progress": 0.0,
+    "run_start": None,
+    "open_phase": None,
+    "run_phases": []
+}
+
+state_lock = threading.Lock()
+
+# Threads running next to the one being followed, as the queries of the retention workload,
+# are quiet and leave the phase, progress and timing alone
+thread_state = threading.local()
+
+def set_quiet(quiet):
+    """
+    Sets if the calling thread updates the state
+
+    Parameters:
+        quiet : bool
+            True to leave the state alone
+    """
+
+    thread_state.quiet = quiet
+
+def is_quiet():
+    """
+    Checks if the calling thread leaves the state alone
+
+    Returns:
+        quiet : bool
+            True if it is quiet
+    """
+
+    return getattr(thread_state, "quiet", False)
+
+def set_run(engine, operation, use_case, run, runs):
+    """
+    Sets which run the harness is currently on, and resets the live throughput
+
+    Parameters:
+        engine : str
+            The database format being tested
+        operation : str
+            The operation, read or write
+        use_case : str
+            The use case or query type of the run
+        run : int
+            The run number, starting at 1
+        runs : int
+            The total number of runs per use case
+    """
+
+    with state_lock:
+        state.update({
+            "engine": engine,
+            "operation": operation,
+            "use_case": use_case,
+            "run": run,
+            "runs": runs,
+            "rows_sec": 0.0,
+            "metrics_sec": 0.0,
+            "rows_total": 0.0,
+            "metrics_total": 0.0,
+            "queries_sec": 0.0,
+            "latency": {},
+            "run_start": time.monotonic(),
+            "open_phase": None,
+            "run_phases": []
+        })
+
+def set_phase(phase):
+    """
+    Moves the harness into a new phase, and adds the time spent to the previous one
+    Within a run the previous phase is also closed with its resource usage
+
+    Parameters:
+        phase : str
+            The name of the phase, one of PHASES
+    """
+
+    if is_quiet():
+        return
+
+    snapshot = resource_snapshot()
+    now = snapshot["wall"]
+
+    with state_lock:
+        state["phase_seconds"][state["phase"]] += now - state["phase_start"]
+        state["phase"] = phase
+        state["phase_start"] = now
+
+        if state["run_start"] is not None:
+            close_phase(snapshot)
+            state["open_phase"] = {"phase": phase, "snapshot": snapshot, "progress_seconds": 0.0}
+
+def resource_snapshot():
+    """
+    Takes the clocks and resource usage of the harness and its finished children
+
+    Returns:
+        snapshot : dict
+            The monotonic and process time, and the rusage of the harness and its children
+    """
+
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    return {
+        "wall": time.monotonic(),
+        "cpu": time.process_time(),
+        "user": self_usage.ru_utime,
+        "system": self_usage.ru_stime,
+        "children_user": children_usage.ru_utime,
+        "children_system": children_usage.ru_stime,
+        "maxrss_kb": self_usage.ru_maxrss,
+        "children_maxrss_kb": children_usage.ru_maxrss
+    }
+
+def close_phase(snapshot):
+    """
+    Adds the open phase to the phases of the run, needs state_lock
+
+    Parameters:
+        snapshot : dict
+            The resource snapshot at the end of the phase
+    """
+
+    open_phase = state["open_phase"]
+    if open_phase is None:
+        return
+
+    start = open_phase["snapshot"]
+    phase_dict = {
+        "phase": open_phase["phase"],
+        "start": round(start["wall"] - state["run_start"], 3),
+        "end": round(snapshot["wall"] - state["run_start"], 3)
+    }
+
+    for key in ["wall", "cpu", "user", "system", "children_user", "children_system"]:
+        phase_dict[key] = round(snapshot[key] - start[key], 3)
+
+    # maxrss is a high water mark, only the children that finished so far count
+    phase_dict["maxrss_kb"] = snapshot["maxrss_kb"]
+    phase_dict["children_maxrss_kb"] = snapshot["children_maxrss_kb"]
+    phase_dict["progress_seconds"] = round(open_phase["progress_seconds"], 3)
+
+    state["run_phases"].append(phase_dict)
+    state["open_phase"] = None
+
+def add_progress_time(seconds):
+    """
+    Adds the time spent reading the tsbs output while it runs to the open phase
+
+    Parameters:
+        seconds : float
+            The time spent
+    """
+
+    if is_quiet():
+        return
+
+    with state_lock:
+        if state["open_phase"] is not None:
+            state["open_phase"]["progress_seconds"] += seconds
+
+def end_run():
+    """
+    Closes the last phase of the run and stops timing phases until the next set_run
+
+    Returns:
+        run_phases : list
+            The start and end offsets from the start of the run, wall time,
+            CPU time and memory of each phase of the run, in order
+    """
+
+    snapshot = resource_snapshot()
+
+    with state_lock:
+        close_phase(snapshot)
+        run_phases = state["run_phases"]
+        state.update({"run_start": None, "run_phases": []})
+
+    return run_phases
+
+def update(progress_dict):
+    """
+    Updates the live throughput and latency from the tsbs output
+
+    Parameters:
+        progress_dict : dict
+            The values to update, with the same keys as state
+    """
+
+    if is_quiet():
+        return
+
+    with state_lock:
+        state.update(progress_dict)
+        state["last_progress"] = time.time()
+
+def escape_label(value):
+    """
+    Escapes a label value for the OpenMetrics text format
+
+    Parameters:
+        value : str
+            The label value
+
+    Returns:
+        escaped : str
+            The escaped label value
+    """
+
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace("\"", "\\\"")
+
+def render():
+    """
+    Renders the current state in the OpenMetrics text format
+
+    Returns:
+        text : str
+            The exposition of all the harness metrics
+    """
+
+    with state_lock:
+        current = dict(state)
+        phase_seconds = dict(state["phase_seconds"])
+        phase_seconds[state["phase"]] += time.monotonic() - state["phase_start"]
+        latency = dict(state["latency"])
+
+    labels = (
+        "engine=\"" + escape_label(current["engine"]) +
+        "\",operation=\"" + escape_label(current["operation"]) +
+        "\",use_case=\"" + escape_label(current["use_case"]) + "\""
+    )
+
+    lines = [
+        "# TYPE tsbs_harness_run info",
+        "# HELP tsbs_harness_run The engine, operation and use case being run",
+        "tsbs_harness_run_info{" + labels + "} 1",
+        "# TYPE tsbs_harness_phase stateset",
+        "# HELP tsbs_harness_phase The phase the harness is in"
+    ]
+
+    for phase in PHASES:
+        lines.append(
+            "tsbs_harness_phase{tsbs_harness_phase=\"" + phase + "\"} " +
+            str(int(phase == current["phase"]))
+        )
+
+    lines.append("# TYPE tsbs_harness_phase_seconds counter")
+    lines.append("# HELP tsbs_harness_phase_seconds Time spent in each phase")
+    lines.append("# UNIT tsbs_harness_phase_seconds seconds")
+    for phase in PHASES:
+        lines.append(
+            "tsbs_harness_phase_seconds_total{phase=\"" + phase + "\"} " +
+            str(round(phase_seconds[phase], 3))
+        )
+
+    gauges = [
+        ("run_index", "The current run number", current["run"]),
+        ("runs", "The number of runs per use case", current["runs"]),
+        ("rows_per_second", "Rows/sec in the last loader report", current["rows_sec"]),
+        ("metrics_per_second", "Metrics/sec in the last loader report", current["metrics_sec"]),
+        ("rows_loaded", "Rows loaded in the current run", current["rows_total"]),
+        ("metrics_loaded", "Metrics loaded in the current run", current["metrics_total"]),
+        ("queries_per_second", "Queries/sec in the last query report", current["queries_sec"]),
+        (
+            "last_progress_timestamp_seconds",
+            "Unix time of the last progress report from tsbs",
+            current["last_progress"]
+        )
+    ]
+
+    for name, help_text, value in gauges:
+        lines.append("# TYPE tsbs_harness_" + name + " gauge")
+        lines.append("# HELP tsbs_harness_" + name + " " + help_text)
+        lines.append("tsbs_harness_" + name + "{" + labels + "} " + str(value))
+
+    lines.append("# TYPE tsbs_harness_query_latency_seconds summary")
+    lines.append(
+        "# HELP tsbs_harness_query_latency_seconds Latency over all queries of the last "
+        "finished query run, from the min, med and max of the tsbs summary"
+    )
+    lines.append("# UNIT tsbs_harness_query_latency_seconds seconds")
+
+    # tsbs_run_queries only prints the min, median and max of the latency, once it has finished
+    quantiles = {"min": "0", "med": "0.5", "max": "1"}
+
+    for name, quantile in quantiles.items():
+        if name in latency:
+            lines.append(
+                "tsbs_harness_query_latency_seconds{" + labels +
+                ",quantile=\"" + quantile + "\"} " + str(latency[name])
+            )
+
+    if "sum" in latency and "count" in latency:
+        lines.append(
+            "tsbs_harness_query_latency_seconds_sum{" + labels + "} " + str(latency["sum"])
+        )
+        lines.append(
+            "tsbs_harness_query_latency_seconds_count{" + labels + "} " +
+            str(int(latency["count"]))
+        )
+
+    lines.append("# EOF")
+
+    return "\n".join(lines) + "\n"
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves the harness metrics on /metrics
+    """
+
+    def do_GET(self): # pylint: disable=invalid-name
+        """
+        Answers a scrape
+        """
+
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        body = render().encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args): # pylint: disable=redefined-builtin
+        """
+        Keeps scrapes out of the benchmark output
+        """
+
+def start_server(port, address="0.0.0.0"):
+    """
+    Starts the endpoint in a background thread
+
+    Parameters:
+        port : int
+            The port to listen on, 0 picks a free port
+        address : str
+            The address to listen on
+
+    Returns:
+        server : http.server.ThreadingHTTPServer
+            The running server, server.server_address has the port used
+    """
+
+    server = http.server.ThreadingHTTPServer((address, port), MetricsHandler)
+    server.daemon_threads = True
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    return server
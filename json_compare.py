@@ -1,7 +1,10 @@
 """
 Compares the json files from benchmark
 """
+import csv
 import json
+import math
+import random
 import argparse
 import pathlib
 import matplotlib.pyplot as plt
@@ -35,18 +38,31 @@ def get_file_list(args):
 
 def read_json(file_list):
     """
-    Reads the json files
+    Reads the json files, and folds them into the comparison one at a time
     
     Parameters:
         file_list : list
             The list of all filenames
             
     Returns:
-        json_list : list
-            The list of all the content of the files
+        ordered_dict : dict
+            The ranking of the databases
     """
 
-    json_list = []
+    return create_compare_dict(read_files(file_list))
+
+def read_files(file_list):
+    """
+    Reads the json files one at a time
+
+    Parameters:
+        file_list : list
+            The list of all filenames
+
+    Yields:
+        data : dict
+            The content of one file
+    """
 
     for filename in file_list:
         if pathlib.Path(filename).suffix != ".json":
@@ -55,20 +71,18 @@ def read_json(file_list):
         try:
             print("READING: " + filename)
             with open(filename, "r", encoding="ASCII") as file:
-                data = json.load(file)
-                json_list.append(data)
+                yield json.load(file)
         except FileNotFoundError:
             print("File not found")
 
-    return create_compare_dict(json_list)
-
 def create_compare_dict(json_list):
     """
     Takes the data from the files and pulls out the comparable bits
+    Only the times are kept, so the files can be read one at a time
 
     Parameters:
-        json_list : list
-            The list with all the content from the files
+        json_list : iterable
+            The content of the result files
             
     Returns:
         compare_dict : dict
@@ -78,6 +92,10 @@ def create_compare_dict(json_list):
     compare_dict = {}
 
     for file in json_list:
+        # Only read and write results have times to compare
+        if file["metadata"].get("operation", "write") not in ["read", "write"]:
+            continue
+
         compare_dict.setdefault(
             "s" + str(file["metadata"]["scale"]) +
             "e" + str(file["metadata"]["seed"] )+
@@ -100,6 +118,27 @@ def create_compare_dict(json_list):
                         file[key]["time_run"], file[key]["time_avg"]
                     ]
 
+                # Cold and warm runs, and the cold and hot cache phases, are ranked on their own
+                states = {
+                    state: file[key][state] for state in ["cold", "warm"] if state in file[key]
+                }
+                if "cache" in file[key]:
+                    states["cache_cold"] = file[key]["cache"]["cold"]
+                    states["cache_hot"] = file[key]["cache"]["hot"]
+
+                for state, state_dict in states.items():
+                    compare_dict[
+                        "s" + str(file["metadata"]["scale"]) +
+                        "e" + str(file["metadata"]["seed"] )+
+                        "r" + str(file["metadata"]["runs"]) +
+                        "w" + str(file["metadata"]["workers"]) +
+                        "q" + str(file["metadata"]["read_queries"])
+                    ].setdefault(key + "_" + state, {})[
+                        file["metadata"]["db_engine"]
+                        ] = [
+                            state_dict["time_run"], state_dict["time_avg"]
+                        ]
+
             elif key == "metadata":
                 compare_dict[
                     "s" + str(file["metadata"]["scale"]) +
@@ -146,6 +185,16 @@ def get_scores(compare_dict):
             elif key == "metadata":
                 score_dict[meta_key]["metadata"] = compare_dict[meta_key]["metadata"]
 
+        # How many times faster each db ran the hot cache phase than the cold one
+        for key in compare_dict[meta_key].keys():
+            if key.endswith("_cache_hot") and key[:-4] + "_cold" in compare_dict[meta_key]:
+                cold_dict = compare_dict[meta_key][key[:-4] + "_cold"]
+                score_dict[meta_key][key]["hot_speedup"] = {
+                    inner: round(cold_dict[inner][1] / times[1], 2)
+                    for inner, times in compare_dict[meta_key][key].items()
+                    if inner in cold_dict and times[1]
+                }
+
     return order_ranking(score_dict)
 
 def calculate_variation(times):
@@ -206,6 +255,11 @@ def order_ranking(score_dict):
                 for db in o_dict[meta_key][key]["ranking"]:
                     o_dict[meta_key][key]["variation"][db] = score["variation"][db]
 
+                if "hot_speedup" in score:
+                    o_dict[meta_key][key]["hot_speedup"] = dict(
+                        sorted(score["hot_speedup"].items(), key=lambda item: -item[1])
+                    )
+
             elif key == "metadata":
                 o_dict[meta_key]["metadata"] = {
                     "scale": score_dict[meta_key]["metadata"]["scale"],
@@ -218,6 +272,380 @@ def order_ranking(score_dict):
 
     return o_dict
 
+def compare_digests(json_iter):
+    """
+    Compares the response digests of each query type across the databases,
+    and flags the query types where the databases returned different results
+
+    Parameters:
+        json_iter : iterable
+            The content of the result files
+
+    Returns:
+        digest_dict : dict
+            The digests, rows and response sizes of each database for each query type,
+            if they match, and which databases agree with each other
+    """
+
+    digest_dict = {}
+
+    for file in json_iter:
+        metadata = file["metadata"]
+
+        if metadata.get("operation") != "read":
+            continue
+
+        meta_key = (
+            "s" + str(metadata["scale"]) +
+            "e" + str(metadata["seed"]) +
+            "r" + str(metadata["runs"]) +
+            "w" + str(metadata["workers"]) +
+            "q" + str(metadata["read_queries"])
+        )
+
+        for key in file.keys():
+            if key == "metadata" or "responses" not in file[key]:
+                continue
+
+            query_dict = digest_dict.setdefault(meta_key, {}).setdefault(key, {
+                "digests": {},
+                "rows": {},
+                "bytes_per_response": {}
+            })
+            query_dict["digests"][metadata["db_engine"]] = file[key]["responses"]["digest_run"]
+            query_dict["rows"][metadata["db_engine"]] = file[key]["responses"]["rows_run"]
+            query_dict["bytes_per_response"][metadata["db_engine"]] = (
+                file[key]["responses"]["bytes_per_response"]
+            )
+
+    for meta_key, queries in digest_dict.items():
+        for key, query_dict in queries.items():
+            # The databases with the same digest for every run agree with each other
+            agreeing = {}
+            for engine, digests in query_dict["digests"].items():
+                agreeing.setdefault(tuple(digests), []).append(engine)
+
+            query_dict["agreeing"] = list(agreeing.values())
+            query_dict["match"] = len(agreeing) == 1
+
+            if not query_dict["match"]:
+                print(
+                    "MISMATCH: " + meta_key + " " + key + ": " +
+                    " vs ".join(", ".join(engines) for engines in query_dict["agreeing"])
+                )
+
+    return digest_dict
+
+def group_scaling(json_iter):
+    """
+    Groups the average throughput by the number of workers, for each database,
+    operation, use case and scale
+
+    Parameters:
+        json_iter : iterable
+            The content of the result files
+
+    Returns:
+        scaling_dict : dict
+            The throughputs for each number of workers, for each group
+    """
+
+    scaling_dict = {}
+
+    for file in json_iter:
+        metadata = file["metadata"]
+        operation = metadata.get("operation", "write")
+
+        if operation not in ["read", "write"]:
+            continue
+
+        throughput_key = "rows_avg" if operation == "write" else "queries_avg"
+
+        for key in file.keys():
+            if key == "metadata" or throughput_key not in file[key]:
+                continue
+
+            group = (
+                metadata["db_engine"] + "_" + operation + "_" + key +
+                "_s" + str(metadata["scale"])
+            )
+            scaling_dict.setdefault(group, {
+                "db_engine": metadata["db_engine"],
+                "operation": operation,
+                "use_case": key,
+                "scale": int(metadata["scale"]),
+                "throughput": throughput_key,
+                "workers": {}
+            })["workers"].setdefault(int(metadata["workers"]), []).append(file[key][throughput_key])
+
+    return scaling_dict
+
+def solve_linear(matrix, vector):
+    """
+    Solves the linear equations matrix * x = vector with Gaussian elimination
+
+    Parameters:
+        matrix : list
+            The square matrix as a list of rows
+        vector : list
+            The right hand side
+
+    Returns:
+        solution : list
+            The x that solves the equations, None if the matrix is singular
+    """
+
+    size = len(vector)
+    rows = [list(matrix[index]) + [vector[index]] for index in range(size)]
+
+    for column in range(size):
+        pivot = max(range(column, size), key=lambda row: abs(rows[row][column]))
+        if abs(rows[pivot][column]) < 1e-15:
+            return None
+
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+
+        for row in range(size):
+            if row != column:
+                factor = rows[row][column] / rows[column][column]
+                rows[row] = [
+                    value - factor * pivot_value
+                    for value, pivot_value in zip(rows[row], rows[column])
+                ]
+
+    return [rows[index][size] / rows[index][index] for index in range(size)]
+
+def fit_polynomial(x_values, y_values, degree):
+    """
+    Least squares fit of a polynomial
+
+    Parameters:
+        x_values : list
+            The x values
+        y_values : list
+            The y values
+        degree : int
+            The degree of the polynomial
+
+    Returns:
+        coefficients : list
+            The coefficients from the constant term up, None if it can not be fitted
+    """
+
+    size = degree + 1
+    matrix = [
+        [sum(x ** (row + column) for x in x_values) for column in range(size)]
+        for row in range(size)
+    ]
+    vector = [sum(y * x ** row for x, y in zip(x_values, y_values)) for row in range(size)]
+
+    return solve_linear(matrix, vector)
+
+def usl_throughput(workers, usl_dict):
+    """
+    The throughput the Universal Scalability Law predicts for a number of workers
+
+    Parameters:
+        workers : float
+            The number of workers
+        usl_dict : dict
+            The fitted lambda, sigma and kappa
+
+    Returns:
+        throughput : float
+            The predicted throughput
+    """
+
+    return usl_dict["lambda"] * workers / (
+        1 + usl_dict["sigma"] * (workers - 1) + usl_dict["kappa"] * workers * (workers - 1)
+    )
+
+def fit_usl(workers_dict):
+    """
+    Fits the Universal Scalability Law X(N) = lambda*N / (1 + sigma*(N-1) + kappa*N*(N-1))
+    N/X is a polynomial a + b*N + c*N^2 in N, with lambda = 1/(a+b+c), sigma = 1 - a*lambda
+    and kappa = c*lambda, so it is fitted with least squares on N/X
+    Falls back to Amdahl's law, kappa = 0, with too few points or a negative kappa
+    A sigma of 1 or more means the throughput never grows with the workers,
+    which neither law describes, so there is no model then
+
+    Parameters:
+        workers_dict : dict
+            The measured throughputs for each number of workers
+
+    Returns:
+        usl_dict : dict
+            The model, lambda, sigma (contention), kappa (coherency), the predicted peak,
+            the fit quality and the suggested worker counts to measure next
+    """
+
+    workers = sorted(workers_dict)
+    measured = [sum(workers_dict[count]) / len(workers_dict[count]) for count in workers]
+
+    usl_dict = {"workers": workers, "measured": measured}
+
+    if len(workers) < 2 or 0 in measured:
+        usl_dict.update({
+            "model": None, "suggested_workers": suggest_workers(workers, measured, None)
+        })
+        return usl_dict
+
+    inverse = [count / throughput for count, throughput in zip(workers, measured)]
+
+    coefficients = fit_polynomial(workers, inverse, 2) if len(workers) >= 3 else None
+    model = "usl"
+
+    if coefficients is None or coefficients[2] < 0:
+        coefficients = fit_polynomial(workers, inverse, 1) + [0.0]
+        model = "amdahl"
+
+    lambda_value = 1 / sum(coefficients) if sum(coefficients) > 0 else 0.0
+    sigma = 1 - coefficients[0] * lambda_value
+
+    if lambda_value <= 0 or sigma >= 1:
+        print(
+            "NO FIT: the throughput does not grow with the workers, measured " +
+            ", ".join(
+                str(count) + ": " + str(round(value)) for count, value in zip(workers, measured)
+            )
+        )
+        usl_dict.update({
+            "model": None, "suggested_workers": suggest_workers(workers, measured, None)
+        })
+        return usl_dict
+
+    usl_dict.update({
+        "model": model,
+        "lambda": lambda_value,
+        "sigma": sigma,
+        "kappa": coefficients[2] * lambda_value
+    })
+
+    fitted = [usl_throughput(count, usl_dict) for count in workers]
+    mean = sum(measured) / len(measured)
+    total_squares = sum((value - mean) ** 2 for value in measured)
+    residual_squares = sum((value - fit) ** 2 for value, fit in zip(measured, fitted))
+
+    usl_dict.update({
+        "fitted": [round(value) for value in fitted],
+        "r_squared": round(1 - residual_squares / total_squares, 4) if total_squares else 1.0
+    })
+
+    # The peak is where the coherency cost overtakes the added workers
+    if usl_dict["kappa"] > 0 and usl_dict["sigma"] < 1:
+        peak_workers = ((1 - usl_dict["sigma"]) / usl_dict["kappa"]) ** 0.5
+        usl_dict.update({
+            "peak_workers": round(peak_workers, 1),
+            "peak_throughput": round(usl_throughput(peak_workers, usl_dict))
+        })
+    elif usl_dict["sigma"] > 0:
+        # Without coherency cost the throughput only approaches lambda/sigma
+        usl_dict["throughput_limit"] = round(usl_dict["lambda"] / usl_dict["sigma"])
+
+    usl_dict["suggested_workers"] = suggest_workers(
+        workers, measured, usl_dict.get("peak_workers")
+    )
+
+    for key in ["lambda", "sigma", "kappa"]:
+        usl_dict[key] = round(usl_dict[key], 6)
+
+    return usl_dict
+
+def suggest_workers(workers, measured, peak_workers):
+    """
+    Suggests the worker counts worth measuring next, around the predicted peak,
+    around the best count measured if the throughput already falls past it,
+    or past the largest count measured otherwise
+
+    Parameters:
+        workers : list
+            The measured worker counts, sorted
+        measured : list
+            The measured throughput for each worker count
+        peak_workers : float
+            The predicted peak concurrency, None if there is none
+
+    Returns:
+        suggested : list
+            Up to three worker counts that have not been measured
+    """
+
+    largest = max(workers)
+    best = workers[measured.index(max(measured))]
+
+    if peak_workers:
+        candidates = [peak_workers, peak_workers * 0.75, peak_workers * 1.5]
+        # A peak far past the measurements is uncertain, so the next step is towards it
+        if peak_workers > 2 * largest:
+            candidates = [largest * 2] + candidates
+    elif best < largest:
+        # The peak is somewhere between the counts around the best one
+        lower = max([count for count in workers if count < best], default=best / 2)
+        upper = min(count for count in workers if count > best)
+        candidates = [(lower + best) / 2, (best + upper) / 2, lower]
+    else:
+        candidates = [largest * 2, largest * 4]
+        if len(workers) < 3:
+            candidates.append((min(workers) + largest) / 2)
+
+    suggested = []
+    for candidate in candidates:
+        count = max(1, int(round(candidate)))
+        if count not in workers and count not in suggested:
+            suggested.append(count)
+
+    return suggested[:3]
+
+def draw_usl(usl_results, name_colors):
+    """
+    Plots the measured throughputs against the fitted curves, one file for each
+    operation and scale, with a graph for each use case
+
+    Parameters:
+        usl_results : dict
+            The fitted model for each group
+        name_colors : dict
+            The color for each database
+    """
+
+    plots = {}
+    for group in usl_results.values():
+        plots.setdefault(
+            (group["operation"], group["scale"]), {}
+        ).setdefault(group["use_case"], []).append(group)
+
+    for (operation, scale), use_cases in plots.items():
+        _, axes = plt.subplots(1, len(use_cases), figsize=(6*len(use_cases), 5), squeeze=False)
+
+        for ax, (use_case, groups) in zip(axes[0], use_cases.items()):
+            for group in groups:
+                color = name_colors.get(group["db_engine"], "#888888")
+                usl = group["usl"]
+
+                ax.scatter(
+                    usl["workers"], usl["measured"], color=color,
+                    edgecolor="black", zorder=3, label=group["db_engine"]
+                )
+
+                if usl["model"]:
+                    last = max(max(usl["workers"]) * 2, usl.get("peak_workers", 0) * 1.5)
+                    curve = [1 + step * (last - 1) / 100 for step in range(101)]
+                    ax.plot(
+                        curve, [usl_throughput(count, usl) for count in curve],
+                        color=color, linewidth=2
+                    )
+
+            ax.set_title(f"{use_case.title()}", fontsize=14, fontweight="bold")
+            ax.set_xlabel("Workers", fontsize=12)
+            ax.set_ylabel(groups[0]["throughput"], fontsize=12)
+            ax.grid(True, alpha=0.3)
+            ax.legend()
+
+        plt.tight_layout()
+        save_path = "usl_" + operation + "_s" + str(scale) + ".svg"
+        plt.savefig(save_path, format="svg", bbox_inches="tight")
+        print("Saved graph to: " + save_path)
+
 def draw_plot(ordered_dict, name_colors):
     """
     Creates bar graphs for each use-case, ranked by time
@@ -286,12 +714,342 @@ def draw_plot(ordered_dict, name_colors):
         plt.savefig(save_path, format="svg", bbox_inches="tight")
         print("Saved graph to: " + save_path)
 
+def get_group_value(metadata, key_name, group_key):
+    """
+    Finds the value of a result for one of the keys it is grouped by
+
+    Parameters:
+        metadata : dict
+            The metadata of the result file
+        key_name : str
+            The use case or query type of the result
+        group_key : str
+            engine, workload, queries or any key in the metadata
+
+    Returns:
+        value : object
+            The value, None if the file does not have it
+    """
+
+    if group_key == "workload":
+        return key_name
+
+    # The names used by the gnuplot scripts for the metadata keys
+    aliases = {"engine": "db_engine", "queries": "read_queries"}
+    value = metadata.get(aliases.get(group_key, group_key))
+
+    if group_key == "operation" and value is None:
+        value = "write"
+
+    return value
+
+def get_metric(result, metric):
+    """
+    Finds the values of a metric in a result, a list of runs gives one value per run
+
+    Parameters:
+        result : dict
+            The result of one use case or query type
+        metric : str
+            The key of the metric, nested keys separated by dots, as in bytes.bytes_sec
+
+    Returns:
+        values : list
+            The numbers found, empty if the result does not have the metric
+    """
+
+    value = result
+    for key in metric.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return []
+        value = value[key]
+
+    values = value if isinstance(value, list) else [value]
+
+    return [
+        float(value) for value in values
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    ]
+
+def add_sample(accumulator, value, rng):
+    """
+    Adds a value to the running count, sum, mean and variance, minimum and maximum,
+    and to a fixed size reservoir sample for the percentiles
+
+    Parameters:
+        accumulator : dict
+            The state of one group
+        value : float
+            The value to add
+        rng : random.Random
+            Picks the values kept in the reservoir
+    """
+
+    accumulator["count"] += 1
+    accumulator["sum"] += value
+    accumulator["min"] = min(accumulator["min"], value)
+    accumulator["max"] = max(accumulator["max"], value)
+
+    # Welford's method, which does not lose precision like a sum of squares
+    delta = value - accumulator["mean"]
+    accumulator["mean"] += delta / accumulator["count"]
+    accumulator["m2"] += delta * (value - accumulator["mean"])
+
+    # Keeps every value with the same probability, exact until the reservoir is full
+    if len(accumulator["reservoir"]) < accumulator["size"]:
+        accumulator["reservoir"].append(value)
+    else:
+        index = rng.randrange(accumulator["count"])
+        if index < accumulator["size"]:
+            accumulator["reservoir"][index] = value
+
+def get_statistic(accumulator, stat):
+    """
+    Calculates a statistic from the accumulator of a group
+
+    Parameters:
+        accumulator : dict
+            The state of one group
+        stat : str
+            mean, min, max, sum, count, stddev, or a percentile as in p99
+
+    Returns:
+        value : float
+            The statistic
+    """
+
+    if stat in ["min", "max", "sum", "count", "mean"]:
+        return accumulator[stat]
+
+    if stat == "stddev":
+        if accumulator["count"] < 2:
+            return 0.0
+        return math.sqrt(accumulator["m2"] / (accumulator["count"] - 1))
+
+    # Linear interpolation between the closest ranks
+    values = sorted(accumulator["reservoir"])
+    rank = float(stat[1:]) / 100 * (len(values) - 1)
+    lower = math.floor(rank)
+    upper = min(lower + 1, len(values) - 1)
+
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+def check_stat(stat):
+    """
+    Checks a statistic given to --stat
+
+    Parameters:
+        stat : str
+            The statistic
+
+    Returns:
+        stat : str
+            The same statistic
+
+    Raises:
+        argparse.ArgumentTypeError
+            If it is not a known statistic or a percentile from p0 to p100
+    """
+
+    if stat in ["mean", "min", "max", "sum", "count", "stddev"]:
+        return stat
+
+    try:
+        if stat.startswith("p") and 0 <= float(stat[1:]) <= 100:
+            return stat
+    except ValueError:
+        pass
+
+    raise argparse.ArgumentTypeError(
+        "invalid stat: '" + stat + "', use mean, min, max, sum, count, stddev or p0 to p100"
+    )
+
+def aggregate_results(json_iter, args):
+    """
+    Folds the results into one accumulator per group, one file at a time,
+    so only the groups are held in memory and not the files
+
+    Parameters:
+        json_iter : iterable
+            The content of the result files
+        args : argparse.Namespace
+            The metric, the keys to group by, the filters, and the reservoir size
+
+    Returns:
+        groups : dict
+            The accumulator of each group, by the tuple of its group values
+    """
+
+    groups = {}
+    # A key given more than once matches any of its values
+    filters = {}
+    for condition in args.where:
+        key, value = condition.split("=", 1)
+        filters.setdefault(key, set()).add(value)
+
+    # Seeded, so the same files give the same percentiles
+    rng = random.Random(0)
+
+    for file in json_iter:
+        metadata = file.get("metadata")
+        if not isinstance(metadata, dict):
+            continue
+
+        for key_name, result in file.items():
+            if key_name == "metadata" or not isinstance(result, dict):
+                continue
+
+            # Compared as text, the files have numbers as both strings and integers
+            if any(
+                str(get_group_value(metadata, key_name, key)) not in values
+                for key, values in filters.items()
+            ):
+                continue
+
+            values = get_metric(result, args.metric)
+            group = tuple(get_group_value(metadata, key_name, key) for key in args.group_by)
+
+            if not values or None in group:
+                continue
+
+            accumulator = groups.setdefault(group, {
+                "count": 0, "sum": 0.0, "mean": 0.0, "m2": 0.0,
+                "min": math.inf, "max": -math.inf,
+                "reservoir": [], "size": args.reservoir
+            })
+
+            for value in values:
+                add_sample(accumulator, value, rng)
+
+    return groups
+
+def sort_key(group):
+    """
+    Sorts numbers as numbers and before text, like sort -n
+
+    Parameters:
+        group : tuple
+            The group values
+
+    Returns:
+        key : tuple
+            The key to sort by
+    """
+
+    key = []
+    for value in group:
+        try:
+            key.append((0, float(value), ""))
+        except (TypeError, ValueError):
+            key.append((1, 0.0, str(value)))
+
+    return tuple(key)
+
+def round_number(value):
+    """
+    Turns whole numbers into integers, and rounds the rest to 2 decimals
+
+    Parameters:
+        value : float
+            The number
+
+    Returns:
+        number : int or float
+            The rounded number
+    """
+
+    if float(value).is_integer():
+        return int(value)
+
+    return round(value, 2)
+
+def format_cell(cell):
+    """
+    Writes a cell of a TSV or CSV file, with NaN for a missing value as gnuplot expects
+
+    Parameters:
+        cell : object
+            The value of the cell, None if missing
+
+    Returns:
+        text : str
+            The cell as text
+    """
+
+    return "NaN" if cell is None else str(cell)
+
+def export_results(groups, args):
+    """
+    Writes the statistics of each group, sorted by the group values
+
+    The long layout has a column for each group key and statistic, and a row for each group,
+    like database_performance.tsv. The wide layout has a row for each group of all but the last
+    group key, and a column for each value of the last, like the histogram files
+
+    Parameters:
+        groups : dict
+            The accumulator of each group, by the tuple of its group values
+        args : argparse.Namespace
+            The metric, the keys to group by, the statistics, the layout, format and output file
+    """
+
+    stat_columns = [
+        args.metric if stat == "mean" else args.metric + "_" + stat for stat in args.stat
+    ]
+
+    header = list(args.group_by) + stat_columns
+    rows = [
+        list(group) + [round_number(get_statistic(groups[group], stat)) for stat in args.stat]
+        for group in sorted(groups, key=sort_key)
+    ]
+
+    if args.layout == "wide":
+        columns = sorted({group[-1] for group in groups}, key=lambda value: sort_key((value,)))
+        wide_rows = {}
+        for group in sorted(groups, key=sort_key):
+            wide_rows.setdefault(group[:-1], {})[group[-1]] = round_number(
+                get_statistic(groups[group], args.stat[0])
+            )
+
+        header = (
+            [args.row_label or " ".join(args.group_by[:-1])] + [str(column) for column in columns]
+        )
+        rows = [
+            [" ".join(str(value) for value in row_key)] +
+            [cells.get(column) for column in columns]
+            for row_key, cells in wide_rows.items()
+        ]
+
+    with open(args.output, "w", encoding="ASCII", newline="") as f:
+        if args.format == "json":
+            json.dump([dict(zip(header, row)) for row in rows], f, indent=4)
+        elif args.format == "csv":
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows([format_cell(cell) for cell in row] for row in rows)
+        elif args.layout == "wide":
+            # Quoted and separated by spaces, as gnuplot reads the columnheader of histograms,
+            # and underscores are subscripts to gnuplot
+            for row in [header] + rows:
+                f.write(" ".join(
+                    ['"' + str(row[0]).replace("_", " ") + '"'] +
+                    ['"' + cell + '"' if row is header else format_cell(cell) for cell in row[1:]]
+                ) + "\n")
+        else:
+            for row in [header] + rows:
+                f.write("\t".join(format_cell(cell) for cell in row) + "\n")
+
+    print("Output written to: " + args.output)
+
 def main():
     """
     Runs the program
     """
 
-    parser = argparse.ArgumentParser(description="Read multiple JSON files to compare")
+    parser = argparse.ArgumentParser(
+        description="Read multiple JSON files to compare",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
 
     parser.add_argument(
         "-f",
@@ -308,17 +1066,104 @@ def main():
         type=str
     )
 
-    args = parser.parse_args()
+    parser.add_argument(
+        "-c",
+        "--command",
+        help="rank: ranks the databases by time, default\n"
+        "usl: fits the Universal Scalability Law to the throughput against the workers\n"
+        "digest: compares the query response digests across the databases\n"
+        "export: writes a metric grouped by any keys as TSV, CSV or JSON for plotting",
+        choices=["rank", "usl", "digest", "export"],
+        default="rank",
+        type=str
+    )
 
-    file_list = get_file_list(args)
-    ordered_dict = read_json(file_list)
+    parser.add_argument(
+        "--metric",
+        help="The metric to export, as in rows_avg, queries_avg, time_run or bytes.bytes_sec,\n"
+        "lists give one value per run, default=rows_avg",
+        default="rows_avg",
+        type=str
+    )
 
-    output_file = "tsbs_ranking.json"
+    parser.add_argument(
+        "--group_by",
+        nargs="+",
+        help="The keys to group by: engine, workload, scale, workers, seed, runs, operation,\n"
+        "queries or any other metadata key, default=scale engine workload",
+        default=["scale", "engine", "workload"],
+        type=str
+    )
 
-    print("Output written to: " + output_file)
+    parser.add_argument(
+        "--stat",
+        nargs="+",
+        help="The statistics of each group: mean, min, max, sum, count, stddev,\n"
+        "or percentiles as in p50 p99, default=mean",
+        default=["mean"],
+        type=check_stat
+    )
 
-    with open(output_file, "w", encoding="ASCII") as f:
-        json.dump(ordered_dict, f, indent=4)
+    parser.add_argument(
+        "--where",
+        nargs="+",
+        help="Only exports the results where the keys have these values, as in workers=20,\n"
+        "a key given more than once matches any of its values",
+        default=[],
+        type=str
+    )
+
+    parser.add_argument(
+        "--layout",
+        help="long: a row per group, wide: a column for each value of the last group key,\n"
+        "default=long",
+        choices=["long", "wide"],
+        default="long",
+        type=str
+    )
+
+    parser.add_argument(
+        "--row_label",
+        help="The header of the first column in the wide layout, as in TestType,\n"
+        "default is the group keys of the rows",
+        type=str
+    )
+
+    parser.add_argument(
+        "--format",
+        help="The format of the export, default=tsv",
+        choices=["tsv", "csv", "json"],
+        default="tsv",
+        type=str
+    )
+
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="The file to export to, default=tsbs_export.<format>",
+        type=str
+    )
+
+    parser.add_argument(
+        "--reservoir",
+        help="The values kept per group for the percentiles, exact up to this many, default=10000",
+        default=10000,
+        type=int
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        if any("=" not in condition for condition in args.where):
+            parser.error("argument --where: use key=value")
+        if args.layout == "wide" and (len(args.group_by) < 2 or len(args.stat) > 1):
+            parser.error("the wide layout needs at least 2 --group_by keys and one --stat")
+        if args.reservoir < 1:
+            parser.error("argument --reservoir: must be at least 1")
+        if args.output is None:
+            args.output = "tsbs_export." + args.format
+
+    file_list = get_file_list(args)
 
     name_colors = {
         "influx": "#AEE0D7",
@@ -327,6 +1172,45 @@ def main():
         "victoriametrics": "#A5C8E0"
     }
 
+    if args.command == "export":
+        export_results(aggregate_results(read_files(file_list), args), args)
+        return
+
+    if args.command == "digest":
+        digest_dict = compare_digests(read_files(file_list))
+
+        output_file = "tsbs_digests.json"
+
+        print("Output written to: " + output_file)
+
+        with open(output_file, "w", encoding="ASCII") as f:
+            json.dump(digest_dict, f, indent=4)
+        return
+
+    if args.command == "usl":
+        usl_results = group_scaling(read_files(file_list))
+        for group in usl_results.values():
+            group["usl"] = fit_usl(group.pop("workers"))
+
+        output_file = "tsbs_usl.json"
+
+        print("Output written to: " + output_file)
+
+        with open(output_file, "w", encoding="ASCII") as f:
+            json.dump(usl_results, f, indent=4)
+
+        draw_usl(usl_results, name_colors)
+        return
+
+    ordered_dict = read_json(file_list)
+
+    output_file = "tsbs_ranking.json"
+
+    print("Output written to: " + output_file)
+
+    with open(output_file, "w", encoding="ASCII") as f:
+        json.dump(ordered_dict, f, indent=4)
+
     draw_plot(ordered_dict, name_colors)
 
 if __name__ == "__main__":
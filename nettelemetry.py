@@ -0,0 +1,919 @@
+"""
+Generates a network telemetry workload, interface counters for the ports of routers
+polled over SNMP, in the same ingest formats as tsbs_generate_data, with the queries for it
+and a runner for the queries with the same output as tsbs_run_queries
+
+    python nettelemetry.py data --format influx --scale 100 --seed 123 \\
+        --timestamp-start 2025-01-01T00:00:00Z --timestamp-end 2025-01-02T00:00:00Z
+    python nettelemetry.py queries --format questdb ... --queries 1000 --query-type topn-interfaces-1h
+    python nettelemetry.py run --format questdb --workers 4 < queries
+
+tsbs query files are gob encoded Go structs, so the queries are written as JSON lines
+in the dialect of each database and run by this file instead of tsbs_run_queries
+"""
+
+import sys
+import json
+import math
+import time
+import queue
+import datetime
+import argparse
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import numpy as np
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+MEASUREMENT = "ifstats"
+
+# The counters of each interface, in the order they are written
+FIELDS = [
+    "in_octets", "out_octets", "in_pkts", "out_pkts",
+    "in_errors", "out_errors", "in_discards", "out_discards", "oper_status"
+]
+
+# site, router and interface are on every series, description and vlan only on some
+TAG_KEYS = ["site", "router", "interface", "description", "vlan"]
+
+QUERY_TYPES = ["interface-rate-1h", "topn-interfaces-1h", "site-rollup-1h"]
+
+DEFAULT_URLS = {
+    "influx": "http://localhost:8086",
+    "questdb": "http://localhost:9000",
+    "victoriametrics": "http://localhost:8428"
+}
+
+NANOSECONDS = 1000000000
+
+def parse_timestamp(timestamp):
+    """
+    Parses a timestamp in the tsbs format into nanoseconds since the epoch
+
+    Parameters:
+        timestamp : str
+            The timestamp, as in 2025-01-01T00:00:00Z
+
+    Returns:
+        nanoseconds : int
+            The nanoseconds since the epoch
+    """
+
+    parsed = datetime.datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+
+    return int(parsed.timestamp()) * NANOSECONDS
+
+def format_timestamp(nanoseconds):
+    """
+    Formats nanoseconds since the epoch as a timestamp in UTC
+
+    Parameters:
+        nanoseconds : int
+            The nanoseconds since the epoch
+
+    Returns:
+        timestamp : str
+            The timestamp, as in 2025-01-01T00:00:00Z
+    """
+
+    parsed = datetime.datetime.fromtimestamp(nanoseconds // NANOSECONDS, datetime.timezone.utc)
+
+    return parsed.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def parse_duration(duration):
+    """
+    Parses a duration as given to tsbs into seconds
+
+    Parameters:
+        duration : str
+            The duration, as in 10s, 5m or 1h
+
+    Returns:
+        seconds : int
+            The duration in seconds
+    """
+
+    units = {"s": 1, "m": 60, "h": 3600}
+
+    if duration[-1] in units:
+        return int(duration[:-1]) * units[duration[-1]]
+
+    return int(duration)
+
+def create_interfaces(rng, routers, ports):
+    """
+    Creates the tags and traffic profile of every interface
+
+    Parameters:
+        rng : numpy.random.Generator
+            The seeded random generator
+        routers : int
+            The number of routers
+        ports : int
+            The number of ports on each router
+
+    Returns:
+        interface_dict : dict
+            The tags of each interface, and arrays with the traffic profile and counters
+    """
+
+    count = routers * ports
+    router_index = np.repeat(np.arange(routers), ports)
+
+    tags = []
+    has_description = rng.random(count) < 0.3
+    has_vlan = rng.random(count) < 0.15
+    vlans = rng.integers(2, 4095, count)
+
+    for index in range(count):
+        router = int(router_index[index])
+        port = index % ports
+        interface_tags = {
+            "site": "site_" + str(router // 10),
+            "router": "rtr_" + str(router),
+            "interface": "et-0/0/" + str(port)
+        }
+        if has_description[index]:
+            if port < 2:
+                interface_tags["description"] = "uplink_" + str(port)
+            else:
+                interface_tags["description"] = "customer_" + str(index)
+        if has_vlan[index]:
+            interface_tags["vlan"] = str(vlans[index])
+        tags.append(interface_tags)
+
+    interface_dict = {
+        "routers": routers,
+        "ports": ports,
+        "tags": tags,
+        # Bytes/sec in, spread over several orders of magnitude, with idle ports
+        "in_rate": rng.lognormal(math.log(2e6), 1.5, count) * (rng.random(count) > 0.1),
+        "out_ratio": rng.uniform(0.3, 1.5, count),
+        "packet_size": rng.uniform(200, 1400, count),
+        "error_rate": rng.lognormal(math.log(1e-7), 1.0, count),
+        "up": rng.random(count) > 0.05,
+        # Each router is polled at its own offset into the poll interval
+        "poll_offset": rng.uniform(0, 2, routers)
+    }
+
+    # SNMP counters do not start at zero, but at what the interface counted since it came up
+    uptime = rng.uniform(0, 30 * 86400, count)
+    interface_dict["counters"] = np.rint(
+        counter_increments(rng, interface_dict, uptime)
+    ).astype(np.int64)
+
+    return interface_dict
+
+def counter_increments(rng, interface_dict, seconds):
+    """
+    Creates how much the counters of each interface grow over the given time
+
+    Parameters:
+        rng : numpy.random.Generator
+            The seeded random generator
+        interface_dict : dict
+            The traffic profile of every interface
+        seconds : numpy.ndarray
+            The seconds of traffic for each interface, with bursts and the daily cycle applied
+
+    Returns:
+        increments : numpy.ndarray
+            The increase of the octet, packet, error and discard counters of each interface
+    """
+
+    in_octets = interface_dict["in_rate"] * seconds
+    out_octets = in_octets * interface_dict["out_ratio"]
+    in_pkts = in_octets / interface_dict["packet_size"]
+    out_pkts = out_octets / interface_dict["packet_size"]
+
+    return np.column_stack([
+        in_octets,
+        out_octets,
+        in_pkts,
+        out_pkts,
+        rng.poisson(in_pkts * interface_dict["error_rate"]),
+        rng.poisson(out_pkts * interface_dict["error_rate"]),
+        rng.poisson(in_pkts * interface_dict["error_rate"] * 10),
+        rng.poisson(out_pkts * interface_dict["error_rate"] * 10)
+    ])
+
+def create_templates(interface_dict, data_format):
+    """
+    Creates a format string for the lines of each router, with the tags written out,
+    so all the values of a router are formatted in one call
+
+    Parameters:
+        interface_dict : dict
+            The tags of each interface
+        data_format : str
+            The database format
+
+    Returns:
+        templates : list
+            The format string for each router, taking the row of values of each port,
+            with the timestamp first for timescaledb and last for line protocol
+    """
+
+    templates = []
+    ports = interface_dict["ports"]
+
+    for router in range(interface_dict["routers"]):
+        lines = []
+        for interface_tags in interface_dict["tags"][router * ports:(router + 1) * ports]:
+            if data_format == "timescaledb":
+                # Every tag column is written, empty when the tag is not set
+                lines.append(
+                    "tags," + ",".join(key + "=" + interface_tags.get(key, "") for key in TAG_KEYS) +
+                    "\n" + MEASUREMENT + ",%d," + ",".join(["%d"] * len(FIELDS)) + "\n"
+                )
+            else:
+                lines.append(
+                    MEASUREMENT + "," +
+                    ",".join(key + "=" + interface_tags[key] for key in sorted(interface_tags)) +
+                    " " + ",".join(field + "=%di" for field in FIELDS) + " %d\n"
+                )
+        templates.append("".join(lines))
+
+    return templates
+
+def timescaledb_header():
+    """
+    Creates the header tsbs_load_timescaledb reads the tags and fields from
+
+    Returns:
+        header : str
+            The tag columns, the field columns, and the empty line ending the header
+    """
+
+    return (
+        "tags," + ",".join(key + " string" for key in TAG_KEYS) + "\n" +
+        MEASUREMENT + "," + ",".join(FIELDS) + "\n\n"
+    )
+
+def generate_data(args, output_stream):
+    """
+    Writes the counters of every interface for each poll between the start and end time
+    Each poll is computed for all interfaces at once with NumPy, and written router by router
+
+    Parameters:
+        args : argparse.Namespace
+            The list of inline arguments given to the program
+        output_stream : io.BufferedWriter
+            Where the data is written
+    """
+
+    rng = np.random.default_rng(args.seed)
+    interface_dict = create_interfaces(rng, args.scale, args.ports)
+    templates = create_templates(interface_dict, args.format)
+
+    routers = interface_dict["routers"]
+    ports = interface_dict["ports"]
+    interval = parse_duration(args.log_interval)
+    start = parse_timestamp(args.timestamp_start)
+    end = parse_timestamp(args.timestamp_end)
+
+    counters = interface_dict["counters"]
+    up = interface_dict["up"].copy()
+    values = np.empty((routers * ports, len(FIELDS) + 1), dtype=np.int64)
+    timestamp_column = 0 if args.format == "timescaledb" else len(FIELDS)
+    field_columns = [column for column in range(len(FIELDS) + 1) if column != timestamp_column]
+
+    if args.format == "timescaledb":
+        output_stream.write(timescaledb_header().encode("ASCII"))
+
+    poll_start = start
+    while poll_start < end:
+        seconds = poll_start / NANOSECONDS
+
+        # Some links flap between polls, and a down link carries no traffic
+        up ^= rng.random(up.size) < 0.0005
+
+        # Daily cycle, bursts on each interface, and the odd burst over a whole router
+        daily = 1 + 0.5 * math.sin(2 * math.pi * (seconds % 86400) / 86400)
+        burst = rng.gamma(2.0, 0.5, up.size)
+        burst *= np.repeat(np.where(rng.random(routers) < 0.02, 5.0, 1.0), ports)
+
+        increments = counter_increments(rng, interface_dict, daily * burst * interval * up)
+        counters += np.rint(increments).astype(np.int64)
+
+        # The routers are polled in a burst at the start of the interval, a few are late
+        # and some polls are missed, while their counters keep counting
+        poll_times = poll_start + (
+            (interface_dict["poll_offset"] + rng.exponential(0.2, routers)) * NANOSECONDS
+        ).astype(np.int64)
+        polled = rng.random(routers) > 0.01
+
+        values[:, field_columns[:8]] = counters
+        values[:, field_columns[8]] = np.where(up, 1, 2)
+        values[:, timestamp_column] = np.repeat(poll_times, ports)
+
+        router_values = values.reshape(routers, -1).tolist()
+        chunk = "".join(
+            templates[router] % tuple(router_values[router])
+            for router in range(routers) if polled[router]
+        )
+        output_stream.write(chunk.encode("ASCII"))
+
+        poll_start += interval * NANOSECONDS
+
+def influx_query(query_type, selection):
+    """
+    Creates an InfluxQL query, run on /query
+
+    Parameters:
+        query_type : str
+            One of QUERY_TYPES
+        selection : dict
+            The start and end of the time window, and the router
+
+    Returns:
+        query_dict : dict
+            The path and parameters of the request
+    """
+
+    time_filter = (
+        "time >= '" + format_timestamp(selection["start"]) +
+        "' AND time < '" + format_timestamp(selection["end"]) + "'"
+    )
+
+    if query_type == "interface-rate-1h":
+        query = (
+            "SELECT spread(\"in_octets\") / 60 AS \"in_rate\", "
+            "spread(\"out_octets\") / 60 AS \"out_rate\" FROM \"" + MEASUREMENT + "\" "
+            "WHERE \"router\" = '" + selection["router"] + "' AND " + time_filter +
+            " GROUP BY time(1m), \"interface\""
+        )
+    elif query_type == "topn-interfaces-1h":
+        query = (
+            "SELECT top(\"in_rate\", \"router\", \"interface\", 10) FROM ("
+            "SELECT spread(\"in_octets\") / 3600 AS \"in_rate\" FROM \"" + MEASUREMENT + "\" "
+            "WHERE " + time_filter + " GROUP BY \"router\", \"interface\")"
+        )
+    else:
+        query = (
+            "SELECT sum(\"increase\") AS \"increase\" FROM ("
+            "SELECT spread(\"in_octets\") AS \"increase\" FROM \"" + MEASUREMENT + "\" "
+            "WHERE " + time_filter + " GROUP BY time(5m), \"site\", \"router\", \"interface\") "
+            "WHERE " + time_filter + " GROUP BY time(5m), \"site\""
+        )
+
+    return {"path": "/query", "params": {"q": query}}
+
+def questdb_query(query_type, selection):
+    """
+    Creates a QuestDB SQL query, run on /exec
+
+    Parameters:
+        query_type : str
+            One of QUERY_TYPES
+        selection : dict
+            The start and end of the time window, and the router
+
+    Returns:
+        query_dict : dict
+            The path and parameters of the request
+    """
+
+    time_filter = (
+        "timestamp >= '" + format_timestamp(selection["start"]) +
+        "' AND timestamp < '" + format_timestamp(selection["end"]) + "'"
+    )
+
+    if query_type == "interface-rate-1h":
+        query = (
+            "SELECT timestamp, interface, "
+            "(max(in_octets) - min(in_octets)) / 60.0 AS in_rate, "
+            "(max(out_octets) - min(out_octets)) / 60.0 AS out_rate "
+            "FROM " + MEASUREMENT + " WHERE router = '" + selection["router"] + "' AND " +
+            time_filter + " SAMPLE BY 1m ALIGN TO CALENDAR"
+        )
+    elif query_type == "topn-interfaces-1h":
+        query = (
+            "SELECT router, interface, (max(in_octets) - min(in_octets)) / 3600.0 AS in_rate "
+            "FROM " + MEASUREMENT + " WHERE " + time_filter +
+            " ORDER BY in_rate DESC LIMIT 10"
+        )
+    else:
+        query = (
+            "SELECT timestamp, site, sum(increase) AS increase FROM ("
+            "SELECT timestamp, site, router, interface, "
+            "max(in_octets) - min(in_octets) AS increase FROM " + MEASUREMENT +
+            " WHERE " + time_filter + " SAMPLE BY 5m ALIGN TO CALENDAR) "
+            "ORDER BY timestamp, site"
+        )
+
+    return {"path": "/exec", "params": {"query": query}}
+
+def timescaledb_query(query_type, selection):
+    """
+    Creates a TimescaleDB SQL query, on the tables made by tsbs_load_timescaledb
+
+    Parameters:
+        query_type : str
+            One of QUERY_TYPES
+        selection : dict
+            The start and end of the time window, and the router
+
+    Returns:
+        query_dict : dict
+            The SQL of the query
+    """
+
+    time_filter = (
+        "i.time >= '" + format_timestamp(selection["start"]) +
+        "' AND i.time < '" + format_timestamp(selection["end"]) + "'"
+    )
+    tables = MEASUREMENT + " i JOIN tags t ON i.tags_id = t.id"
+
+    if query_type == "interface-rate-1h":
+        query = (
+            "SELECT time_bucket('1 minute', i.time) AS bucket, t.interface, "
+            "(max(i.in_octets) - min(i.in_octets)) / 60.0 AS in_rate, "
+            "(max(i.out_octets) - min(i.out_octets)) / 60.0 AS out_rate "
+            "FROM " + tables + " WHERE t.router = '" + selection["router"] + "' AND " +
+            time_filter + " GROUP BY bucket, t.interface ORDER BY bucket, t.interface"
+        )
+    elif query_type == "topn-interfaces-1h":
+        query = (
+            "SELECT t.router, t.interface, "
+            "(max(i.in_octets) - min(i.in_octets)) / 3600.0 AS in_rate "
+            "FROM " + tables + " WHERE " + time_filter +
+            " GROUP BY t.router, t.interface ORDER BY in_rate DESC LIMIT 10"
+        )
+    else:
+        query = (
+            "SELECT bucket, site, sum(increase) AS increase FROM ("
+            "SELECT time_bucket('5 minutes', i.time) AS bucket, t.site, t.router, t.interface, "
+            "max(i.in_octets) - min(i.in_octets) AS increase FROM " + tables +
+            " WHERE " + time_filter + " GROUP BY bucket, t.site, t.router, t.interface"
+            ") AS increases GROUP BY bucket, site ORDER BY bucket, site"
+        )
+
+    return {"sql": query}
+
+def victoriametrics_query(query_type, selection):
+    """
+    Creates a PromQL query, run on /api/v1/query_range or /api/v1/query
+
+    Parameters:
+        query_type : str
+            One of QUERY_TYPES
+        selection : dict
+            The start and end of the time window, and the router
+
+    Returns:
+        query_dict : dict
+            The path and parameters of the request
+    """
+
+    metric = MEASUREMENT + "_in_octets"
+    start = selection["start"] // NANOSECONDS
+    end = selection["end"] // NANOSECONDS
+
+    if query_type == "interface-rate-1h":
+        series = MEASUREMENT + "_in_octets{router=\"" + selection["router"] + "\"}[1m]"
+        return {
+            "path": "/api/v1/query_range",
+            "params": {
+                "query": "(max_over_time(" + series + ") - min_over_time(" + series + ")) / 60",
+                "start": start,
+                "end": end,
+                "step": 60
+            }
+        }
+
+    if query_type == "topn-interfaces-1h":
+        return {
+            "path": "/api/v1/query",
+            "params": {
+                "query": "topk(10, (max_over_time(" + metric + "[1h]) - min_over_time(" +
+                metric + "[1h])) / 3600)",
+                "time": end
+            }
+        }
+
+    return {
+        "path": "/api/v1/query_range",
+        "params": {
+            "query": "sum by (site) (max_over_time(" + metric + "[5m]) - min_over_time(" +
+            metric + "[5m]))",
+            "start": start,
+            "end": end,
+            "step": 300
+        }
+    }
+
+query_builders = {
+    "influx": influx_query,
+    "questdb": questdb_query,
+    "timescaledb": timescaledb_query,
+    "victoriametrics": victoriametrics_query
+}
+
+def generate_queries(args, output_stream):
+    """
+    Writes the queries as JSON lines, each over a random hour of the data,
+    and the rate query for a random router
+
+    Parameters:
+        args : argparse.Namespace
+            The list of inline arguments given to the program
+        output_stream : io.TextIOWrapper
+            Where the queries are written
+    """
+
+    rng = np.random.default_rng(args.seed)
+
+    start = parse_timestamp(args.timestamp_start)
+    end = parse_timestamp(args.timestamp_end)
+    window = 3600 * NANOSECONDS
+
+    # The windows start on whole minutes, and cover all the data if there is less than an hour
+    minutes = max((end - start - window) // (60 * NANOSECONDS), 0) + 1
+    window_starts = start + rng.integers(0, minutes, args.queries) * 60 * NANOSECONDS
+    routers = rng.integers(0, args.scale, args.queries)
+
+    for index in range(args.queries):
+        selection = {
+            "start": int(window_starts[index]),
+            "end": min(int(window_starts[index]) + window, end),
+            "router": "rtr_" + str(routers[index])
+        }
+        query_dict = query_builders[args.format](args.query_type, selection)
+        query_dict["type"] = args.query_type
+
+        output_stream.write(json.dumps(query_dict) + "\n")
+
+def http_query(url, query_dict, config):
+    """
+    Runs a query over HTTP
+
+    Parameters:
+        url : str
+            The url of the database
+        query_dict : dict
+            The path and parameters of the request
+        config : dict
+            The auth token and database name
+
+    Returns:
+        body : bytes
+            The JSON response
+    """
+
+    params = dict(query_dict["params"])
+    headers = {}
+
+    if config["format"] == "influx":
+        params["db"] = config["db_name"]
+        headers["Authorization"] = "Token " + str(config["auth_token"])
+
+    request = urllib.request.Request(
+        url + query_dict["path"] + "?" + urllib.parse.urlencode(params), headers=headers
+    )
+
+    with urllib.request.urlopen(request, timeout=config["timeout"]) as response:
+        return response.read()
+
+def timescaledb_connect(config):
+    """
+    Opens a connection to TimescaleDB for one worker
+
+    Parameters:
+        config : dict
+            The host, port, user, password and database name
+
+    Returns:
+        connection : psycopg2.extensions.connection
+            The open connection
+    """
+
+    if psycopg2 is None:
+        sys.exit("psycopg2 is needed to run the netmon queries against TimescaleDB")
+
+    connection = psycopg2.connect(
+        host=config["host"],
+        port=config["port"],
+        user=config["user"],
+        password=config["password"],
+        dbname=config["db_name"]
+    )
+    connection.autocommit = True
+
+    return connection
+
+def timescaledb_query_rows(connection, query_dict):
+    """
+    Runs a query in TimescaleDB
+
+    Parameters:
+        connection : psycopg2.extensions.connection
+            The connection of the worker
+        query_dict : dict
+            The SQL of the query
+
+    Returns:
+        body : bytes
+            The rows as JSON, in the same shape tsbs prints them
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(query_dict["sql"])
+        columns = [column[0] for column in cursor.description]
+        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    return json.dumps({"query": query_dict["sql"], "results": results}, default=str).encode("utf-8")
+
+def latency_line(latencies):
+    """
+    Formats the latencies of the queries like tsbs_run_queries
+
+    Parameters:
+        latencies : list
+            The seconds each query took
+
+    Returns:
+        line : str
+            The min, median, mean, max, standard deviation, sum and count
+    """
+
+    ordered = sorted(latencies)
+    count = len(ordered)
+    mean = sum(ordered) / count
+    stddev = math.sqrt(sum((value - mean) ** 2 for value in ordered) / count)
+
+    return (
+        "min: %8.2fms, med: %8.2fms, mean: %8.2fms, max: %7.2fms, "
+        "stddev: %8.2fms, sum: %5.1fsec, count: %d" % (
+            ordered[0] * 1000, ordered[count // 2] * 1000, mean * 1000,
+            ordered[-1] * 1000, stddev * 1000, sum(ordered), count
+        )
+    )
+
+def run_queries(args, input_stream):
+    """
+    Runs the queries from the input with a pool of workers, and prints the
+    progress and the latencies in the same format as tsbs_run_queries
+
+    Parameters:
+        args : argparse.Namespace
+            The list of inline arguments given to the program
+        input_stream : io.TextIOWrapper
+            The queries as JSON lines
+
+    Returns:
+        exit_code : int
+            0 if every query succeeded, 1 if a query failed
+    """
+
+    config = {
+        "format": args.format,
+        "auth_token": args.auth_token,
+        "db_name": args.db_name,
+        "host": args.host,
+        "port": args.port,
+        "user": args.user,
+        "password": args.password,
+        "timeout": args.timeout
+    }
+    url = args.url or DEFAULT_URLS.get(args.format)
+
+    # Bounded, so the queries are read as the workers take them
+    query_queue = queue.Queue(maxsize=args.workers * 4)
+    state_lock = threading.Lock()
+    state = {"latencies": {}, "done": 0, "errors": [], "interval_done": 0}
+    start = time.monotonic()
+    interval_start = [start]
+
+    def worker():
+        connection = timescaledb_connect(config) if args.format == "timescaledb" else None
+
+        while True:
+            item = query_queue.get()
+            if item is None:
+                break
+
+            query_id, query_dict = item
+            query_start = time.monotonic()
+
+            try:
+                if connection is not None:
+                    body = timescaledb_query_rows(connection, query_dict)
+                else:
+                    body = http_query(url, query_dict, config)
+
+                # A response that is not JSON, such as an error page, counts as an error
+                response = json.loads(body) if args.print_responses else None
+            except (urllib.error.URLError, OSError, ValueError) as error:
+                with state_lock:
+                    state["errors"].append(str(error))
+                continue
+            except Exception as error: # pylint: disable=broad-exception-caught
+                # Errors from the database driver
+                with state_lock:
+                    state["errors"].append(repr(error))
+                continue
+
+            latency = time.monotonic() - query_start
+
+            with state_lock:
+                if args.print_responses:
+                    pretty = json.dumps(response, indent=2)
+                    prefix = "ID " + str(query_id) + ": "
+                    sys.stderr.write(prefix + pretty.replace("\n", "\n" + prefix) + "\n")
+
+                state["latencies"].setdefault(query_dict["type"], []).append(latency)
+                state["done"] += 1
+                state["interval_done"] += 1
+
+                if state["done"] % args.print_interval == 0:
+                    now = time.monotonic()
+                    print(
+                        "After " + str(state["done"]) + " queries with " +
+                        str(args.workers) + " workers:\n" +
+                        "Interval query rate: %0.2f queries/sec\tOverall query rate: "
+                        "%0.2f queries/sec" % (
+                            state["interval_done"] / (now - interval_start[0]),
+                            state["done"] / (now - start)
+                        ),
+                        flush=True
+                    )
+                    state["interval_done"] = 0
+                    interval_start[0] = now
+
+        if connection is not None:
+            connection.close()
+
+    workers = [threading.Thread(target=worker, daemon=True) for _ in range(args.workers)]
+    for thread in workers:
+        thread.start()
+
+    for query_id, line in enumerate(input_stream):
+        if line.strip():
+            query_queue.put((query_id + 1, json.loads(line)))
+
+    for _ in workers:
+        query_queue.put(None)
+    for thread in workers:
+        thread.join()
+
+    wall_time = time.monotonic() - start
+
+    if state["errors"]:
+        sys.stderr.write("panic: " + str(len(state["errors"])) + " queries failed, the first: " +
+                         state["errors"][0] + "\n")
+        return 1
+
+    all_latencies = [value for values in state["latencies"].values() for value in values]
+    if not all_latencies:
+        sys.stderr.write("panic: no queries to run\n")
+        return 1
+
+    print(
+        "Run complete after " + str(state["done"]) + " queries with " + str(args.workers) +
+        " workers (Overall query rate %0.2f queries/sec):" % (state["done"] / wall_time)
+    )
+    for query_type, latencies in state["latencies"].items():
+        print("Netmon " + query_type + ":")
+        print(latency_line(latencies))
+    print("all queries" + " " * 53 + ":")
+    print(latency_line(all_latencies))
+    print("wall clock time: %fsec" % wall_time)
+
+    return 0
+
+def add_generate_arguments(parser):
+    """
+    Adds the arguments shared by the data and queries commands, named as for tsbs_generate_*
+
+    Parameters:
+        parser : argparse.ArgumentParser
+            The parser of the command
+    """
+
+    parser.add_argument(
+        "--use-case",
+        help="The use case, only netmon",
+        choices=["netmon"],
+        default="netmon",
+        type=str
+    )
+    parser.add_argument(
+        "--format",
+        help="The database format, REQUIRED",
+        choices=["influx", "questdb", "timescaledb", "victoriametrics"],
+        required=True,
+        type=str
+    )
+    parser.add_argument(
+        "--seed",
+        help="The seed for the random generator, default=123",
+        default=123,
+        type=int
+    )
+    parser.add_argument(
+        "--scale",
+        help="The number of routers, default=100",
+        default=100,
+        type=int
+    )
+    parser.add_argument(
+        "--timestamp-start",
+        help="The start of the data, as in 2025-01-01T00:00:00Z, REQUIRED",
+        required=True,
+        type=str
+    )
+    parser.add_argument(
+        "--timestamp-end",
+        help="The end of the data, REQUIRED",
+        required=True,
+        type=str
+    )
+
+def main():
+    """
+    Runs the program
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Generates and queries a network telemetry workload for tsbs"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    data_parser = commands.add_parser("data", help="Writes the data to stdout")
+    add_generate_arguments(data_parser)
+    data_parser.add_argument(
+        "--log-interval",
+        help="The time between polls of a router, default=10s",
+        default="10s",
+        type=str
+    )
+    data_parser.add_argument(
+        "--ports",
+        help="The number of ports on each router, default=48",
+        default=48,
+        type=int
+    )
+
+    queries_parser = commands.add_parser("queries", help="Writes the queries to stdout")
+    add_generate_arguments(queries_parser)
+    queries_parser.add_argument(
+        "--queries",
+        help="The number of queries, default=1000",
+        default=1000,
+        type=int
+    )
+    queries_parser.add_argument(
+        "--query-type",
+        help="The query type, REQUIRED",
+        choices=QUERY_TYPES,
+        required=True,
+        type=str
+    )
+
+    run_parser = commands.add_parser("run", help="Runs the queries from stdin")
+    run_parser.add_argument(
+        "--format",
+        help="The database format, REQUIRED",
+        choices=["influx", "questdb", "timescaledb", "victoriametrics"],
+        required=True,
+        type=str
+    )
+    run_parser.add_argument("--workers", help="Queries run at once", default=1, type=int)
+    run_parser.add_argument("--url", help="The url of the database", type=str)
+    run_parser.add_argument("--auth-token", help="The Influx auth token", type=str)
+    run_parser.add_argument("--db-name", help="The database name", default="benchmark", type=str)
+    run_parser.add_argument("--host", help="The TimescaleDB host", default="localhost", type=str)
+    run_parser.add_argument("--port", help="The TimescaleDB port", default=5432, type=int)
+    run_parser.add_argument("--user", help="The TimescaleDB user", default="postgres", type=str)
+    run_parser.add_argument("--pass", dest="password", help="The TimescaleDB password", type=str)
+    run_parser.add_argument(
+        "--timeout", help="The seconds a query may take, default=600", default=600, type=int
+    )
+    run_parser.add_argument(
+        "--print-interval",
+        help="Prints the query rate after this many queries, default=100",
+        default=100,
+        type=int
+    )
+    run_parser.add_argument(
+        "--print-responses", help="Prints the responses to stderr", action="store_true"
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "data":
+        generate_data(args, sys.stdout.buffer)
+    elif args.command == "queries":
+        generate_queries(args, sys.stdout)
+    else:
+        sys.exit(run_queries(args, sys.stdin))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Digests the query responses printed by tsbs_run_queries --print-responses while passing
+the rest of the output on
+Runs as a stage after tsbs_run_queries, with its stderr merged into stdout:
+
+    tsbs_run_queries_influx ... --print-responses 2>&1 | python response_digest.py -o run.digest
+
+Each response is normalized before it is hashed, so engines returning the same rows
+get the same digest: timestamps become exact epoch microseconds, float measurements are
+rounded, the tag and label values of a series lead each of its rows, the columns keep
+their order, and only the order of the rows is ignored
+"""
+
+import sys
+import re
+import json
+import hashlib
+import datetime
+import argparse
+import decimal
+
+# The prefix tsbs puts on each line of a response, as in "ID 12: "
+ID_PREFIX = re.compile(rb"^ID \d+: ")
+
+# Values under these keys describe the response, and are not part of the result.
+# They are only skipped next to other lists or objects, a row keeps all its columns
+METADATA_KEYS = {
+    "query", "columns", "tags", "metric", "name", "count", "timings",
+    "statement_id", "status", "resultType", "stats", "explain"
+}
+
+# The keys holding the tags of an InfluxDB series and the labels of a Prometheus series
+LABEL_KEYS = ["tags", "metric"]
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+DIGEST_MODULUS = 1 << 256
+
+def get_epoch_microseconds(value):
+    """
+    Turns a timestamp into exact epoch microseconds
+
+    Parameters:
+        value : object
+            Epoch seconds as a number or a string, or a datetime
+
+    Returns:
+        microseconds : str
+            The epoch microseconds as an integer
+    """
+
+    if isinstance(value, datetime.datetime):
+        # Timestamps without a time zone are UTC, as tsbs writes them
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return str((value - EPOCH) // datetime.timedelta(microseconds=1))
+
+    # Through the decimal text, so 1451606400.123 does not pick up float error
+    return str(int((decimal.Decimal(str(value)) * 1000000).to_integral_value()))
+
+def parse_timestamp(value):
+    """
+    Parses an ISO 8601 timestamp
+
+    Parameters:
+        value : str
+            The text from the response
+
+    Returns:
+        timestamp : datetime.datetime
+            The timestamp, None if the text is not a timestamp
+    """
+
+    # Plain dates and times of day are not timestamps
+    if len(value) < 16 or value[4:5] != "-" or value[10:11] not in ["T", " "]:
+        return None
+
+    # Python before 3.11 does not read the Z suffix
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+def normalize_value(value, precision, epoch=False):
+    """
+    Turns a value in a response into a comparable string
+
+    Parameters:
+        value : object
+            A scalar from the JSON response
+        precision : int
+            The significant digits float measurements are rounded to
+        epoch : bool
+            The value is epoch seconds, as the first value of a Prometheus sample
+
+    Returns:
+        normalized : str
+            Exact integers for integers and timestamps, the rounded number for floats,
+            and the text itself for tag values
+    """
+
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+
+    if epoch:
+        try:
+            return get_epoch_microseconds(value)
+        except decimal.InvalidOperation:
+            return str(value)
+
+    if isinstance(value, int):
+        return str(value)
+
+    if isinstance(value, str):
+        try:
+            return str(int(value))
+        except ValueError:
+            pass
+
+        try:
+            number = float(value)
+        except ValueError:
+            timestamp = parse_timestamp(value)
+            return value if timestamp is None else get_epoch_microseconds(timestamp)
+    else:
+        number = float(value)
+
+    # -0.0 and 0.0 are the same value
+    return format(number, "." + str(precision) + "g") if number else "0"
+
+def collect_rows(node, rows, precision, labels=(), epoch_first=False):
+    """
+    Walks the response and collects each list or object of scalars as a row
+
+    Parameters:
+        node : object
+            The part of the response to walk
+        rows : list
+            The normalized rows found so far
+        precision : int
+            The significant digits float measurements are rounded to
+        labels : tuple
+            The normalized tag or label values of the series the rows belong to
+        epoch_first : bool
+            The rows are Prometheus samples, starting with epoch seconds
+    """
+
+    if isinstance(node, dict):
+        children = list(node.values())
+    elif isinstance(node, list):
+        children = node
+    else:
+        return
+
+    if children and not any(isinstance(child, (dict, list)) for child in children):
+        row = list(labels) + [
+            normalize_value(child, precision, epoch_first and index == 0)
+            for index, child in enumerate(children)
+        ]
+        rows.append(",".join(row))
+        return
+
+    if isinstance(node, dict):
+        for key in LABEL_KEYS:
+            if isinstance(node.get(key), dict):
+                # The metric name is the same on every series of a query
+                labels = tuple(labels) + tuple(
+                    normalize_value(value, precision)
+                    for name, value in sorted(node[key].items()) if name != "__name__"
+                )
+        epoch_first = epoch_first or isinstance(node.get("metric"), dict)
+        children = [value for key, value in node.items() if key not in METADATA_KEYS]
+
+    for child in children:
+        collect_rows(child, rows, precision, labels, epoch_first)
+
+def digest_response(block, digest_dict, precision):
+    """
+    Adds one response to the digest of the run
+
+    Parameters:
+        block : bytes
+            The JSON of the response, without the ID prefixes
+        digest_dict : dict
+            The responses, rows, bytes and digest so far
+        precision : int
+            The significant digits float measurements are rounded to
+    """
+
+    digest_dict["responses"] += 1
+    digest_dict["bytes"] += len(block)
+
+    try:
+        response = json.loads(block)
+    except ValueError:
+        digest_dict["unparsed"] += 1
+        return
+
+    rows = []
+    collect_rows(response, rows, precision)
+    rows.sort()
+
+    digest_dict["rows"] += len(rows)
+
+    # Added up, so the digest does not depend on the order the workers answered in
+    response_hash = hashlib.sha256("\n".join(rows).encode("UTF-8")).digest()
+    digest_dict["digest"] = (
+        digest_dict["digest"] + int.from_bytes(response_hash, "big")
+    ) % DIGEST_MODULUS
+
+def digest_stream(input_stream, output_stream, precision):
+    """
+    Digests each response in the input, and copies the other lines to the output as they come
+
+    Parameters:
+        input_stream : io.BufferedReader
+            The output of tsbs_run_queries
+        output_stream : io.BufferedWriter
+            Where the other lines go
+        precision : int
+            The significant digits float measurements are rounded to
+
+    Returns:
+        digest_dict : dict
+            The number of responses, their rows and bytes, the responses that
+            were not JSON, and the digest
+    """
+
+    digest_dict = {"responses": 0, "rows": 0, "bytes": 0, "unparsed": 0, "digest": 0}
+
+    # Only the response being read is held, from its "{" line to its "}" line
+    block = None
+
+    for line in input_stream:
+        content = ID_PREFIX.sub(b"", line)
+
+        if block is None:
+            if content.rstrip() == b"{":
+                block = [content]
+                continue
+
+            # A response printed without indentation is on a single line
+            if content.startswith(b"{"):
+                digest_response(content, digest_dict, precision)
+                continue
+
+            output_stream.write(line)
+            output_stream.flush()
+            continue
+
+        block.append(content)
+
+        if content.rstrip() == b"}":
+            digest_response(b"".join(block), digest_dict, precision)
+            block = None
+
+    if block is not None:
+        digest_response(b"".join(block), digest_dict, precision)
+
+    digest_dict["digest"] = format(digest_dict["digest"], "064x")
+
+    return digest_dict
+
+def main():
+    """
+    Runs the program
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Digests the tsbs query responses from stdin, passing the rest on to stdout"
+    )
+
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="The file to write the digest to as JSON, REQUIRED",
+        required=True,
+        type=str
+    )
+
+    parser.add_argument(
+        "-p",
+        "--precision",
+        help="The significant digits float measurements are rounded to, default=6",
+        default=6,
+        type=int
+    )
+
+    args = parser.parse_args()
+
+    digest_dict = digest_stream(sys.stdin.buffer, sys.stdout.buffer, args.precision)
+
+    with open(args.output, "w", encoding="ASCII") as f:
+        json.dump(digest_dict, f)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,735 @@
+"""
+Runs a scenario of phases against the databases, as described in a TOML or YAML file:
+
+    python scenario.py scenarios/backfill_live_adhoc.toml
+
+The [benchmark] table holds the arguments of benchmark.py shared by every phase, and each
+[[phase]] loads days of data or runs query types, on top of the generate and load/query
+functions of benchmark.py. Phases run in waves: a wave starts every phase whose dependencies
+have finished, side by side, and the next wave starts when they are all done.
+Every phase is recorded in one result file per database
+"""
+
+import sys
+import copy
+import json
+import time
+import pathlib
+import argparse
+import threading
+
+try:
+    import tomllib
+except ImportError:
+    tomllib = None
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+import benchmark
+import engine_hooks
+
+# The phase keys that replace the argument of benchmark.py with the same meaning
+PHASE_ARGS = {"workers": "workers", "batch": "batch", "scale": "scale", "query_count": "queries"}
+
+PHASE_KEYS = {
+    "name", "operation", "use_case", "after", "days", "start_day", "queries", "repeat", "duration"
+} | set(PHASE_ARGS)
+
+def load_scenario(scenario_file):
+    """
+    Reads the scenario file
+
+    Parameters:
+        scenario_file : str
+            The TOML or YAML file with the scenario
+
+    Returns:
+        scenario : dict
+            The benchmark arguments, the phases, and the name of the scenario
+    """
+
+    path = pathlib.Path(scenario_file)
+
+    if path.suffix in [".yaml", ".yml"]:
+        if yaml is None:
+            sys.exit("YAML scenarios need PyYAML, pip install pyyaml")
+        with open(path, "r", encoding="UTF-8") as f:
+            scenario = yaml.safe_load(f)
+    else:
+        if tomllib is None:
+            sys.exit("TOML scenarios need Python 3.11 or newer")
+        with open(path, "rb") as f:
+            scenario = tomllib.load(f)
+
+    if not isinstance(scenario, dict) or not scenario.get("phase"):
+        sys.exit(scenario_file + " has no [[phase]]")
+
+    scenario.setdefault("name", path.stem)
+
+    return scenario
+
+def get_scenario_args(scenario):
+    """
+    Parses the [benchmark] table as arguments of benchmark.py, so they are checked the same way
+
+    Parameters:
+        scenario : dict
+            The scenario from load_scenario
+
+    Returns:
+        args : argparse.Namespace
+            The arguments shared by every phase
+    """
+
+    argv = ["-o", "write"]
+
+    for key, value in scenario.get("benchmark", {}).items():
+        if value is True:
+            argv.append("--" + key)
+        elif value is False:
+            continue
+        elif isinstance(value, list):
+            argv += ["--" + key] + [str(item) for item in value]
+        else:
+            argv += ["--" + key, str(value)]
+
+    args = benchmark.handle_args(argv)
+
+    # Each phase is its own run
+    args.runs = 1
+
+    return args
+
+def check_phases(phases, args, query_suites):
+    """
+    Checks the phases and fills in their defaults
+
+    Parameters:
+        phases : list
+            The phases from the scenario file
+        args : argparse.Namespace
+            The arguments shared by every phase
+        query_suites : dict
+            A dict with the query types and their timeouts for each use case
+
+    Returns:
+        phase_dict : dict
+            The phases by name, in the order of the file
+    """
+
+    phase_dict = {}
+
+    for number, phase in enumerate(phases):
+        name = phase.get("name", "phase_" + str(number + 1))
+
+        unknown = set(phase) - PHASE_KEYS
+        if unknown:
+            sys.exit("Phase " + name + " has unknown keys: " + ", ".join(sorted(unknown)))
+        if name in phase_dict:
+            sys.exit("Two phases are named " + name)
+        if phase.get("operation") not in ["write", "read"]:
+            sys.exit("Phase " + name + " needs an operation, write or read")
+
+        phase = dict(phase, name=name)
+        phase.setdefault("use_case", args.use_case or "devops")
+        phase.setdefault("repeat", 1)
+
+        if phase["use_case"] not in query_suites:
+            sys.exit("Phase " + name + " has an unknown use case: " + phase["use_case"])
+
+        # One dependency can be given without a list
+        if isinstance(phase.get("after", []), str):
+            phase["after"] = [phase["after"]]
+        phase.setdefault("after", [])
+
+        if phase["operation"] == "write":
+            phase.setdefault("days", 1)
+        else:
+            phase.setdefault("queries", list(query_suites[phase["use_case"]]))
+            for query_name in phase["queries"]:
+                if query_name not in query_suites[phase["use_case"]]:
+                    sys.exit("Phase " + name + " has an unknown query type: " + query_name)
+
+        phase_dict[name] = phase
+
+    for phase in phase_dict.values():
+        for dependency in phase["after"]:
+            if dependency not in phase_dict:
+                sys.exit("Phase " + phase["name"] + " runs after an unknown phase: " + dependency)
+
+    return phase_dict
+
+def plan_waves(phase_dict):
+    """
+    Orders the phases into waves, where every phase in a wave has its dependencies
+    in the waves before it
+
+    Parameters:
+        phase_dict : dict
+            The phases by name
+
+    Returns:
+        waves : list
+            A list of the phase names for each wave
+    """
+
+    waves = []
+    done = set()
+
+    while len(done) < len(phase_dict):
+        wave = [
+            name for name, phase in phase_dict.items()
+            if name not in done and set(phase["after"]) <= done
+        ]
+
+        if not wave:
+            sys.exit(
+                "The phases depend on each other in a loop: " +
+                ", ".join(name for name in phase_dict if name not in done)
+            )
+
+        waves.append(wave)
+        done.update(wave)
+
+    return waves
+
+def assign_days(phase_dict):
+    """
+    Gives each write phase its days of data, following on from the write phases before it
+    in the file unless it sets its start_day
+
+    Parameters:
+        phase_dict : dict
+            The phases by name
+
+    Returns:
+        days : int
+            The number of days the scenario writes, from the start of the month
+    """
+
+    next_day = {}
+    days = 0
+
+    for phase in phase_dict.values():
+        if phase["operation"] != "write":
+            continue
+
+        phase.setdefault("start_day", next_day.get(phase["use_case"], 0))
+        next_day[phase["use_case"]] = phase["start_day"] + phase["days"]
+        days = max(days, next_day[phase["use_case"]])
+
+    return days
+
+def get_dependencies(phase_dict, name):
+    """
+    Finds every phase a phase waits for, directly or through other phases
+
+    Parameters:
+        phase_dict : dict
+            The phases by name
+        name : str
+            The phase to find the dependencies of
+
+    Returns:
+        dependencies : set
+            The names of the phases
+    """
+
+    dependencies = set()
+    waiting = list(phase_dict[name]["after"])
+
+    while waiting:
+        dependency = waiting.pop()
+        if dependency not in dependencies:
+            dependencies.add(dependency)
+            waiting += phase_dict[dependency]["after"]
+
+    return dependencies
+
+def get_query_window(phase_dict, name, timestamps):
+    """
+    Finds the window a read phase queries: the days written for its use case by the phases
+    it waits for, or by every write phase if it waits for none
+
+    Parameters:
+        phase_dict : dict
+            The phases by name
+        name : str
+            The read phase
+        timestamps : dict
+            A dict with the timestamps, one day each
+
+    Returns:
+        window : list
+            The start and end of the window
+    """
+
+    use_case = phase_dict[name]["use_case"]
+    writes = [
+        phase for phase in phase_dict.values()
+        if phase["operation"] == "write" and phase["use_case"] == use_case
+    ]
+
+    dependencies = get_dependencies(phase_dict, name)
+    if any(phase["name"] in dependencies for phase in writes):
+        writes = [phase for phase in writes if phase["name"] in dependencies]
+
+    if not writes:
+        return [timestamps["0"][0], timestamps["1"][0]]
+
+    first_day = min(phase["start_day"] for phase in writes)
+    last_day = max(phase["start_day"] + phase["days"] for phase in writes)
+
+    return [timestamps[str(first_day)][0], timestamps[str(last_day)][0]]
+
+def get_phase_args(phase, args):
+    """
+    Creates the arguments for a phase, with its own operation and overrides
+
+    Parameters:
+        phase : dict
+            The phase
+        args : argparse.Namespace
+            The arguments shared by every phase
+
+    Returns:
+        phase_args : argparse.Namespace
+            A copy of the arguments for the phase
+    """
+
+    phase_args = copy.copy(args)
+    phase_args.operation = phase["operation"]
+    phase_args.use_case = phase["use_case"]
+
+    for key, arg in PHASE_ARGS.items():
+        if key in phase:
+            setattr(phase_args, arg, benchmark.fix_args({arg: phase[key]}))
+
+    return phase_args
+
+def run_write_phase(phase, path_dict, args, db_setup, timestamps, database):
+    """
+    Generates and loads each day of the phase, until its days are loaded or its duration is up
+    Only the first day loaded in the scenario creates the database, the rest are added to it
+
+    Parameters:
+        phase : dict
+            The write phase
+        path_dict : dict
+            A dict with the path to TSBS, and the use case of the phase
+        args : argparse.Namespace
+            The arguments for the phase
+        db_setup : dict
+            The dict with all metadata about the selected database
+        timestamps : dict
+            A dict with the timestamps, one day each
+        database : dict
+            The lock and whether the database is created, shared by the write phases
+
+    Returns:
+        runs : list
+            The result of loading each day
+    """
+
+    runs = []
+    start = time.monotonic()
+
+    for day in range(phase["start_day"], phase["start_day"] + phase["days"]):
+        if "duration" in phase and time.monotonic() - start >= phase["duration"]:
+            break
+
+        path_dict["test_file"] = args.format + "_" + phase["name"] + "_" + phase["use_case"]
+
+        # Each day is new data, seeded by its day
+        run_dict = {"file_number": 0, "run": day, "window": timestamps[str(day)]}
+        stream_dict = benchmark.generate_files(path_dict, args, timestamps, run_dict, {})
+
+        # The other write phases wait for the first load, as tsbs_load drops the database
+        # when it creates it
+        with database["lock"]:
+            create_db = not database["created"]
+            if create_db:
+                run_return_dict = benchmark.process_tsbs(path_dict, args, db_setup)
+                database["created"] = "error" not in run_return_dict and \
+                    "timeout" not in run_return_dict
+
+        if not create_db:
+            run_return_dict = benchmark.process_tsbs(path_dict, args, db_setup, create_db=False)
+
+        run_return_dict["day"] = timestamps[str(day)][0]
+
+        if stream_dict:
+            run_return_dict["stream"] = stream_dict
+
+        runs.append(run_return_dict)
+
+    return runs
+
+def run_read_phase(phase, path_dict, args, db_setup, timestamps, query_suites, window):
+    """
+    Runs every query type of the phase in turn, repeat times or until its duration is up
+
+    Parameters:
+        phase : dict
+            The read phase
+        path_dict : dict
+            A dict with the path to TSBS, and the use case of the phase
+        args : argparse.Namespace
+            The arguments for the phase
+        db_setup : dict
+            The dict with all metadata about the selected database
+        timestamps : dict
+            A dict with the timestamps, one day each
+        query_suites : dict
+            A dict with the query types and their timeouts for each use case
+        window : list
+            The start and end of the data to query
+
+    Returns:
+        runs : list
+            The result of each query file
+    """
+
+    runs = []
+    start = time.monotonic()
+    repetition = 0
+
+    path_dict["active_use_case"] = phase["use_case"]
+
+    query_names = [
+        query_name for query_name in phase["queries"]
+        if query_suites[phase["use_case"]][query_name]["query"]
+        not in db_setup[args.format]["unsupported_queries"]
+    ]
+
+    if not query_names:
+        print("Phase " + phase["name"] + " has no query types " + args.format + " supports")
+        return runs
+
+    while True:
+        if "duration" in phase:
+            if repetition and time.monotonic() - start >= phase["duration"]:
+                break
+        elif repetition >= phase["repeat"]:
+            break
+
+        for query_name in query_names:
+            query = query_suites[phase["use_case"]][query_name]
+
+            path_dict["test_file"] = args.format + "_" + phase["name"] + "_" + query_name
+
+            # Each repetition is new queries, seeded by the repetition
+            run_dict = {"file_number": 0, "run": repetition, "window": window}
+            query_dict = {"query": query["query"], "query_name": query_name}
+            benchmark.generate_files(path_dict, args, timestamps, run_dict, query_dict)
+
+            run_return_dict = benchmark.process_tsbs(
+                path_dict, args, db_setup, args.query_timeout or query["timeout"]
+            )
+            run_return_dict["query_name"] = query_name
+            run_return_dict["repetition"] = repetition
+
+            runs.append(run_return_dict)
+
+        repetition += 1
+
+    return runs
+
+def average_phase(phase, runs, args):
+    """
+    Averages the runs of a phase like benchmark.py averages its runs,
+    for the whole phase when writing and for each query type when reading
+
+    Parameters:
+        phase : dict
+            The phase
+        runs : list
+            The result of each run
+        args : argparse.Namespace
+            The arguments for the phase
+
+    Returns:
+        avg_dict : dict
+            The averages, and the errors and timeouts
+    """
+
+    avg_dict = {}
+
+    groups = {phase["use_case"]: runs}
+    if phase["operation"] == "read":
+        groups = {}
+        for run in runs:
+            groups.setdefault(run["query_name"], []).append(run)
+
+    for key_name, group in groups.items():
+        finished = [run for run in group if "time" in run]
+
+        run_dict = {"t_run": [run["time"] for run in finished]}
+        if phase["operation"] == "write":
+            run_dict.update({
+                "metrics": [run["metrics"] for run in finished],
+                "rows": [run["rows"] for run in finished]
+            })
+        else:
+            run_dict.update({
+                "queries": [run["query"] for run in finished],
+                "latency": [run.get("latency_ms") for run in finished]
+            })
+
+        avg_dict[key_name] = benchmark.average_runs(run_dict, args) if finished else {}
+
+        if phase["operation"] == "write" and finished:
+            avg_dict[key_name].update({
+                "total_metrics": sum(run["totals"][0] for run in finished),
+                "total_rows": sum(run["totals"][1] for run in finished)
+            })
+
+        errors = [run["error"] for run in group if "error" in run]
+        if errors:
+            avg_dict[key_name]["errors"] = errors
+
+        timeouts = len([run for run in group if "timeout" in run])
+        if timeouts:
+            avg_dict[key_name]["timeouts"] = timeouts
+
+    return avg_dict
+
+def run_phase(phase, plan, result_dict):
+    """
+    Runs one phase and records it in the result of the scenario
+    A phase that raised, or a write phase that did not load every day, is recorded with its error
+
+    Parameters:
+        phase : dict
+            The phase
+        plan : dict
+            The arguments, paths, database setup, timestamps, query suites
+            and phases of the scenario, whether its database is created, and its start
+        result_dict : dict
+            The results of every phase so far
+    """
+
+    args = get_phase_args(phase, plan["args"])
+    path_dict = dict(plan["path_dict"], use_case=[phase["use_case"]])
+
+    phase_result = {
+        "operation": phase["operation"],
+        "use_case": phase["use_case"],
+        "after": phase["after"],
+        "workers": args.workers,
+        "start": round(time.monotonic() - plan["start"], 2)
+    }
+
+    print("Starting phase " + phase["name"])
+
+    try:
+        if phase["operation"] == "write":
+            runs = run_write_phase(
+                phase, path_dict, args, plan["db_setup"], plan["timestamps"], plan["database"]
+            )
+        else:
+            phase_result["window"] = get_query_window(
+                plan["phases"], phase["name"], plan["timestamps"]
+            )
+            runs = run_read_phase(
+                phase, path_dict, args, plan["db_setup"], plan["timestamps"],
+                plan["query_suites"], phase_result["window"]
+            )
+
+        phase_result["runs"] = runs
+        phase_result["averages"] = average_phase(phase, runs, args)
+
+        # The phases after it would query days that are missing
+        if phase["operation"] == "write" and any(
+            "error" in run or "timeout" in run for run in runs
+        ):
+            phase_result["error"] = "Not every day was loaded"
+    except Exception as error: # pylint: disable=broad-exception-caught
+        phase_result["error"] = type(error).__name__ + ": " + str(error)
+
+    phase_result["end"] = round(time.monotonic() - plan["start"], 2)
+
+    if "error" in phase_result:
+        print("Phase " + phase["name"] + " failed: " + phase_result["error"])
+    else:
+        print("Finished phase " + phase["name"] + " after " +
+              str(round(phase_result["end"] - phase_result["start"], 2)) + " seconds")
+
+    result_dict[phase["name"]] = phase_result
+
+def run_scenario(scenario, args, engine):
+    """
+    Runs every phase of the scenario against one database, wave by wave
+
+    Parameters:
+        scenario : dict
+            The scenario from load_scenario
+        args : argparse.Namespace
+            The arguments shared by every phase
+        engine : str
+            The database to run against
+
+    Returns:
+        scenario_dict : dict
+            The waves, the result of every phase, and the phases that failed or were skipped
+    """
+
+    args = copy.copy(args)
+    args.format = engine
+
+    query_suites = benchmark.get_query_suites()
+    db_setup = benchmark.get_db_setup(args, query_suites)
+
+    phase_dict = check_phases(scenario["phase"], args, query_suites)
+    waves = plan_waves(phase_dict)
+
+    # The window after the last day is the end of the queries over it
+    timestamp_args = copy.copy(args)
+    timestamp_args.runs = assign_days(phase_dict) + 1
+    start_date, timestamps = benchmark.create_timestamps(timestamp_args)
+
+    path_dict = {
+        "main_path": str(pathlib.Path(pathlib.Path.cwd(), "tsbs")),
+        "codec": benchmark.get_codec(args)
+    }
+
+    if not benchmark.codec_installed(path_dict["codec"]):
+        sys.exit("The " + args.codec + " codec is not installed")
+
+    scenario_dict = {"name": scenario["name"], "start_date": start_date, "waves": waves}
+
+    if scenario.get("reset"):
+        print("Resetting " + engine + " before the scenario")
+        scenario_dict["reset"] = engine_hooks.reset(engine, db_setup[engine]["hook_config"])
+
+    plan = {
+        "args": args,
+        "path_dict": path_dict,
+        "db_setup": db_setup,
+        "timestamps": timestamps,
+        "query_suites": query_suites,
+        "phases": phase_dict,
+        "database": {"lock": threading.Lock(), "created": False},
+        "start": time.monotonic()
+    }
+
+    result_dict = {}
+
+    failed = []
+
+    for number, wave in enumerate(waves):
+        print("Wave " + str(number + 1) + ": " + ", ".join(wave))
+
+        # A phase after a failed or skipped phase is skipped, and so are the phases after it
+        ready = []
+        for name in wave:
+            blocked = [dependency for dependency in phase_dict[name]["after"] if dependency in failed]
+            if blocked:
+                print("Skipping phase " + name + ", it runs after " + ", ".join(blocked))
+                result_dict[name] = {
+                    "operation": phase_dict[name]["operation"],
+                    "use_case": phase_dict[name]["use_case"],
+                    "after": phase_dict[name]["after"],
+                    "skipped": "Runs after the failed phases " + ", ".join(blocked)
+                }
+                failed.append(name)
+            else:
+                ready.append(name)
+
+        threads = [
+            threading.Thread(target=run_phase, args=(phase_dict[name], plan, result_dict))
+            for name in ready
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        failed += [name for name in ready if "error" in result_dict[name]]
+
+    scenario_dict["seconds"] = round(time.monotonic() - plan["start"], 2)
+    scenario_dict["phases"] = {name: result_dict[name] for name in phase_dict}
+    scenario_dict["failed"] = failed
+
+    return scenario_dict
+
+def get_metadata(scenario, args, engine, scenario_file):
+    """
+    Creates the metadata of the result file of a scenario
+
+    Parameters:
+        scenario : dict
+            The scenario from load_scenario
+        args : argparse.Namespace
+            The arguments shared by every phase
+        engine : str
+            The database the scenario ran against
+        scenario_file : str
+            The TOML or YAML file with the scenario
+
+    Returns:
+        metadata : dict
+            The metadata, with the scenario operation so json_compare.py rank skips the file
+    """
+
+    return {
+        "db_engine": engine,
+        "scale": args.scale,
+        "seed": args.seed,
+        "workers": args.workers,
+        "operation": "scenario",
+        "scenario_file": scenario_file,
+        "scenario": scenario
+    }
+
+def main():
+    """
+    Runs the program
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Runs a scenario of write and read phases described in a TOML or YAML file"
+    )
+
+    parser.add_argument(
+        "scenario",
+        help="The scenario file, .toml, or .yaml with PyYAML installed, REQUIRED",
+        type=str
+    )
+
+    cli_args = parser.parse_args()
+
+    scenario = load_scenario(cli_args.scenario)
+    args = get_scenario_args(scenario)
+
+    exit_messages = []
+
+    for engine in args.formats:
+        try:
+            scenario_dict = run_scenario(scenario, args, engine)
+        except RuntimeError as error:
+            exit_messages.append(engine + ": " + str(error))
+            continue
+
+        scenario_dict["metadata"] = get_metadata(scenario, args, engine, cli_args.scenario)
+
+        output_file = "tsbs_" + engine + "_scenario_" + scenario_dict["name"] + ".json"
+        with open(output_file, "w", encoding="ASCII") as f:
+            json.dump(scenario_dict, f, indent=4)
+
+        print("Output written to: " + output_file)
+
+        if scenario_dict["failed"]:
+            exit_messages.append(
+                engine + ": the phases " + ", ".join(scenario_dict["failed"]) +
+                " failed or were skipped"
+            )
+
+    if exit_messages:
+        sys.exit("\n".join(exit_messages))
+
+if __name__ == "__main__":
+    main()
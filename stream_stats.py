@@ -0,0 +1,235 @@
+"""
+Counts the bytes, rows, metrics and series of a generated tsbs dataset while passing it on
+Runs as a stage in the pipeline between tsbs_generate_data and the codec:
+
+    tsbs_generate_data ... | python stream_stats.py -f influx -o data.stats | gzip > data.gz
+"""
+
+import sys
+import json
+import math
+import argparse
+
+# Bytes read from the generator at a time
+CHUNK_SIZE = 1 << 20
+
+# 2^14 HyperLogLog registers, about 0.8% standard error on the series count
+REGISTER_BITS = 14
+REST_BITS = 64 - REGISTER_BITS
+REST_MASK = (1 << REST_BITS) - 1
+HASH_MASK = (1 << 64) - 1
+
+def hll_estimate(registers):
+    """
+    Estimates the number of distinct series from the HyperLogLog registers
+
+    Parameters:
+        registers : bytearray
+            The highest rank seen for each register
+
+    Returns:
+        estimate : int
+            The estimated number of distinct series
+    """
+
+    register_count = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / register_count)
+
+    estimate = alpha * register_count ** 2 / sum(2.0 ** -rank for rank in registers)
+
+    # Linear counting is more precise while many registers are still empty
+    zeros = registers.count(0)
+    if estimate <= 2.5 * register_count and zeros:
+        estimate = register_count * math.log(register_count / zeros)
+
+    return int(round(estimate))
+
+def count_line_protocol(lines, stats_dict, registers):
+    """
+    Counts InfluxDB line protocol, used for influx, questdb and victoriametrics
+    The series is the measurement and tags, up to the first space
+
+    Parameters:
+        lines : list
+            The complete lines of the chunk
+        stats_dict : dict
+            The counts so far
+        registers : bytearray
+            The HyperLogLog registers for the series
+    """
+
+    rows = 0
+    metrics = 0
+
+    for line in lines:
+        if not line or line[0] == 35: # "#"
+            continue
+
+        first_space = line.find(b" ")
+        last_space = line.rfind(b" ")
+
+        rows += 1
+        metrics += line.count(b",", first_space, last_space) + 1
+
+        hashed = hash(line[:first_space]) & HASH_MASK
+        rank = REST_BITS - (hashed & REST_MASK).bit_length() + 1
+        register = hashed >> REST_BITS
+        if rank > registers[register]:
+            registers[register] = rank
+
+    stats_dict["rows"] += rows
+    stats_dict["metrics"] += metrics
+
+def count_timescaledb(lines, stats_dict, registers):
+    """
+    Counts the tsbs TimescaleDB format, a header ended by an empty line,
+    then a "tags," line followed by a measurement line for each row
+    The series is the tags and the measurement name
+
+    Parameters:
+        lines : list
+            The complete lines of the chunk
+        stats_dict : dict
+            The counts so far, and the last tags line
+        registers : bytearray
+            The HyperLogLog registers for the series
+    """
+
+    rows = 0
+    metrics = 0
+    tags = stats_dict["last_tags"]
+    in_header = stats_dict["in_header"]
+
+    for line in lines:
+        if in_header:
+            in_header = bool(line)
+            continue
+
+        if line.startswith(b"tags,"):
+            tags = line
+            continue
+
+        if not line:
+            continue
+
+        first_comma = line.find(b",")
+
+        rows += 1
+        # The measurement name and timestamp are not metrics
+        metrics += line.count(b",") - 1
+
+        hashed = hash(tags + line[:first_comma]) & HASH_MASK
+        rank = REST_BITS - (hashed & REST_MASK).bit_length() + 1
+        register = hashed >> REST_BITS
+        if rank > registers[register]:
+            registers[register] = rank
+
+    stats_dict["rows"] += rows
+    stats_dict["metrics"] += metrics
+    stats_dict["last_tags"] = tags
+    stats_dict["in_header"] = in_header
+
+def count_stream(input_stream, output_stream, count_lines):
+    """
+    Copies the input to the output, counting the bytes and lines on the way
+    The data is read into one reused buffer and written from it without copying,
+    only the complete lines are split out for counting the series
+
+    Parameters:
+        input_stream : io.RawIOBase
+            The unbuffered stdin
+        output_stream : io.RawIOBase
+            The unbuffered stdout
+        count_lines : function
+            count_line_protocol or count_timescaledb
+
+    Returns:
+        stats_dict : dict
+            The bytes, lines, rows, metrics and estimated series of the stream
+    """
+
+    buffer = bytearray(CHUNK_SIZE)
+    view = memoryview(buffer)
+    registers = bytearray(1 << REGISTER_BITS)
+    partial_line = b""
+
+    stats_dict = {
+        "bytes": 0,
+        "lines": 0,
+        "rows": 0,
+        "metrics": 0,
+        "last_tags": b"",
+        "in_header": True
+    }
+
+    while True:
+        read_bytes = input_stream.readinto(buffer)
+        if not read_bytes:
+            break
+
+        written = 0
+        while written < read_bytes:
+            written += output_stream.write(view[written:read_bytes])
+
+        stats_dict["bytes"] += read_bytes
+        stats_dict["lines"] += buffer.count(b"\n", 0, read_bytes)
+
+        lines = (partial_line + view[:read_bytes]).split(b"\n")
+        partial_line = lines.pop()
+        count_lines(lines, stats_dict, registers)
+
+    if partial_line:
+        stats_dict["lines"] += 1
+        count_lines([partial_line], stats_dict, registers)
+
+    return {
+        "bytes": stats_dict["bytes"],
+        "lines": stats_dict["lines"],
+        "rows": stats_dict["rows"],
+        "metrics": stats_dict["metrics"],
+        "series": hll_estimate(registers)
+    }
+
+def main():
+    """
+    Runs the program
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Counts a tsbs dataset from stdin while passing it on to stdout"
+    )
+
+    parser.add_argument(
+        "-f",
+        "--format",
+        help="The database format of the data, REQUIRED",
+        choices=["influx", "questdb", "timescaledb", "victoriametrics"],
+        required=True,
+        type=str
+    )
+
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="The file to write the counts to as JSON, REQUIRED",
+        required=True,
+        type=str
+    )
+
+    args = parser.parse_args()
+
+    if args.format == "timescaledb":
+        count_lines = count_timescaledb
+    else:
+        count_lines = count_line_protocol
+
+    # Unbuffered, so the data goes straight from the reused buffer to the next stage
+    with open(sys.stdin.fileno(), "rb", buffering=0, closefd=False) as input_stream, \
+            open(sys.stdout.fileno(), "wb", buffering=0, closefd=False) as output_stream:
+        stats_dict = count_stream(input_stream, output_stream, count_lines)
+
+    with open(args.output, "w", encoding="ASCII") as f:
+        json.dump(stats_dict, f)
+
+if __name__ == "__main__":
+    main()
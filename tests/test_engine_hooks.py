@@ -0,0 +1,210 @@
+"""
+Tests the engine hooks against a stub HTTP server and a psql stand-in for the databases
+"""
+
+import os
+import json
+import pathlib
+import tempfile
+import threading
+import unittest
+import urllib.parse
+import http.server
+from unittest import mock
+
+import engine_hooks
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Answers like QuestDB, InfluxDB and VictoriaMetrics, and records the requests
+    """
+
+    def do_GET(self): # pylint: disable=invalid-name
+        """
+        Answers the GET requests
+        """
+
+        self.server.requests.append(("GET", urllib.parse.unquote(self.path)))
+
+        if self.path.startswith("/exec"):
+            body = self.server.exec_body
+        elif self.path.startswith("/api/v2/buckets"):
+            body = json.dumps({"buckets": [{"id": "b1", "orgID": "o1", "name": "benchmark"}]})
+        elif self.path == "/metrics":
+            body = "vm_active_merges{type=\"storage/inmemory\"} 0\n"
+        else:
+            body = ""
+
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(body.encode("utf-8"))
+
+    def do_POST(self): # pylint: disable=invalid-name
+        """
+        Answers the POST requests
+        """
+
+        self.server.requests.append(("POST", urllib.parse.unquote(self.path)))
+        self.server.bodies.append(
+            (self.headers["Authorization"], self.rfile.read(int(self.headers["Content-Length"])))
+        )
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args): # pylint: disable=redefined-builtin
+        """
+        Keeps the test output clean
+        """
+
+class TestEngineHooks(unittest.TestCase):
+    """
+    Runs the reset, flush and delete hooks against the stub
+    """
+
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.requests = []
+        self.server.bodies = []
+        self.server.exec_body = json.dumps({"dataset": [["cpu"], ["mem"]]})
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.config = {
+            "url": "http://127.0.0.1:" + str(self.server.server_address[1]),
+            "token": "secret",
+            "db_name": "benchmark",
+            "settle_time": 0,
+            "merge_timeout": 5,
+            "restart_command": "true",
+            "ready_timeout": 5
+        }
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_questdb_reset_drops_every_table(self):
+        hook_dict = engine_hooks.reset("questdb", self.config)
+
+        self.assertEqual(hook_dict["actions"], ["dropped table cpu", "dropped table mem"])
+        self.assertIn(("GET", "/exec?query=DROP TABLE \"cpu\";"), self.server.requests)
+        self.assertIn(("GET", "/exec?query=DROP TABLE \"mem\";"), self.server.requests)
+
+    def test_victoriametrics_reset_deletes_merges_and_flushes(self):
+        hook_dict = engine_hooks.reset("victoriametrics", self.config)
+
+        paths = [path for _, path in self.server.requests]
+        self.assertTrue(paths[0].startswith("/api/v1/admin/tsdb/delete_series"))
+        self.assertIn("/internal/force_merge", paths)
+        self.assertEqual(paths[-1], "/internal/resetRollupResultCache")
+        self.assertEqual(hook_dict["actions"][-1], "reset rollup result cache")
+
+    def test_questdb_flush_restarts_and_waits(self):
+        hook_dict = engine_hooks.flush("questdb", self.config)
+
+        self.assertEqual(hook_dict["actions"][0], "restarted with true")
+        self.assertIn(("GET", "/exec?query=SELECT 1;"), self.server.requests)
+
+    def test_flush_without_restart_command_fails(self):
+        self.config["restart_command"] = None
+
+        with self.assertRaises(RuntimeError):
+            engine_hooks.flush("influx", self.config)
+
+    def test_unexpected_answer_is_a_runtime_error(self):
+        self.server.exec_body = "<html>Bad gateway</html>"
+
+        with self.assertRaises(RuntimeError):
+            engine_hooks.reset("questdb", self.config)
+
+    def test_unreachable_database_is_a_runtime_error(self):
+        self.config["url"] = "http://127.0.0.1:1"
+
+        with self.assertRaises(RuntimeError):
+            engine_hooks.reset("victoriametrics", self.config)
+
+    def test_questdb_delete_drops_partitions(self):
+        hook_dict = engine_hooks.delete(
+            "questdb", self.config, "2025-01-01T00:00:00Z", "2025-01-02T00:00:00Z"
+        )
+
+        self.assertEqual(len(hook_dict["actions"]), 2)
+        for table in ["cpu", "mem"]:
+            self.assertIn((
+                "GET",
+                "/exec?query=ALTER TABLE \"" + table + "\" DROP PARTITION " +
+                "WHERE timestamp < '2025-01-02T00:00:00Z';"
+            ), self.server.requests)
+
+    def test_influx_delete_sends_the_window(self):
+        hook_dict = engine_hooks.delete(
+            "influx", self.config, "2025-01-01T00:00:00Z", "2025-01-02T00:00:00Z"
+        )
+
+        self.assertEqual(
+            hook_dict["actions"],
+            ["deleted 2025-01-01T00:00:00Z to 2025-01-02T00:00:00Z from bucket benchmark"]
+        )
+        self.assertIn(("GET", "/api/v2/buckets?name=benchmark"), self.server.requests)
+        self.assertIn(("POST", "/api/v2/delete?orgID=o1&bucketID=b1"), self.server.requests)
+
+        authorization, body = self.server.bodies[0]
+        self.assertEqual(authorization, "Token secret")
+        self.assertEqual(
+            json.loads(body), {"start": "2025-01-01T00:00:00Z", "stop": "2025-01-02T00:00:00Z"}
+        )
+
+    def test_victoriametrics_delete_is_refused(self):
+        with self.assertRaisesRegex(RuntimeError, "can not delete a time window"):
+            engine_hooks.delete(
+                "victoriametrics", self.config, "2025-01-01T00:00:00Z", "2025-01-02T00:00:00Z"
+            )
+
+        self.assertEqual(self.server.requests, [])
+
+class TestTimescaledbHooks(unittest.TestCase):
+    """
+    Runs the TimescaleDB hooks against a psql stand-in that records its arguments
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.arguments = pathlib.Path(directory.name, "arguments")
+        psql = pathlib.Path(directory.name, "psql")
+        psql.write_text(
+            "#!/bin/sh\n" +
+            "printf '%s\\n' \"$@\" > " + str(self.arguments) + "\n" +
+            "echo ' _timescaledb_internal._hyper_1_1_chunk'\n" +
+            "echo ' _timescaledb_internal._hyper_1_2_chunk'\n",
+            encoding="ASCII"
+        )
+        psql.chmod(0o755)
+
+        path = mock.patch.dict(
+            os.environ, {"PATH": directory.name + os.pathsep + os.environ.get("PATH", "")}
+        )
+        path.start()
+        self.addCleanup(path.stop)
+
+        self.config = {
+            "host": "localhost", "port": 5432, "user": "postgres",
+            "password": "password", "db_name": "benchmark"
+        }
+
+    def test_timescaledb_delete_drops_chunks(self):
+        hook_dict = engine_hooks.delete(
+            "timescaledb", self.config, "2025-01-01T00:00:00Z", "2025-01-02T00:00:00Z"
+        )
+
+        self.assertEqual(hook_dict["actions"], ["dropped 2 chunks before 2025-01-02T00:00:00Z"])
+
+        arguments = self.arguments.read_text(encoding="ASCII").split("\n")
+        self.assertEqual(arguments[arguments.index("-d") + 1], "benchmark")
+        sql = arguments[arguments.index("-c") + 1]
+        self.assertIn("drop_chunks(", sql)
+        self.assertIn("older_than => '2025-01-02T00:00:00Z'::timestamptz", sql)
+        self.assertIn("timescaledb_information.hypertables", sql)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+Tests the OpenMetrics endpoint with a local scrape
+"""
+
+import unittest
+import urllib.error
+import urllib.request
+
+import harness_metrics
+
+class TestMetricsEndpoint(unittest.TestCase):
+    """
+    Scrapes the endpoint while the harness is in a run
+    """
+
+    def setUp(self):
+        self.server = harness_metrics.start_server(0, "127.0.0.1")
+        self.url = "http://127.0.0.1:" + str(self.server.server_address[1]) + "/metrics"
+
+    def tearDown(self):
+        harness_metrics.end_run()
+        harness_metrics.set_phase("idle")
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_scrape(self):
+        harness_metrics.set_run("questdb", "write", "devops", 1, 5)
+        harness_metrics.set_phase("load")
+        harness_metrics.update({"rows_sec": 1000.0, "rows_total": 5000.0})
+
+        with urllib.request.urlopen(self.url, timeout=10) as response:
+            content_type = response.headers["Content-Type"]
+            body = response.read().decode("utf-8")
+
+        self.assertTrue(content_type.startswith("application/openmetrics-text"))
+        self.assertTrue(body.endswith("# EOF\n"))
+
+        self.assertIn("# TYPE tsbs_harness_run info", body)
+        self.assertIn("tsbs_harness_run_info{", body)
+        self.assertIn("engine=\"questdb\"", body)
+        self.assertIn("tsbs_harness_phase{tsbs_harness_phase=\"load\"} 1", body)
+
+        self.assertIn("# TYPE tsbs_harness_phase_seconds counter", body)
+        self.assertIn("tsbs_harness_phase_seconds_total{phase=\"load\"}", body)
+
+    def test_latency_of_finished_run(self):
+        self.addCleanup(harness_metrics.update, {"latency": {}})
+        harness_metrics.update({"latency": {
+            "min": 0.001, "med": 0.002, "mean": 0.0025, "max": 0.01,
+            "stddev": 0.001, "sum": 2.5, "count": 1000.0
+        }})
+
+        body = harness_metrics.render()
+
+        self.assertIn("tsbs_harness_query_latency_seconds{", body)
+        for quantile in ["0", "0.5", "1"]:
+            self.assertIn(",quantile=\"" + quantile + "\"}", body)
+        self.assertEqual(body.count(",quantile="), 3)
+        self.assertIn("} 2.5\n", body)
+        self.assertIn("} 1000\n", body)
+
+    def test_other_paths_are_not_found(self):
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            urllib.request.urlopen(self.url.replace("/metrics", "/other"), timeout=10)
+
+        self.assertEqual(context.exception.code, 404)
+
+if __name__ == "__main__":
+    unittest.main()
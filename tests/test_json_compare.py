@@ -0,0 +1,54 @@
+"""
+Tests ranking a results directory that also holds other result files
+"""
+
+import json
+import pathlib
+import tempfile
+import unittest
+
+import json_compare
+import scenario
+
+class TestRank(unittest.TestCase):
+    """
+    Ranks write results next to a scenario result
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write_file(self, name, content):
+        path = pathlib.Path(self.directory.name, name)
+        path.write_text(json.dumps(content), encoding="ASCII")
+        return str(path)
+
+    def test_rank_skips_scenarios(self):
+        file_list = []
+        for engine, time_avg in [("influx", 2.0), ("questdb", 1.0)]:
+            file_list.append(self.write_file("tsbs_" + engine + "_write.json", {
+                "devops": {"time_run": [time_avg, time_avg], "time_avg": time_avg},
+                "metadata": {
+                    "db_engine": engine, "scale": 100, "seed": 123, "runs": 2,
+                    "workers": 4, "read_queries": 1000, "start_date": "2025-01-01",
+                    "operation": "write"
+                }
+            }))
+
+        args = scenario.get_scenario_args({"benchmark": {"format": "questdb", "time": "2025-01"}})
+        file_list.append(self.write_file("tsbs_questdb_scenario_test.json", {
+            "name": "test",
+            "phases": {},
+            "metadata": scenario.get_metadata({"name": "test"}, args, "questdb", "test.toml")
+        }))
+
+        ranking = json_compare.read_json(file_list)
+
+        self.assertEqual(list(ranking), ["s100e123r2w4q1000"])
+        self.assertEqual(
+            list(ranking["s100e123r2w4q1000"]["devops"]["ranking"]), ["questdb", "influx"]
+        )
+
+if __name__ == "__main__":
+    unittest.main()
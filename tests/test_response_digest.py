@@ -0,0 +1,85 @@
+"""
+Tests that the response digest tells apart responses with different rows
+"""
+
+import io
+import unittest
+
+import response_digest
+
+INFLUX_RESPONSE = (
+    '{"results": [{"statement_id": 0, "series": [{"name": "cpu", '
+    '"tags": {"hostname": "%s"}, "columns": ["time", "max"], '
+    '"values": [["2016-01-01T00:%s:00Z", %s], ["2016-01-01T00:10:00Z", 3.25]]}]}]}'
+)
+
+def get_digest(*responses):
+    """
+    Digests the responses as tsbs_run_queries prints them on single lines
+
+    Parameters:
+        responses : str
+            The JSON of each response
+
+    Returns:
+        digest_dict : dict
+            The digest of the responses
+    """
+
+    lines = "".join("ID " + str(number) + ": " + response + "\n"
+                    for number, response in enumerate(responses))
+
+    return response_digest.digest_stream(io.BytesIO(lines.encode("UTF-8")), io.BytesIO(), 6)
+
+class TestResponseDigest(unittest.TestCase):
+    """
+    Digests InfluxDB and Prometheus style responses
+    """
+
+    def test_same_rows_match(self):
+        first = get_digest(INFLUX_RESPONSE % ("host_1", "00", "12.3456789"))
+        second = get_digest(INFLUX_RESPONSE % ("host_1", "00", "12.3456781"))
+
+        self.assertEqual(first["digest"], second["digest"])
+        self.assertEqual(first["rows"], 2)
+
+    def test_wrong_host_differs(self):
+        self.assertNotEqual(
+            get_digest(INFLUX_RESPONSE % ("host_1", "00", "12.5"))["digest"],
+            get_digest(INFLUX_RESPONSE % ("host_2", "00", "12.5"))["digest"]
+        )
+
+    def test_shifted_bucket_differs(self):
+        self.assertNotEqual(
+            get_digest(INFLUX_RESPONSE % ("host_1", "00", "12.5"))["digest"],
+            get_digest(INFLUX_RESPONSE % ("host_1", "01", "12.5"))["digest"]
+        )
+
+    def test_swapped_columns_differ(self):
+        self.assertNotEqual(
+            get_digest('{"dataset": [[1, 2.5], [3, 4.5]]}')["digest"],
+            get_digest('{"dataset": [[2.5, 1], [4.5, 3]]}')["digest"]
+        )
+
+    def test_row_order_is_ignored(self):
+        self.assertEqual(
+            get_digest('{"dataset": [[1, 2.5], [3, 4.5]]}')["digest"],
+            get_digest('{"dataset": [[3, 4.5], [1, 2.5]]}')["digest"]
+        )
+
+    def test_prometheus_labels_and_timestamps(self):
+        rows = []
+        response_digest.collect_rows({
+            "status": "success",
+            "data": {"resultType": "matrix", "result": [{
+                "metric": {"__name__": "cpu", "hostname": "host_1"},
+                "values": [[1451606400, "12.3456789"], [1451606460.5, "3"]]
+            }]}
+        }, rows, 6)
+
+        self.assertEqual(
+            rows, ["host_1,1451606400000000,12.3457", "host_1,1451606460500000,3"]
+        )
+
+if __name__ == "__main__":
+    unittest.main()
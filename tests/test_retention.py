@@ -0,0 +1,71 @@
+"""
+Tests that the retention workload keeps every window in the database
+"""
+
+import pathlib
+import subprocess
+import unittest
+from unittest import mock
+
+import benchmark
+import engine_hooks
+
+LOAD_OUTPUT = (
+    "loaded 1000 metrics in 1.000sec with 1 workers (mean rate 1000.00 metrics/sec)\n"
+    "loaded 100 rows in 1.000sec with 1 workers (mean rate 100.00 rows/sec)\n"
+)
+
+class TestRetention(unittest.TestCase):
+    """
+    Runs the retention workload with tsbs and the hooks replaced
+    """
+
+    def setUp(self):
+        self.args = benchmark.handle_args([
+            "-f", "questdb", "-o", "retention", "-u", "devops", "-r", "2", "-t", "2025-05",
+            "--retention_windows", "3", "--retention_query", "none", "--delete_delay", "0"
+        ])
+        self.args.format = "questdb"
+        self.query_suites = benchmark.get_query_suites()
+        self.db_setup = benchmark.get_db_setup(self.args, self.query_suites)
+        self.path_dict = {
+            "main_path": "tsbs", "use_case": ["devops"], "codec": benchmark.get_codec(self.args)
+        }
+        self.timestamps = benchmark.create_timestamps(self.args)[1]
+        self.commands = []
+
+    def generate_files(self, path_dict, *args):
+        pathlib.Path(benchmark.get_file_path(path_dict)).touch()
+
+    def run_command(self, command, timeout):
+        self.commands.append(command)
+        return subprocess.CompletedProcess(command, 0, LOAD_OUTPUT, "")
+
+    def run_retention(self, disk_usage):
+        with mock.patch.object(benchmark, "generate_files", self.generate_files), \
+                mock.patch.object(benchmark, "run_command", self.run_command), \
+                mock.patch.object(engine_hooks, "reset", return_value=[]), \
+                mock.patch.object(engine_hooks, "delete", return_value={"seconds": 0.1}), \
+                mock.patch.object(engine_hooks, "disk_usage", side_effect=disk_usage):
+            return benchmark.retention_handler(
+                self.path_dict, self.args, self.db_setup, self.timestamps, self.query_suites
+            )
+
+    def test_only_the_first_load_creates_the_database(self):
+        retention_dict = self.run_retention(range(1000, 100000, 1000))
+
+        # Two preloaded windows, the baseline and two runs
+        self.assertEqual(len(self.commands), 5)
+        self.assertNotIn("--do-create-db", self.commands[0])
+        for command in self.commands[1:]:
+            self.assertIn("--do-create-db=false", command)
+
+        self.assertTrue(retention_dict["summary"]["disk_grows"])
+
+    def test_disk_that_does_not_grow_is_flagged(self):
+        retention_dict = self.run_retention([1000] * 20)
+
+        self.assertFalse(retention_dict["summary"]["disk_grows"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+"""
+Tests that the write phases of a scenario add their days to one database
+"""
+
+import unittest
+from unittest import mock
+
+import benchmark
+import scenario
+
+SCENARIO = {
+    "name": "test",
+    "benchmark": {"format": "questdb", "time": "2025-01"},
+    "phase": [
+        {"name": "backfill", "operation": "write", "days": 3},
+        {"name": "live", "operation": "write", "after": "backfill", "days": 1},
+        {"name": "other", "operation": "write", "use_case": "iot", "days": 2}
+    ]
+}
+
+class TestScenario(unittest.TestCase):
+    """
+    Runs a scenario with tsbs replaced
+    """
+
+    def setUp(self):
+        self.loads = []
+
+    def process_tsbs(self, path_dict, args, db_setup, create_db=True):
+        self.loads.append((path_dict["test_file"], create_db))
+        return {"totals": [10, 1], "metrics": 10, "rows": 1, "time": 1.0}
+
+    def test_only_the_first_load_creates_the_database(self):
+        args = scenario.get_scenario_args(SCENARIO)
+
+        with mock.patch.object(benchmark, "generate_files", return_value={}), \
+                mock.patch.object(benchmark, "process_tsbs", self.process_tsbs):
+            scenario_dict = scenario.run_scenario(SCENARIO, args, "questdb")
+
+        self.assertEqual(scenario_dict["failed"], [])
+        self.assertEqual(len(self.loads), 6)
+        self.assertEqual([create_db for _, create_db in self.loads].count(True), 1)
+        self.assertTrue(self.loads[0][1])
+
+if __name__ == "__main__":
+    unittest.main()